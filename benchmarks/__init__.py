@@ -0,0 +1,5 @@
+"""
+Benchmarks of cavendish-particle-tracks, run with airspeed velocity (asv).
+
+See the contributing guide for how to run them and compare commits.
+"""
@@ -0,0 +1,55 @@
+"""The geometry functions, called once per measurement, for a class worth of
+measurements."""
+
+import numpy as np
+
+from cavendish_particle_tracks._calculate import (
+    angle,
+    length,
+    magnification,
+    radius,
+    stereoshift,
+    track_parameters,
+)
+from cavendish_particle_tracks.analysis import FIDUCIAL_BACK, FIDUCIAL_FRONT, Fiducial
+
+
+class TimeCalculate:
+    params = [100, 10_000]
+    param_names = ["measurements"]
+
+    def setup(self, n):
+        rng = np.random.default_rng(0)
+        self.points = rng.random((n, 3, 2)) * 8000
+        front, back = list(FIDUCIAL_FRONT), list(FIDUCIAL_BACK)
+        self.fiducials = [
+            [
+                Fiducial(name, *rng.random(2) * 8000)
+                for name in (front[0], front[1], back[0], back[1])
+            ]
+            for _ in range(n)
+        ]
+
+    def time_radius(self, n):
+        for a, b, c in self.points:
+            radius(a, b, c)
+
+    def time_length(self, n):
+        for a, b, _ in self.points:
+            length(a, b)
+
+    def time_angle(self, n):
+        for a, b, c in self.points:
+            angle(np.array([a, b]), np.array([b, c]))
+
+    def time_track_parameters(self, n):
+        for a, b, _ in self.points:
+            track_parameters([a, b])
+
+    def time_stereoshift(self, n):
+        for (a, b, c), (_, d, _) in zip(self.points, self.points[::-1]):
+            stereoshift(a, b, c, d)
+
+    def time_magnification(self, n):
+        for fiducials in self.fiducials:
+            magnification(*fiducials)
@@ -0,0 +1,90 @@
+"""Loading a dataset: opening it in the widget (until the first frame is
+shown), and decoding the frames of another event."""
+
+import os
+import tempfile
+
+import numpy as np
+
+from cavendish_particle_tracks.synthetic import write_dataset
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+# Events in the benchmark dataset, and size of its (RGB) frames
+EVENTS = 20
+FRAME_SIZE = 2048
+# A full dataset, with smaller compressed frames to keep it quick to write
+LARGE_EVENTS = 1000
+LARGE_FRAME_SIZE = 1024
+
+
+def _synthetic_dataset(events: int = EVENTS, size: int = FRAME_SIZE, **kwargs) -> str:
+    folder = tempfile.mkdtemp()
+    write_dataset(folder, events=events, size=size, **kwargs)
+    return folder
+
+
+class _WidgetBenchmark:
+    """A fresh viewer and widget for each repeat, and the benchmark dataset."""
+
+    number = 1
+    repeat = 5
+    warmup_time = 0
+    timeout = 300
+
+    def setup_cache(self):
+        return _synthetic_dataset()
+
+    def setup(self, folder):
+        import napari
+
+        from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+
+        self.viewer = napari.Viewer(show=False)
+        self.widget = ParticleTracksWidget(self.viewer)
+
+    def teardown(self, folder):
+        self.viewer.close()
+
+
+class TimeLoading(_WidgetBenchmark):
+    def time_load_data(self, folder):
+        """Until the first frame is decoded and shown."""
+        self.widget._load_data(folder)
+
+
+class TimeLoadingLarge(_WidgetBenchmark):
+    timeout = 900
+
+    def setup_cache(self):
+        return _synthetic_dataset(LARGE_EVENTS, LARGE_FRAME_SIZE, compression="zlib")
+
+    def time_load_data(self, folder):
+        """Until the first frame is decoded and shown, with many events."""
+        self.widget._load_data(folder)
+
+
+class TimeDecode(_WidgetBenchmark):
+    def setup(self, folder):
+        super().setup(folder)
+        self.widget._load_data(folder)
+        self.event = 0
+
+    def time_decode_slice(self, folder):
+        """One frame of a new event, as when moving the event slider."""
+        self.event = (self.event + 1) % EVENTS
+        np.asarray(self.widget.image_stack[1, self.event])
+
+
+class MemLoading:
+    def setup_cache(self):
+        return _synthetic_dataset(events=5, size=1024)
+
+    def peakmem_load_data(self, folder):
+        import napari
+
+        from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+
+        viewer = napari.Viewer(show=False)
+        ParticleTracksWidget(viewer)._load_data(folder)
+        viewer.close()
@@ -0,0 +1,107 @@
+"""Saving and reading the particle table, for a student's table and for the
+results of a whole class."""
+
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from cavendish_particle_tracks._storage import (
+    Session,
+    load_results,
+    load_session,
+    particles_to_arrays,
+    read_csv,
+    read_pickle,
+    save_results,
+    save_session,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay, StereoshiftInfo
+
+
+def make_particles(n: int) -> list[ParticleDecay]:
+    """`n` particles with all the measurements done."""
+    rng = np.random.default_rng(0)
+    particles = []
+    for i in range(n):
+        particle = ParticleDecay(name="Λ⁰ ⇨ p + π⁻", index=4, event_number=i % 100)
+        particle.rpoints = rng.random((3, 2)) * 8000
+        particle.dpoints = rng.random((2, 2)) * 8000
+        particle.radius_px, particle.decay_length_px = rng.random(2) * 1000
+        particle.magnification_a, particle.magnification_b = 0.02, 0.001
+        particle.phi_proton, particle.phi_pion = rng.random(2)
+        particle.origin_vertex_stereoshift_info = StereoshiftInfo(
+            name="origin_vertex", stereoshift=0.5, depth_cm=20.0
+        )
+        particle.origin_vertex_stereoshift_info.spoints = rng.random((4, 2))
+        particle.calibrate()
+        particles.append(particle)
+    return particles
+
+
+def write_csv(file_name: str, particles: list[ParticleDecay]) -> None:
+    """As the widget 'Save' button does."""
+    with open(file_name, "w", encoding="UTF8", newline="") as f:
+        f.write(",".join(particles[0].vars_to_save()) + "\n")
+        f.writelines([particle.to_csv() for particle in particles])
+
+
+class TimeExport:
+    params = [100, 20_000]
+    param_names = ["particles"]
+
+    def setup(self, n):
+        self.particles = make_particles(n)
+        self.folder = tempfile.TemporaryDirectory()
+
+    def teardown(self, n):
+        self.folder.cleanup()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.folder.name, name)
+
+    def time_to_arrays(self, n):
+        particles_to_arrays(self.particles)
+
+    def time_save_csv(self, n):
+        write_csv(self._path("particles.csv"), self.particles)
+
+    def time_save_results(self, n):
+        save_results(self._path("particles.npz"), self.particles)
+
+    def time_save_session(self, n):
+        save_session(self._path("session.cpt"), Session(particles=self.particles))
+
+
+class TimeImport:
+    params = [100, 20_000]
+    param_names = ["particles"]
+
+    def setup(self, n):
+        particles = make_particles(n)
+        self.folder = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.folder.name, "particles.csv")
+        self.npz = os.path.join(self.folder.name, "particles.npz")
+        self.pkl = os.path.join(self.folder.name, "particles.pkl")
+        self.cpt = os.path.join(self.folder.name, "session.cpt")
+        write_csv(self.csv, particles)
+        save_results(self.npz, particles)
+        save_session(self.cpt, Session(particles=particles))
+        with open(self.pkl, "wb") as f:
+            pickle.dump(particles, f)
+
+    def teardown(self, n):
+        self.folder.cleanup()
+
+    def time_read_csv(self, n):
+        read_csv(self.csv)
+
+    def time_load_results(self, n):
+        load_results(self.npz)
+
+    def time_read_pickle(self, n):
+        read_pickle(self.pkl)
+
+    def time_load_session(self, n):
+        load_session(self.cpt)
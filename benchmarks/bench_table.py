@@ -0,0 +1,48 @@
+"""Populating, recalibrating and filtering the particle table."""
+
+from cavendish_particle_tracks._particle_table import (
+    ParticleFilterModel,
+    ParticleTableModel,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay
+from cavendish_particle_tracks.kinematics import (
+    KINEMATICS_COLUMNS,
+    KINEMATICS_INPUTS,
+)
+
+from .bench_storage import make_particles
+
+
+def _make_model() -> ParticleTableModel:
+    return ParticleTableModel(
+        list(ParticleDecay().vars_to_save()) + ["magnification"],
+        KINEMATICS_COLUMNS,
+        KINEMATICS_INPUTS,
+    )
+
+
+class TimeTable:
+    params = [100, 20_000]
+    param_names = ["particles"]
+
+    def setup(self, n):
+        self.particles = make_particles(n)
+        self.model = _make_model()
+        self.model.set_particles(self.particles)
+        self.filter = ParticleFilterModel()
+        self.filter.setSourceModel(self.model)
+
+    def time_set_particles(self, n):
+        _make_model().set_particles(self.particles)
+
+    def time_append_particle(self, n):
+        self.model.append_particles([ParticleDecay()])
+
+    def time_recalibrate(self, n):
+        for particle in self.particles:
+            particle.magnification_a *= 1.01
+        self.model.invalidate(range(n), ["magnification_a"])
+
+    def time_filter(self, n):
+        self.filter.set_query("Λ⁰ event:10-60 has:radius")
+        self.filter.set_query("")
@@ -3,6 +3,19 @@ try:
 except ImportError:
     __version__ = "unknown"
 
-from ._main_widget import ParticleTracksWidget
-
 __all__ = ("ParticleTracksWidget",)
+
+
+def __getattr__(name: str):
+    # The widget (and napari, Qt, the dialogs) is only imported when it is used,
+    # so that importing the package (e.g. for `aggregate`) and plugin discovery
+    # stay fast.
+    if name == "ParticleTracksWidget":
+        from ._main_widget import ParticleTracksWidget
+
+        return ParticleTracksWidget
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__() -> list[str]:
+    return sorted([*globals(), *__all__])
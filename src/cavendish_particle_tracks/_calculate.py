@@ -35,6 +35,26 @@ def length(a: Point, b: Point) -> float:
     return np.linalg.norm(pa - pb)
 
 
+def radii(points: np.ndarray) -> np.ndarray:
+    """`radius` of each of an (n, 3, 2) array of point triplets (NaN for
+    collinear points)."""
+    points = np.asarray(points, dtype=float).reshape(-1, 3, 2)
+    lhs = np.concatenate([2 * points, np.ones((len(points), 3, 1))], axis=-1)
+    rhs = (points * points).sum(axis=-1)
+    solvable = np.abs(np.linalg.det(lhs)) > 1e-12
+    out = np.full(len(points), np.nan)
+    if solvable.any():
+        xc, yc, k = np.linalg.solve(lhs[solvable], rhs[solvable, :, np.newaxis])[..., 0].T
+        out[solvable] = np.sqrt(xc * xc + yc * yc + k)
+    return out
+
+
+def lengths(points: np.ndarray) -> np.ndarray:
+    """`length` of each of an (n, 2, 2) array of point pairs."""
+    points = np.asarray(points, dtype=float).reshape(-1, 2, 2)
+    return np.linalg.norm(points[:, 0] - points[:, 1], axis=-1)
+
+
 def magnification(f1: Fiducial, f2: Fiducial, b1: Fiducial, b2: Fiducial):
     # (Delta t)/(Delta p) = a + b*z
     tf1 = np.array(FIDUCIAL_FRONT[f1.name])
@@ -73,6 +93,13 @@ def depth(
         return stereoshift(fa.xy, fb.xy, pa.xy, pb.xy) * CHAMBER_DEPTH
 
 
+def depths(stereoshifts: np.ndarray, reverse: np.ndarray) -> np.ndarray:
+    """`depth` of many points from their stereoshifts, measured from the front
+    (or from the back where `reverse`)."""
+    stereoshifts = np.asarray(stereoshifts, dtype=float)
+    return np.where(reverse, 1 - stereoshifts, stereoshifts) * CHAMBER_DEPTH
+
+
 def track_parameters(line):
     slope = (line[0][1] - line[1][1]) / (line[0][0] - line[1][0])
     intercept = line[0][1] - slope * line[0][0]
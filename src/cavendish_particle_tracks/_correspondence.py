@@ -0,0 +1,132 @@
+"""
+Matching of points between two views of the same event.
+
+The position of a point of interest (a vertex, a fiducial) in another view is
+found by phase correlation of two small patches around it, read lazily from the
+(view, event, y, x) image stack, so only the frames involved are decoded. The
+peak of the correlation is refined to sub-pixel precision by evaluating the
+correlation on a finer grid around it.
+"""
+
+from __future__ import annotations
+
+from typing import NamedTuple
+
+import numpy as np
+
+from ._tracing import traced
+
+# Side (in pixels) of the patches compared by phase correlation
+PATCH_SIZE = 128
+
+
+class Match(NamedTuple):
+    """A point found in another view."""
+
+    position: np.ndarray
+    """(y, x) position of the point in the other view."""
+    confidence: float
+    """Height of the phase correlation peak, from 0 (noise) to 1 (identical)."""
+
+
+def read_patch(stack, view: int, event: int, center, size: int = PATCH_SIZE):
+    """Grayscale `size` x `size` patch of the image (view, event) of `stack`
+    centred on the (y, x) `center`, padded with the edge values outside of the
+    image."""
+    height, width = stack.shape[2:4]
+    top, left = (np.rint(np.asarray(center, dtype=float)) - size // 2).astype(int)
+    rows = slice(max(top, 0), min(max(top + size, 0), height))
+    columns = slice(max(left, 0), min(max(left + size, 0), width))
+    patch = np.asarray(stack[view, event, rows, columns], dtype=float)
+    if patch.ndim == 3:
+        # RGB(A) images
+        patch = patch[..., :3].mean(axis=-1)
+    if patch.size == 0:
+        return np.zeros((size, size))
+    padding = (
+        (rows.start - top, top + size - rows.stop),
+        (columns.start - left, left + size - columns.stop),
+    )
+    return np.pad(patch, padding, mode="edge")
+
+
+def _upsampled_correlation(spectrum: np.ndarray, center, factor: int, size: int):
+    """Correlation of the cross-power `spectrum` on a `size` x `size` grid of
+    spacing 1 / `factor` pixels around `center`, as a matrix product of discrete
+    Fourier transforms (much cheaper than an upsampled FFT)."""
+    grid = (np.arange(size) - size // 2) / factor
+    rows, columns = spectrum.shape
+    kernel_rows = np.exp(
+        2j * np.pi * np.outer(grid + center[0], np.fft.fftfreq(rows) * rows) / rows
+    )
+    kernel_columns = np.exp(
+        2j
+        * np.pi
+        * np.outer(np.fft.fftfreq(columns) * columns, grid + center[1])
+        / columns
+    )
+    return np.real(kernel_rows @ spectrum @ kernel_columns) / spectrum.size
+
+
+def phase_correlation(reference: np.ndarray, moving: np.ndarray, upsampling: int = 20):
+    """Shift (dy, dx) such that `moving` is `reference` displaced by it, with a
+    precision of 1 / `upsampling` pixels, and the height of the correlation peak.
+
+    The cross-power spectrum is only partially whitened (divided by the square
+    root of its magnitude): this keeps the peak sharp, without letting the
+    frequencies with little signal (and mostly noise) dominate.
+    """
+    window = np.outer(np.hanning(reference.shape[0]), np.hanning(reference.shape[1]))
+    spectrum = np.fft.fft2((moving - moving.mean()) * window) * np.conj(
+        np.fft.fft2((reference - reference.mean()) * window)
+    )
+    spectrum /= np.sqrt(np.maximum(np.abs(spectrum), np.finfo(float).eps))
+    correlation = np.real(np.fft.ifft2(spectrum))
+
+    peak = np.array(np.unravel_index(np.argmax(correlation), correlation.shape))
+    # Shifts larger than half the patch wrap around
+    shape = np.array(correlation.shape)
+    peak = np.where(peak > shape / 2, peak - shape, peak).astype(float)
+
+    # Refine the peak on a finer grid of +- 1.5 pixels
+    size = 3 * upsampling
+    fine = _upsampled_correlation(spectrum, peak, upsampling, size)
+    fine_peak = np.unravel_index(np.argmax(fine), fine.shape)
+    shift = peak + (np.array(fine_peak) - size // 2) / upsampling
+    # The peak is at most the mean magnitude, when all the phases agree
+    confidence = fine[fine_peak] / max(np.abs(spectrum).mean(), np.finfo(float).eps)
+    return shift, float(confidence)
+
+
+@traced
+def match_point(
+    stack,
+    event: int,
+    point,
+    from_view: int,
+    to_view: int,
+    guess=None,
+    size: int = PATCH_SIZE,
+    iterations: int = 3,
+) -> Match:
+    """Find the (y, x) `point` of the view `from_view` in the view `to_view` of
+    the same event.
+
+    The search starts from `guess` (by default the same position) and is
+    repeated around the new estimate, as the patches overlap better (and
+    phase correlation is more accurate) for small shifts.
+    """
+    point = np.asarray(point, dtype=float)
+    position = point.copy() if guess is None else np.asarray(guess, dtype=float)
+    reference = read_patch(stack, from_view, event, point, size)
+    # The patches are centred on whole pixels
+    offset = np.rint(point) - point
+    confidence = 0.0
+    for _ in range(iterations):
+        center = np.rint(position)
+        moving = read_patch(stack, to_view, event, center, size)
+        shift, confidence = phase_correlation(reference, moving)
+        position = center + shift - offset
+        if np.abs(shift).max() < 1:
+            break
+    return Match(position, confidence)
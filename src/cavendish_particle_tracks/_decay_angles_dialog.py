@@ -9,10 +9,10 @@ from qtpy.QtWidgets import (
     QGridLayout,
     QLabel,
     QPushButton,
-    QTableWidgetItem,
 )
 
 from ._calculate import angle, track_parameters
+from ._tracing import traced
 
 ANGLES_LAYER_NAME = "Decay Angles Tool"
 
@@ -67,6 +67,7 @@ class DecayAnglesDialog(QDialog):
 
         ### Setup Decay Angles layer
         self.join_coordinates = [200, 300]
+        self._enforcing_coincidence = False
         self.cal_layer: Shapes = self._setup_decayangles_layer()
         self.cal_layer.events.data.connect(self._enforce_points_coincident)
 
@@ -75,34 +76,40 @@ class DecayAnglesDialog(QDialog):
         self.phi_pion = 0.0
         self.alines = []
 
+    @traced
     def _enforce_points_coincident(self, event: Event) -> None:
-        """Enforce that the decay vertex of the Lambda and the origin vertices of proton and pion are coincident"""
-        if event is None:
+        """Enforce that the decay vertex of the Lambda and the origin vertices of proton and pion are coincident
+
+        The lines that have not been moved are all updated at once, with a single
+        assignment of the layer data, and the data event this assignment fires is
+        ignored.
+        """
+        if event is None or self._enforcing_coincidence:
             return
 
         if event.action != "changed":
             return  # Nothing has been moved, so nothing to do
 
-        shapes_modified = event.data_indices
+        shapes_modified = list(event.data_indices)
+        if not shapes_modified or len(shapes_modified) >= 3:
+            return
         data = self.cal_layer.data
-        if len(shapes_modified) == 1:
-            # if only one has been moved, move the other two (if they have not been moved already)
-            for i in range(3):
-                if (i not in shapes_modified) and (
-                    self.cal_layer.data[i][0]
-                    != self.cal_layer.data[shapes_modified[0]][0]
-                ).any():
-                    data[i][0] = self.cal_layer.data[shapes_modified[0]][0]
-                    self.cal_layer.data = data
-        elif len(shapes_modified) == 2:
-            # if two of them have been moved, move the third one (if it has not been moved already)
-            for i in range(3):
-                if (i not in shapes_modified) and (
-                    self.cal_layer.data[i][0]
-                    != self.cal_layer.data[shapes_modified[0]][0]
-                ).any():
-                    data[i][0] = self.cal_layer.data[shapes_modified[0]][0]
-                    self.cal_layer.data = data
+        vertex = data[shapes_modified[0]][0]
+        # Move the lines that have not been moved (if they have not been moved already)
+        to_move = [
+            i
+            for i in range(3)
+            if i not in shapes_modified and (data[i][0] != vertex).any()
+        ]
+        if not to_move:
+            return
+        for i in to_move:
+            data[i][0] = vertex
+        self._enforcing_coincidence = True
+        try:
+            self.cal_layer.data = data
+        finally:
+            self._enforcing_coincidence = False
 
     def _setup_decayangles_layer(self):
         """Create a shapes layer and add three lines to measure the Lambda, p and pi tracks"""
@@ -158,6 +165,7 @@ class DecayAnglesDialog(QDialog):
         )
         return shapes_layer
 
+    @traced
     def _on_click_calculate(self) -> None:
         """When 'Calculate' button is clicked, calculate opening angles and populate table"""
 
@@ -185,6 +193,7 @@ class DecayAnglesDialog(QDialog):
         self.textboxes_phi[0].setText(str(self.phi_proton))
         self.textboxes_phi[1].setText(str(self.phi_pion))
 
+    @traced
     def _on_click_save_to_table(self) -> None:
         """When 'Save to table' button is clicked, propagate stereoshift and depth to main table"""
 
@@ -198,16 +207,7 @@ class DecayAnglesDialog(QDialog):
             self.parent.data[selected_row].phi_proton = self.phi_proton
             self.parent.data[selected_row].phi_pion = self.phi_pion
 
-            self.parent.table.setItem(
-                selected_row,
-                self.parent._get_table_column_index("phi_proton"),
-                QTableWidgetItem(str(self.phi_proton)),
-            )
-            self.parent.table.setItem(
-                selected_row,
-                self.parent._get_table_column_index("phi_pion"),
-                QTableWidgetItem(str(self.phi_pion)),
-            )
+            self.parent.table_model.invalidate([selected_row], ["phi_proton", "phi_pion"])
         napari.utils.notifications.show_info(
             "Decay angles saved to particle " + str(selected_row)
         )
@@ -0,0 +1,79 @@
+"""
+Enhancement of the faint tracks of old film, for display.
+
+The images are enhanced lazily, one chunk (frame) at a time as dask computes
+the frames napari shows, so only the events that are looked at are enhanced,
+and napari's cache keeps them with the decoded frames. The slowly varying
+background of the film is subtracted, the contrast is normalised locally (so
+that faint and bright regions look alike) and the noise of the grain is
+smoothed. The background and the local contrast are estimated on a downsampled
+image, which is fast even for large frames.
+
+Only what is shown is enhanced: the measurements that read pixels (e.g. the
+matching of points between views) use the original images.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from ._frame_statistics import default_contrast_limits
+
+# The background and contrast are estimated on images downsampled by 2**level
+ENHANCEMENT_LEVEL = 3
+# Scale (full resolution pixels) of the variations of the background and contrast
+BACKGROUND_SIGMA = 64.0
+# Scale (pixels) of the smoothing of the grain
+DENOISE_SIGMA = 1.0
+# Standard deviations of the normalised image spanning the range of the images
+OUTPUT_SPREAD = 8.0
+
+
+def _smooth(image: np.ndarray, sigma: float, level: int) -> np.ndarray:
+    """Gaussian smoothing of `image` with a large `sigma`, computed on the image
+    downsampled by 2**level and interpolated back to full resolution."""
+    from scipy import ndimage
+
+    step = 2**level
+    coarse = ndimage.gaussian_filter(image[::step, ::step], sigma / step, mode="nearest")
+    zoom = np.array(image.shape) / np.array(coarse.shape)
+    return ndimage.zoom(coarse, zoom, order=1, mode="nearest", grid_mode=True)[
+        : image.shape[0], : image.shape[1]
+    ]
+
+
+def enhance_frame(frame: np.ndarray, level: int = ENHANCEMENT_LEVEL) -> np.ndarray:
+    """Enhanced (y, x[, channel]) frame, of the same shape and type, in grey
+    levels centred in the range of the type."""
+    from scipy import ndimage
+
+    gray = (
+        frame.mean(axis=-1, dtype=np.float32)
+        if frame.ndim == 3
+        else np.asarray(frame, dtype=np.float32)
+    )
+    gray = ndimage.gaussian_filter(gray, DENOISE_SIGMA)
+    detail = gray - _smooth(gray, BACKGROUND_SIGMA, level)
+    spread = np.sqrt(_smooth(detail**2, BACKGROUND_SIGMA, level))
+    normalised = detail / np.maximum(spread, 1e-6)
+
+    low, high = default_contrast_limits(frame.dtype)
+    enhanced = (low + high) / 2 + normalised * (high - low) / OUTPUT_SPREAD
+    enhanced = np.clip(enhanced, low, high).astype(frame.dtype)
+    if frame.ndim == 3:
+        enhanced = np.repeat(enhanced[..., np.newaxis], frame.shape[-1], axis=-1)
+    return enhanced
+
+
+def enhance_block(block: np.ndarray, frame_ndim: int) -> np.ndarray:
+    """Enhance each frame (the last `frame_ndim` axes) of a block."""
+    enhanced = np.empty_like(block)
+    for index in np.ndindex(block.shape[:-frame_ndim]):
+        enhanced[index] = enhance_frame(block[index])
+    return enhanced
+
+
+def enhanced(stack, rgb: bool):
+    """Lazily enhanced (view, event, y, x[, channel]) dask `stack`, whose chunks
+    are whole frames."""
+    return stack.map_blocks(enhance_block, frame_ndim=3 if rgb else 2, dtype=stack.dtype)
@@ -0,0 +1,249 @@
+"""
+Decoded frames shared by the napari sessions of a computer.
+
+Some lab computers run two sessions on the same dataset, and each would decode
+the same images. When CPT_SHARED_FRAME_CACHE_MB is set, the frames a session
+decodes are put in POSIX shared memory, in one block per image named after the
+path, modification time and size of its file, and the other sessions copy them
+from there instead of decoding the file again. A file that changes gets a new
+block.
+
+The blocks are reference counted: the header of each block counts the sessions
+using it, updated under a lock file. A session keeps the most recent blocks up
+to its share of memory (see `get_shared_frame_cache_mb`) and releases the
+others, and a block is removed from shared memory when its last session
+releases it or exits. The blocks of a session that crashes stay in shared
+memory (``/dev/shm/cpt_*`` on Linux) until the computer restarts.
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager, suppress
+from typing import Optional
+
+import numpy as np
+
+from ._settings import get_shared_frame_cache_mb
+
+BLOCK_PREFIX = "cpt_"
+LOCK_FILE_NAME = "cpt_frame_cache.lock"
+
+# Header of a block, followed by the pixels of the frame
+_MAX_NDIM = 4
+_HEADER = np.dtype(
+    [
+        ("ready", "<u4"),
+        ("references", "<i4"),
+        ("ndim", "<u4"),
+        ("dtype", "S8"),
+        ("shape", "<i8", (_MAX_NDIM,)),
+    ]
+)
+_DATA_OFFSET = 64
+
+
+def block_name(file_name: str) -> str:
+    """Name of the shared memory block of the frame of an image file."""
+    stat = os.stat(file_name)
+    key = f"{os.path.realpath(file_name)}\0{stat.st_mtime_ns}\0{stat.st_size}"
+    # Short enough for macOS (31 characters)
+    return BLOCK_PREFIX + hashlib.blake2b(key.encode(), digest_size=12).hexdigest()
+
+
+def decode_frame(file_name: str) -> np.ndarray:
+    """Decode an image file, as dask-image does."""
+    import pims
+
+    with pims.open(file_name) as frames:
+        return np.asarray(frames[0])
+
+
+def _open_block(name: str, size: int = 0):
+    """Create (if `size` is given) or attach a shared memory block, which is not
+    removed by Python when the process exits."""
+    from multiprocessing import resource_tracker, shared_memory
+
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name, create=size > 0, size=size, track=False)
+    block = shared_memory.SharedMemory(name, create=size > 0, size=size)
+    resource_tracker.unregister(block._name, "shared_memory")  # type: ignore[attr-defined]
+    return block
+
+
+class SharedFrameCache:
+    """The shared memory blocks of the frames used by a session."""
+
+    def __init__(self, capacity: int, lock_file: Optional[str] = None):
+        self.capacity = capacity
+        self.lock_file = lock_file or os.path.join(tempfile.gettempdir(), LOCK_FILE_NAME)
+        # Blocks referenced by the session, the most recently used last
+        self._blocks: OrderedDict = OrderedDict()
+        self.nbytes = 0
+        self.decoded = 0
+        self.shared = 0
+        # dask reads frames from several threads
+        self._thread_lock = threading.RLock()
+        self._lock_fd = os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o666)
+
+    @contextmanager
+    def _locked(self):
+        """Hold the lock of the blocks, for the threads of all the sessions."""
+        import fcntl
+
+        with self._thread_lock:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def __len__(self) -> int:
+        return len(self._blocks)
+
+    def __dask_tokenize__(self):
+        return type(self).__name__, self.lock_file, id(self)
+
+    def read(self, file_name: str) -> np.ndarray:
+        """The frame of an image file: copied from shared memory if a session
+        decoded it, else decoded and shared."""
+        name = block_name(file_name)
+        with self._locked():
+            block = self._blocks.get(name)
+            if block is not None:
+                self._blocks.move_to_end(name)
+            else:
+                block = self._attach(name)
+            if block is not None:
+                frame = self._frame(block)
+                if frame is not None:
+                    self.shared += 1
+                    return frame.copy()
+
+        frame = decode_frame(file_name)
+        self.decoded += 1
+        if name not in self._blocks and frame.nbytes <= self.capacity:
+            self._share(name, frame)
+        return frame
+
+    def _attach(self, name: str):
+        """Take a reference to the block of another session, if there is one."""
+        try:
+            block = _open_block(name)
+        except (FileNotFoundError, PermissionError):
+            return None
+        header = np.ndarray((), _HEADER, block.buf)
+        ready = bool(header["ready"])
+        if ready:
+            header["references"] += 1
+        del header
+        if not ready:
+            # Being written by the session that created it
+            block.close()
+            return None
+        self._keep(name, block)
+        return block
+
+    def _share(self, name: str, frame: np.ndarray) -> None:
+        """Put a decoded frame in a new block."""
+        if frame.ndim > _MAX_NDIM:
+            return
+        with self._locked():
+            try:
+                block = _open_block(name, size=_DATA_OFFSET + max(frame.nbytes, 1))
+            except FileExistsError:
+                # Decoded by another session at the same time
+                return
+            header = np.ndarray((), _HEADER, block.buf)
+            header["references"] = 1
+            header["ndim"] = frame.ndim
+            header["dtype"] = frame.dtype.str.encode()
+            header["shape"][: frame.ndim] = frame.shape
+            np.ndarray(frame.shape, frame.dtype, block.buf, _DATA_OFFSET)[...] = frame
+            header["ready"] = 1
+            del header
+            self._keep(name, block)
+
+    @staticmethod
+    def _frame(block) -> Optional[np.ndarray]:
+        header = np.ndarray((), _HEADER, block.buf)
+        if not header["ready"]:
+            return None
+        shape = tuple(int(n) for n in header["shape"][: int(header["ndim"])])
+        dtype = np.dtype(header["dtype"].item().decode())
+        return np.ndarray(shape, dtype, block.buf, _DATA_OFFSET)
+
+    def _keep(self, name: str, block) -> None:
+        """Reference a block, releasing the least recently used ones beyond the
+        capacity (the lock is held)."""
+        self._blocks[name] = block
+        self.nbytes += block.size
+        while self.nbytes > self.capacity and len(self._blocks) > 1:
+            self._release(*self._blocks.popitem(last=False))
+
+    def _release(self, name: str, block) -> None:
+        """Drop the reference of the session to a block, removing it from shared
+        memory if it was the last one (the lock is held)."""
+        self.nbytes -= block.size
+        header = np.ndarray((), _HEADER, block.buf)
+        header["references"] -= 1
+        last = header["references"] <= 0
+        del header
+        block.close()
+        if last:
+            with suppress(FileNotFoundError):
+                block.unlink()
+
+    def close(self) -> None:
+        """Release all the blocks of the session."""
+        if self._lock_fd < 0:
+            return
+        with self._locked():
+            while self._blocks:
+                self._release(*self._blocks.popitem(last=False))
+        os.close(self._lock_fd)
+        self._lock_fd = -1
+
+
+_cache: Optional[SharedFrameCache] = None
+
+
+def shared_frame_cache() -> Optional[SharedFrameCache]:
+    """The shared frame cache of the process, if it is enabled (and supported)."""
+    global _cache
+    capacity_mb = get_shared_frame_cache_mb()
+    if capacity_mb <= 0 or os.name != "posix":
+        return None
+    if _cache is None:
+        _cache = SharedFrameCache(capacity_mb * 2**20)
+        atexit.register(_cache.close)
+    return _cache
+
+
+def _read_block(file_names: np.ndarray, cache: SharedFrameCache) -> np.ndarray:
+    return cache.read(str(file_names[0]))[np.newaxis]
+
+
+def imread_shared(pattern: str, cache: SharedFrameCache):
+    """Lazily read the images matching `pattern` into a dask array, through the
+    shared frame cache (as `dask_image.imread.imread`)."""
+    import dask.array as da
+    from tifffile import natural_sorted
+
+    file_names = natural_sorted(glob.glob(pattern))
+    first = cache.read(file_names[0])
+    shape = (len(file_names), *first.shape)
+    return da.from_array(np.array(file_names), chunks=(1,)).map_blocks(
+        _read_block,
+        cache=cache,
+        chunks=da.core.normalize_chunks((1, *first.shape), shape),
+        new_axis=list(range(1, len(shape))),
+        meta=np.empty((0,) * len(shape), dtype=first.dtype),
+    )
@@ -0,0 +1,164 @@
+"""
+Intensity statistics of the images of a dataset, for their contrast limits.
+
+The exposure of the film differs a lot between rolls, so a single contrast for
+the whole stack suits few events. The minimum, maximum and histogram of the
+pixels of each view of each image are computed once (in the background, from
+a downsampled image) and cached per dataset, and the contrast limits of each
+event are set from them, without reading pixels when the event is shown.
+
+The frames can also be shown quantised: scaled between their own contrast
+limits to a grey level byte per pixel, which takes a fraction of the memory of
+the decoded (colour) frames in napari's cache and on the graphics card.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Optional
+
+import numpy as np
+
+from ._storage import read_cache, write_cache
+from ._tracing import traced
+
+# Images are downsampled by 2**STATISTICS_LEVEL for their statistics
+STATISTICS_LEVEL = 2
+HISTOGRAM_BINS = 256
+# Percentiles of the pixel values used as contrast limits
+CONTRAST_PERCENTILES = (0.5, 99.5)
+
+
+def default_contrast_limits(dtype) -> tuple[float, float]:
+    """Contrast limits of images of a type whose statistics are unknown, so that
+    napari does not read them to guess."""
+    dtype = np.dtype(dtype)
+    if dtype.kind in "ui":
+        return float(np.iinfo(dtype).min), float(np.iinfo(dtype).max)
+    return 0.0, 1.0
+
+
+@traced
+def frame_statistics(frame, level: int = STATISTICS_LEVEL) -> np.ndarray:
+    """Minimum, maximum and histogram (of HISTOGRAM_BINS bins between them) of
+    the pixel values of a (y, x[, channel]) frame, keeping one pixel in
+    2**level, as one array."""
+    step = 2**level
+    values = np.asarray(frame[::step, ::step], dtype=float).ravel()
+    minimum, maximum = float(values.min()), float(values.max())
+    histogram, _ = np.histogram(
+        values, bins=HISTOGRAM_BINS, range=(minimum, max(maximum, minimum + 1))
+    )
+    return np.concatenate([[minimum, maximum], histogram])
+
+
+def percentiles(statistics: np.ndarray, q) -> np.ndarray:
+    """Percentiles of the pixel values, interpolated in the histogram of
+    `frame_statistics`."""
+    minimum, maximum, histogram = statistics[0], statistics[1], statistics[2:]
+    edges = np.linspace(minimum, max(maximum, minimum + 1), len(histogram) + 1)
+    cumulative = np.concatenate([[0.0], np.cumsum(histogram)])
+    values = np.interp(
+        np.asarray(q, dtype=float) / 100 * cumulative[-1], cumulative, edges
+    )
+    return np.clip(values, minimum, maximum)
+
+
+def contrast_limits(statistics: np.ndarray) -> tuple[float, float]:
+    """Contrast limits from the statistics of a frame: the CONTRAST_PERCENTILES
+    of its pixel values (its full range if they are equal)."""
+    low, high = percentiles(statistics, CONTRAST_PERCENTILES)
+    if high <= low:
+        return float(statistics[0]), float(max(statistics[1], statistics[0] + 1))
+    return float(low), float(high)
+
+
+def quantise_frame(frame: np.ndarray) -> np.ndarray:
+    """Grey levels (uint8) of a (y, x[, channel]) frame, scaled between its
+    contrast limits."""
+    low, high = contrast_limits(frame_statistics(frame))
+    gray = (
+        frame.mean(axis=-1, dtype=np.float32)
+        if frame.ndim == 3
+        else np.asarray(frame, dtype=np.float32)
+    )
+    scaled = (gray - low) * (255 / (high - low))
+    return np.clip(scaled, 0, 255).round().astype(np.uint8)
+
+
+def quantise_block(block: np.ndarray, frame_ndim: int) -> np.ndarray:
+    """Quantise each frame (the last `frame_ndim` axes) of a block."""
+    shape = block.shape[:-1] if frame_ndim == 3 else block.shape
+    quantised = np.empty(shape, dtype=np.uint8)
+    for index in np.ndindex(block.shape[:-frame_ndim]):
+        quantised[index] = quantise_frame(block[index])
+    return quantised
+
+
+def quantised(stack, rgb: bool):
+    """Lazily quantised (view, event, y, x[, channel]) dask `stack` (whose chunks
+    are whole frames), as (view, event, y, x) grey levels: each frame takes a
+    byte per pixel, scaled to its own contrast limits."""
+    return stack.map_blocks(
+        quantise_block,
+        frame_ndim=3 if rgb else 2,
+        drop_axis=stack.ndim - 1 if rgb else [],
+        dtype=np.uint8,
+    )
+
+
+class FrameStatistics:
+    """Intensity statistics of each view of each image of a dataset, cached in a
+    NumPy archive.
+
+    The images are identified by their index in the (unshuffled) dataset, so the
+    cache can be shared by sessions with different shuffling seeds.
+    """
+
+    def __init__(self, file_name: Optional[str] = None):
+        self.file_name = file_name
+        self._statistics: dict[tuple[int, int], np.ndarray] = {}
+        arrays = read_cache(file_name, "frame_statistics", ("keys", "statistics"))
+        for key, statistics in zip(*arrays):
+            self._statistics[(int(key[0]), int(key[1]))] = statistics
+
+    def __contains__(self, image: int) -> bool:
+        return all((image, view) in self._statistics for view in range(3))
+
+    def set(self, image: int, view: int, statistics: np.ndarray) -> None:
+        """Record the statistics of a view of an image."""
+        self._statistics[(image, view)] = np.asarray(statistics, dtype=float)
+
+    def contrast_limits(self, image: int, view: int) -> Optional[tuple[float, float]]:
+        """Contrast limits of a view of an image, if its statistics are known."""
+        statistics = self._statistics.get((image, view))
+        if statistics is None:
+            return None
+        return contrast_limits(statistics)
+
+    def save(self) -> None:
+        """Write the statistics to the cache file."""
+        keys = sorted(self._statistics)
+        write_cache(
+            self.file_name,
+            "frame_statistics",
+            {
+                "keys": np.array(keys, dtype=np.int64).reshape(-1, 2),
+                "statistics": np.array(
+                    [self._statistics[key] for key in keys], dtype=float
+                ).reshape(-1, HISTOGRAM_BINS + 2),
+            },
+        )
+
+
+def compute_statistics(
+    stack, images: list[int], statistics: FrameStatistics
+) -> Iterator[tuple[int, int, np.ndarray]]:
+    """Compute the statistics of the views of each event of `stack` whose image
+    (index in the dataset) is not in `statistics` yet, yielding (image, view,
+    statistics) as they are computed."""
+    for event, image in enumerate(images):
+        if image in statistics:
+            continue
+        for view in range(stack.shape[0]):
+            yield image, view, frame_statistics(stack[view, event])
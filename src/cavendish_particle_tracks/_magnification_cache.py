@@ -0,0 +1,63 @@
+"""
+Magnification parameters measured for the images of a dataset.
+
+The magnification of the film varies between rolls and frames, so each
+calibration is recorded for the image it was measured on, and cached per
+dataset so that it is reused by later sessions on the same dataset.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from ._storage import read_cache, write_cache
+
+
+class MagnificationCache:
+    """Magnification parameters (a, b) per image of a dataset, cached in a
+    NumPy archive.
+
+    The images are identified by their index in the (unshuffled) dataset, so the
+    cache can be shared by sessions with different shuffling seeds.
+    """
+
+    def __init__(self, file_name: Optional[str] = None):
+        self.file_name = file_name
+        self._parameters: dict[int, tuple[float, float]] = {}
+        arrays = read_cache(file_name, "magnifications", ("images", "a", "b"))
+        for image, a, b in zip(*arrays):
+            self._parameters[int(image)] = (float(a), float(b))
+
+    def __len__(self) -> int:
+        return len(self._parameters)
+
+    def get(self, image: int) -> Optional[tuple[float, float]]:
+        """Magnification parameters measured on an image, if any."""
+        return self._parameters.get(image)
+
+    def latest(self) -> Optional[tuple[float, float]]:
+        """The magnification parameters measured last, if any."""
+        if not self._parameters:
+            return None
+        return next(reversed(self._parameters.values()))
+
+    def set(self, image: int, a: float, b: float) -> None:
+        """Record the magnification parameters measured on an image."""
+        # Kept in the order they were measured
+        self._parameters.pop(image, None)
+        self._parameters[image] = (a, b)
+
+    def save(self) -> None:
+        """Write the magnification parameters to the cache file."""
+        images = list(self._parameters)
+        write_cache(
+            self.file_name,
+            "magnifications",
+            {
+                "images": np.array(images, dtype=np.int64),
+                "a": np.array([self._parameters[i][0] for i in images], dtype=float),
+                "b": np.array([self._parameters[i][1] for i in images], dtype=float),
+            },
+        )
@@ -15,6 +15,7 @@ from qtpy.QtWidgets import (
 )
 
 from ._calculate import magnification
+from ._tracing import traced
 from .analysis import (
     FIDUCIAL_BACK,
     FIDUCIAL_FRONT,
@@ -135,21 +136,25 @@ class MagnificationDialog(QDialog):
             combobox.addItems(FIDUCIAL_FRONT.keys())
         return combobox
 
+    @traced
     def _on_click_add_coords_f1(self) -> None:
         """Add first front fiducial"""
         self.f1.name = self.front1_fiducial_combobox.currentText()
         self.f1.x, self.f1.y = self._add_coords(0)
 
+    @traced
     def _on_click_add_coords_f2(self) -> None:
         """Add second front fiducial"""
         self.f2.name = self.front2_fiducial_combobox.currentText()
         self.f2.x, self.f2.y = self._add_coords(1)
 
+    @traced
     def _on_click_add_coords_b1(self) -> None:
         """Add first back fiducial"""
         self.b1.name = self.back1_fiducial_combobox.currentText()
         self.b1.x, self.b1.y = self._add_coords(2)
 
+    @traced
     def _on_click_add_coords_b2(self) -> None:
         """Add second back fiducial"""
         self.b2.name = self.back2_fiducial_combobox.currentText()
@@ -172,6 +177,7 @@ class MagnificationDialog(QDialog):
 
         return selected_points[0]
 
+    @traced
     def _on_click_magnification(self) -> None:
         """When 'Calculate magnification' button is clicked, calculate magnification and populate table"""
 
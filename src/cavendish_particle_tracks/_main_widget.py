@@ -7,37 +7,86 @@ for further analysis.
 """
 
 import glob
+import os
 import pickle
+import sqlite3
 import warnings
+import zipfile
+from typing import Optional
 
-import dask.array
 import napari
 import numpy as np
-from dask_image.imread import imread
+from qtpy.QtCore import Qt, QTimer
 from qtpy.QtWidgets import (
     QAbstractItemView,
+    QCheckBox,
     QComboBox,
     QFileDialog,
     QGridLayout,
     QHBoxLayout,
+    QLineEdit,
     QMessageBox,
     QPushButton,
     QRadioButton,
-    QTableWidget,
-    QTableWidgetItem,
+    QTableView,
     QVBoxLayout,
     QWidget,
 )
 
 from ._calculate import length, radius
-from ._decay_angles_dialog import DecayAnglesDialog
-from ._magnification_dialog import MagnificationDialog
-from ._settings import get_bypass, get_shuffling_seed
-from ._stereoshift_dialog import StereoshiftDialog
+from ._decay_angles_dialog import ANGLES_LAYER_NAME, DecayAnglesDialog
+from ._enhancement import enhanced
+from ._frame_cache import imread_shared, shared_frame_cache
+from ._frame_statistics import (
+    FrameStatistics,
+    compute_statistics,
+    default_contrast_limits,
+    quantised,
+)
+from ._magnification_cache import MagnificationCache
+from ._magnification_dialog import MAGNIFICATION_LAYER_NAME, MagnificationDialog
+from ._memory import MemoryPanel
+from ._particle_table import ParticleFilterModel, ParticleTableModel
+from ._points_index import PointsSliceIndex
+from ._results_store import FLUSH_INTERVAL, WRITE_TIMEOUT, ResultsStore, open_store
+from ._settings import (
+    get_align_views,
+    get_bypass,
+    get_cache_dir,
+    get_display_8bit,
+    get_frame_statistics,
+    get_results_database,
+    get_shuffling_seed,
+)
+from ._stereoshift_dialog import STEREOSHIFT_LAYER_NAME, StereoshiftDialog
+from ._storage import (
+    RESULTS_SUFFIX,
+    SESSION_SUFFIX,
+    Session,
+    dataset_id,
+    file_fingerprint,
+    load_results,
+    load_session,
+    particles_to_arrays,
+    save_results,
+    save_session,
+)
+from ._tracing import span, traced
+from ._view_alignment import ViewTransforms, align_views
 from .analysis import EXPECTED_PARTICLES, VIEW_NAMES, ParticleDecay
+from .kinematics import KINEMATICS_COLUMNS, KINEMATICS_INPUTS, kinematics
 
 MEASUREMENTS_LAYER_NAME = "Radii and Lengths"
 IMAGE_LAYER_NAME = "Bubble Chamber Data"
+# Milliseconds between the writes of the magnification cache
+CACHE_SAVE_INTERVAL = 2000
+# Screen pixels from a double click within which a measurement point is picked
+PICK_DISTANCE = 30
+
+
+def _particle_kinematics(particles: list[ParticleDecay]) -> dict[str, np.ndarray]:
+    """Kinematics columns of the table for the given particles."""
+    return kinematics(particles_to_arrays(particles))
 
 
 class ParticleTracksWidget(QWidget):
@@ -62,6 +111,7 @@ class ParticleTracksWidget(QWidget):
 
         # define QtWidgets
         self.load_button = QPushButton("Load data")
+        self.open_session_button = QPushButton("Open session")
         self.particle_decays_menu = QComboBox()
         self.particle_decays_menu.addItems(EXPECTED_PARTICLES)
         self.particle_decays_menu.setCurrentIndex(0)
@@ -73,6 +123,12 @@ class ParticleTracksWidget(QWidget):
         self.stereoshift_button = QPushButton("Stereoshift")
         self.magnification_button = QPushButton("Magnification")
         self.save_data_button = QPushButton("Save")
+        self.import_results_button = QPushButton("Import results")
+        self.show_kinematics_button = QCheckBox("Show kinematics")
+        self.enhance_button = QCheckBox("Enhance tracks")
+        self.filter_box = QLineEdit()
+        self.filter_box.setPlaceholderText("Filter, e.g. Λ⁰ event:40-90 missing:radius")
+        self.filter_box.setClearButtonEnabled(True)
 
         # setup particle table
         self.table = self._set_up_table()
@@ -80,12 +136,15 @@ class ParticleTracksWidget(QWidget):
         self.table.selectionModel().selectionChanged.connect(
             self._on_row_selection_changed
         )
+        # Memory diagnostics, collapsed by default
+        self.memory_panel = MemoryPanel(self.viewer, self.table_model, self)
         # Apply magnification disabled until the magnification parameters are computed
         self.apply_magnification_button = QRadioButton("Apply magnification")
         self.apply_magnification_button.setEnabled(False)
 
         # connect callbacks
         self.load_button.clicked.connect(self._on_click_load_data)
+        self.open_session_button.clicked.connect(self._on_click_open_session)
         self.delete_particle.clicked.connect(self._on_click_delete_particle)
         self.radius_button.clicked.connect(self._on_click_radius)
         self.length_button.clicked.connect(self._on_click_length)
@@ -94,7 +153,11 @@ class ParticleTracksWidget(QWidget):
         self.apply_magnification_button.toggled.connect(
             self._on_click_apply_magnification
         )
+        self.show_kinematics_button.toggled.connect(self._on_click_show_kinematics)
+        self.enhance_button.toggled.connect(self._on_click_enhance)
         self.save_data_button.clicked.connect(self._on_click_save)
+        self.import_results_button.clicked.connect(self._on_click_import_results)
+        self.filter_box.textChanged.connect(self.table_filter.set_query)
 
         self.magnification_button.clicked.connect(self._on_click_magnification)
         # TODO: find which of thsese works
@@ -105,6 +168,7 @@ class ParticleTracksWidget(QWidget):
         if self.docking_area == "bottom":
             self.buttonbox = QGridLayout()
             self.buttonbox.addWidget(self.load_button, 0, 0)
+            self.buttonbox.addWidget(self.open_session_button, 0, 1)
             self.buttonbox.addWidget(self.particle_decays_menu, 1, 0)
             self.buttonbox.addWidget(self.delete_particle, 1, 1)
             self.buttonbox.addWidget(self.radius_button, 2, 0)
@@ -114,25 +178,38 @@ class ParticleTracksWidget(QWidget):
             self.buttonbox.addWidget(self.magnification_button, 4, 0)
             self.buttonbox.addWidget(self.apply_magnification_button, 4, 1)
             self.buttonbox.addWidget(self.save_data_button, 5, 0)
+            self.buttonbox.addWidget(self.import_results_button, 5, 1)
+            self.buttonbox.addWidget(self.show_kinematics_button, 6, 0)
+            self.buttonbox.addWidget(self.enhance_button, 6, 1)
+            self.buttonbox.addWidget(self.memory_panel, 7, 0, 1, 2)
 
             layout_outer = QHBoxLayout()
             self.setLayout(layout_outer)
             layout_outer.addLayout(self.buttonbox)
-            self.layout().addWidget(self.table)
+            layout_table = QVBoxLayout()
+            layout_table.addWidget(self.filter_box)
+            layout_table.addWidget(self.table)
+            layout_outer.addLayout(layout_table)
 
         else:
             self.buttonbox = QVBoxLayout()
             self.buttonbox.addWidget(self.load_button)
+            self.buttonbox.addWidget(self.open_session_button)
             self.buttonbox.addWidget(self.particle_decays_menu)
             self.buttonbox.addWidget(self.delete_particle)
             self.buttonbox.addWidget(self.radius_button)
             self.buttonbox.addWidget(self.length_button)
             self.buttonbox.addWidget(self.decay_angles_button)
+            self.buttonbox.addWidget(self.filter_box)
             self.buttonbox.addWidget(self.table)
             self.buttonbox.addWidget(self.apply_magnification_button)
+            self.buttonbox.addWidget(self.show_kinematics_button)
+            self.buttonbox.addWidget(self.enhance_button)
             self.buttonbox.addWidget(self.stereoshift_button)
             self.buttonbox.addWidget(self.magnification_button)
             self.buttonbox.addWidget(self.save_data_button)
+            self.buttonbox.addWidget(self.import_results_button)
+            self.buttonbox.addWidget(self.memory_panel)
             self.setLayout(self.buttonbox)
 
         # Disable some native napari controls
@@ -147,8 +224,44 @@ class ParticleTracksWidget(QWidget):
         self.set_UI_image_loaded(False, self.bypass_force_load_data)
         # TODO: include self.stsh in the logic, depending on what it actually ends up doing
 
-        # Data analysis
-        self.data: list[ParticleDecay] = []
+        # Data analysis (the particles are held by the table model, see `data`)
+        # Index of the measurement points by slice, see `_setup_measurement_layer`
+        self.measurement_index: Optional[PointsSliceIndex] = None
+        # Description of the loaded dataset (folder and image files per view)
+        self.manifest: dict = {}
+        # Index in the dataset of the image of each event (they are shuffled)
+        self.shuffling_indices = np.arange(0)
+        # The images as decoded, see `_displayed_stack` for those shown
+        self._raw_image_stack = None
+        self._quantise_display = False
+        # Transforms between the views of each image, see `_start_view_alignment`
+        self.view_transforms = ViewTransforms()
+        self._view_alignment_worker = None
+        # Intensity statistics of each image, for the contrast limits of each event
+        self.frame_statistics = FrameStatistics()
+        self._frame_statistics_worker = None
+        self.viewer.dims.events.current_step.connect(self._update_contrast_limits)
+        # Magnification parameters measured on each image of the dataset, written
+        # to the cache at most once per CACHE_SAVE_INTERVAL (and when closing)
+        self.magnifications = MagnificationCache()
+        self._magnifications_timer = QTimer(self)
+        self._magnifications_timer.setSingleShot(True)
+        self._magnifications_timer.setInterval(CACHE_SAVE_INTERVAL)
+        self._magnifications_timer.timeout.connect(self._save_magnifications)
+        # Shared database the table is written to (if set), see `_load_data`.
+        # The changes to the table are written at most once per FLUSH_INTERVAL.
+        self.results_store: Optional[ResultsStore] = None
+        self._results_store_timer = QTimer(self)
+        self._results_store_timer.setSingleShot(True)
+        self._results_store_timer.setInterval(FLUSH_INTERVAL)
+        self._results_store_timer.timeout.connect(self._write_results_store)
+        for signal in (
+            self.table_model.modelReset,
+            self.table_model.rowsInserted,
+            self.table_model.rowsRemoved,
+            self.table_model.dataChanged,
+        ):
+            signal.connect(self._schedule_results_store_write)
         # might not need this eventually
         self.mag_a = -1.0
         self.mag_b = 0.0
@@ -158,11 +271,39 @@ class ParticleTracksWidget(QWidget):
         self.stereoshift_dlg: StereoshiftDialog | None = None
         self.decay_angles_dlg: DecayAnglesDialog | None = None
 
-        @self.viewer.layers.events.connect
-        def _on_layerlist_changed(event):
-            """When the layer list changes, update the button availability"""
+        # UI state: whether the data is loaded is tracked from the layers added
+        # and removed, and bursts of layer and selection events are coalesced so
+        # that the buttons are updated at most once per event loop iteration.
+        self._image_loaded = IMAGE_LAYER_NAME in self.viewer.layers
+        self._button_availability_timer = QTimer(self)
+        self._button_availability_timer.setSingleShot(True)
+        self._button_availability_timer.setInterval(0)
+        self._button_availability_timer.timeout.connect(self._update_button_availability)
+        self.viewer.layers.events.inserted.connect(self._on_layer_inserted)
+        self.viewer.layers.events.removed.connect(self._on_layer_removed)
+        if self._image_loaded:
+            self.set_button_availability()
+
+    def _on_layer_inserted(self, event) -> None:
+        """When the data is loaded, update the button availability"""
+        if event.value.name == IMAGE_LAYER_NAME:
+            self._image_loaded = True
             self.set_button_availability()
 
+    def _on_layer_removed(self, event) -> None:
+        """When the data is removed, update the button availability"""
+        if event.value.name == IMAGE_LAYER_NAME:
+            self._image_loaded = IMAGE_LAYER_NAME in self.viewer.layers
+            if not self._image_loaded:
+                self._raw_image_stack = None
+                self._close_results_store()
+            self.set_button_availability()
+
+    def showEvent(self, event):
+        """When the widget is shown again, reopen the results database."""
+        super().showEvent(event)
+        self._open_results_store()
+
     def hideEvent(self, event):
         """When the widget is 'closed' (napari just hides it), show the layer buttons again.
         If data has been recorded, prompt the user to save it before closing the widget.
@@ -174,6 +315,9 @@ class ParticleTracksWidget(QWidget):
             warnings.simplefilter(action="ignore", category=FutureWarning)
             self.viewer.window._qt_viewer.layerButtons.show()
             self.viewer.window._qt_viewer.viewerButtons.show()
+        self._close_results_store()
+        if self._magnifications_timer.isActive():
+            self._save_magnifications()
         super().hideEvent(event)
 
     def _confirm_save_before_closing(self):
@@ -191,6 +335,36 @@ class ParticleTracksWidget(QWidget):
         if reply == QMessageBox.Yes:
             self._on_click_save()
 
+    @property
+    def data(self) -> list[ParticleDecay]:
+        """The particles in the table."""
+        return self.table_model.particles
+
+    @data.setter
+    def data(self, particles: list[ParticleDecay]) -> None:
+        self.table_model.set_particles(particles)
+
+    @property
+    def image_stack(self):
+        """The (view, event, y, x) stack of images as decoded (not as shown), if
+        loaded."""
+        if not self._image_loaded:
+            return None
+        if self._raw_image_stack is not None:
+            return self._raw_image_stack
+        return self.viewer.layers[IMAGE_LAYER_NAME].data
+
+    def _displayed_stack(self):
+        """The stack of images shown: enhanced (lazily, as it is shown) if
+        `Enhance tracks` is ticked, and quantised to bytes if set at loading."""
+        stack = self._raw_image_stack
+        rgb = stack.ndim == 5
+        if self.enhance_button.isChecked():
+            stack = enhanced(stack, rgb=rgb)
+        if self._quantise_display:
+            stack = quantised(stack, rgb=rgb)
+        return stack
+
     @property
     def camera_center(self):
         # update for 4d implementation as appropriate.
@@ -198,41 +372,53 @@ class ParticleTracksWidget(QWidget):
 
     def _get_selected_points(self, layer_name=MEASUREMENTS_LAYER_NAME) -> np.array:
         """Returns array of selected points in the viewer"""
-
-        # Filtering selected layer (layer names are unique)
-        points_layers = [
-            layer for layer in self.viewer.layers if layer.name == layer_name
-        ]
-        # Returning selected points in the layer
-        selected_points = np.array(
-            [points_layers[0].data[i] for i in points_layers[0].selected_data]
-        )
-        return selected_points
+        # Layer names are unique
+        layer = self.viewer.layers[layer_name]
+        return layer.data[list(layer.selected_data)]
 
     def _get_selected_row(self) -> np.array:
-        """Returns the selected row in the table.
+        """Returns the selected row in the table, as the index of the particle in
+        `data` (the table may be sorted and filtered).
 
         Note: due to our selection mode only one row selection is possible.
         """
         select = self.table.selectionModel()
         rows = select.selectedRows()
-        return rows[0].row()
-
-    def _set_up_table(self) -> QTableWidget:
-        """Initial setup of the QTableWidget with one row and columns for each
-        point and the calculated radius.
+        return self.table_filter.mapToSource(rows[0]).row()
+
+    def _select_particle(self, row: int) -> None:
+        """Select the row of the particle `data[row]` in the table, clearing the
+        filter if it hides the particle."""
+        index = self.table_filter.mapFromSource(self.table_model.index(row, 0))
+        if not index.isValid():
+            self.filter_box.clear()
+            index = self.table_filter.mapFromSource(self.table_model.index(row, 0))
+        self.table.selectRow(index.row())
+
+    def _set_up_table(self) -> QTableView:
+        """Initial setup of the particle table, with columns for each of the
+        particle variables, the magnification and the kinematics.
         """
         np = ParticleDecay()
-        self.columns = list(np.vars_to_save())
-        self.columns += ["magnification"]
+        self.table_model = ParticleTableModel(
+            list(np.vars_to_save()) + ["magnification"],
+            KINEMATICS_COLUMNS,
+            KINEMATICS_INPUTS,
+            self,
+        )
+        self.columns = self.table_model.columns
         self.columns_show_calibrated = np.vars_to_show(True)
         self.columns_show_uncalibrated = np.vars_to_show(False)
-        out = QTableWidget(0, len(self.columns))
-        out.setHorizontalHeaderLabels(self.columns)
+        self.table_filter = ParticleFilterModel(self)
+        self.table_filter.setSourceModel(self.table_model)
+        out = QTableView()
+        out.setModel(self.table_filter)
+        # Sortable by clicking on the headers, initially in the order of `data`
+        out.setSortingEnabled(True)
+        out.sortByColumn(-1, Qt.AscendingOrder)
         out.setSelectionBehavior(QAbstractItemView.SelectRows)
         out.setSelectionMode(QAbstractItemView.SingleSelection)
         out.setEditTriggers(QAbstractItemView.NoEditTriggers)
-        out.setSelectionBehavior(QTableWidget.SelectRows)
         return out
 
     def _set_table_visible_vars(self, calibrated) -> None:
@@ -241,30 +427,41 @@ class ParticleTracksWidget(QWidget):
         show = (
             self.columns_show_calibrated if calibrated else self.columns_show_uncalibrated
         )
+        if self.show_kinematics_button.isChecked():
+            show = show + KINEMATICS_COLUMNS
         show_index = [i for i, item in enumerate(self.columns) if item in set(show)]
         for _ in show_index:
             self.table.setColumnHidden(_, False)
 
     def _get_table_column_index(self, columntext: str) -> int:
         """Given a column title, return the column index in the table"""
-        for i, item in enumerate(self.columns):
-            if item == columntext:
-                return i
-
-        print("Column ", columntext, " not in the table")
-        return -1
+        index = self.table_model.column_index(columntext)
+        if index == -1:
+            print("Column ", columntext, " not in the table")
+        return index
 
+    @traced
     def _on_row_selection_changed(self) -> None:
-        """Enable/disable calculation buttons depending on the row selection"""
+        """Enable/disable calculation buttons depending on the row selection,
+        and move to the event of a particle picked from a filtered table."""
         self.set_button_availability()
+        if not self.table_filter.query or not self._image_loaded:
+            return
+        if not self.table.selectionModel().selectedRows():
+            return
+        event_number = self.data[self._get_selected_row()].event_number
+        if event_number >= 0:
+            self.viewer.dims.set_current_step(1, event_number)
 
     def set_button_availability(self) -> None:
-        images_imported = False
-        for layer in self.viewer.layers:
-            if layer.name == IMAGE_LAYER_NAME:
-                images_imported = True
-                break
-        self.set_UI_image_loaded(images_imported, self.bypass_force_load_data)
+        """Schedule an update of the button availability. Repeated calls before
+        control returns to the event loop result in a single update."""
+        self._button_availability_timer.start()
+
+    def _update_button_availability(self) -> None:
+        """Enable/disable the buttons depending on whether the data is loaded and
+        on the selected particle"""
+        self.set_UI_image_loaded(self._image_loaded, self.bypass_force_load_data)
         try:
             selected_row = self._get_selected_row()
             self.save_data_button.setEnabled(True)
@@ -297,11 +494,15 @@ class ParticleTracksWidget(QWidget):
             return
         if loaded:
             self.load_button.setEnabled(False)
+            self.open_session_button.setEnabled(False)
             self.particle_decays_menu.setEnabled(True)
+            self.import_results_button.setEnabled(True)
             self.magnification_button.setEnabled(True)
         else:
             self.load_button.setEnabled(True)
+            self.open_session_button.setEnabled(True)
             self.particle_decays_menu.setEnabled(False)
+            self.import_results_button.setEnabled(False)
             self.delete_particle.setEnabled(False)
             self.radius_button.setEnabled(False)
             self.length_button.setEnabled(False)
@@ -311,20 +512,21 @@ class ParticleTracksWidget(QWidget):
             self.magnification_button.setEnabled(False)
             self.apply_magnification_button.setEnabled(False)
 
-    def _selected_points_are_on_current_slice(self, selected_points) -> bool:
-        """Check that the selected points are in the current slice of the viewer"""
+    def _selected_points_are_on_current_slice(self) -> bool:
+        """Check that the selected measurement points are in the current slice of
+        the viewer (from the index of their slices)"""
+        layer = self._setup_measurement_layer()
+        point_slices = self.measurement_index.slice_of(layer.selected_data)
         for slice_index, data_slice in enumerate(["View", "Event"]):
             current_slice = self.viewer.dims.current_step[slice_index]
-            all_points_in_current_slice = all(
-                current_slice == point[slice_index] for point in selected_points
-            )
-            if not all_points_in_current_slice:
+            if not np.all(point_slices[:, slice_index] == current_slice):
                 napari.utils.notifications.show_error(
                     f"Measurement points not in current {data_slice}. Measurement not completed."
                 )
                 return False
         return True
 
+    @traced
     def _on_click_radius(self) -> None:
         """When the 'Calculate radius' button is clicked, calculate the radius
         for the currently selected points and assign it to the currently selected table row.
@@ -343,7 +545,7 @@ class ParticleTracksWidget(QWidget):
             return
         else:
 
-            if not self._selected_points_are_on_current_slice(selected_points):
+            if not self._selected_points_are_on_current_slice():
                 return
 
             selected_points_xy = [point[2:] for point in selected_points]
@@ -360,36 +562,18 @@ class ParticleTracksWidget(QWidget):
             # Assigns the points and radius to the selected row
             self.data[selected_row].rpoints = selected_points_xy
 
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("rpoints"),
-                QTableWidgetItem(str(self.data[selected_row].rpoints)),
-            )
-
             print("calculating radius!")
             self.data[selected_row].radius_px = radius(*selected_points_xy)
 
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("radius_px"),
-                QTableWidgetItem(str(self.data[selected_row].radius_px)),
-            )
-
-            ## Add the calibrated radius to the table
-            self.data[selected_row].radius_cm = (
-                self.data[selected_row].magnification * self.data[selected_row].radius_px
-            )
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("radius_cm"),
-                QTableWidgetItem(str(self.data[selected_row].radius_cm)),
-            )
+            ## Calibrate the radius and update the table
+            self.table_model.invalidate([selected_row], ["rpoints", "radius_px"])
 
             napari.utils.notifications.show_info(
                 "Radius added to particle " + str(selected_row)
             )
             print(self.data[selected_row])
 
+    @traced
     def _on_click_length(self) -> None:
         """When the 'Calculate length' button is clicked, calculate the decay length
         for the currently selected table row.
@@ -408,7 +592,7 @@ class ParticleTracksWidget(QWidget):
             return
         else:
 
-            if not self._selected_points_are_on_current_slice(selected_points):
+            if not self._selected_points_are_on_current_slice():
                 return
 
             selected_points_xy = [point[2:] for point in selected_points]
@@ -428,36 +612,18 @@ class ParticleTracksWidget(QWidget):
             print(f"Adding points to the table: {selected_points_xy}")
             self.data[selected_row].dpoints = selected_points_xy
 
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("dpoints"),
-                QTableWidgetItem(str(self.data[selected_row].dpoints)),
-            )
-
             print("calculating decay length!")
             self.data[selected_row].decay_length_px = length(*selected_points)
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("decay_length_px"),
-                QTableWidgetItem(str(self.data[selected_row].decay_length_px)),
-            )
 
-            ## Add the calibrated decay length to the table
-            self.data[selected_row].decay_length_cm = (
-                self.data[selected_row].magnification
-                * self.data[selected_row].decay_length_px
-            )
-            self.table.setItem(
-                selected_row,
-                self._get_table_column_index("decay_length_cm"),
-                QTableWidgetItem(str(self.data[selected_row].decay_length_cm)),
-            )
+            ## Calibrate the decay length and update the table
+            self.table_model.invalidate([selected_row], ["dpoints", "decay_length_px"])
 
             napari.utils.notifications.show_info(
                 "Decay length added to particle " + str(selected_row)
             )
             print(self.data[selected_row])
 
+    @traced
     def _on_click_decay_angles(self) -> DecayAnglesDialog:
         """When the 'Calculate decay angles' buttong is clicked, open the decay angles dialog"""
         if self.decay_angles_dlg is not None:
@@ -469,6 +635,7 @@ class ParticleTracksWidget(QWidget):
         self.decay_angles_dlg.show()
         return self.decay_angles_dlg
 
+    @traced
     def _on_click_stereoshift(self) -> StereoshiftDialog:
         """When the 'Calculate stereoshift' button is clicked, open stereoshift dialog."""
         # Different behaviour to the Magnification dialog, waiting for the definition of the stereoshift layer structure
@@ -481,6 +648,7 @@ class ParticleTracksWidget(QWidget):
         self.stereoshift_dlg.show()
         return self.stereoshift_dlg
 
+    @traced
     def _on_click_load_data(self) -> None:
         """When the 'Load data' button is clicked, a dialog opens to select the folder containing the data.
         The folder should contain three subfolders named as variations of 'view1', 'view2' and 'view3', and each subfolder should contain the same number of images.
@@ -503,20 +671,39 @@ class ParticleTracksWidget(QWidget):
         if folder_name in {"", None}:
             return
 
-        folder_subdirs = glob.glob(folder_name + "/*/")
-        # Checks whether the image folder contains a subdirectory for each view.
-        three_subdirectories = len(folder_subdirs) == 3
-        # Checks that these subdirectories correspond to event views.
-        subdir_names_contain_views = all(
-            any(view in name.lower() for name in folder_subdirs) for view in VIEW_NAMES
-        )
-        # Checks that each subdirectory contains the same number of images.
-        image_count_first = len(glob.glob(folder_subdirs[0] + "/*"))
-        more_than_one_image = image_count_first > 1
-        same_image_count = all(
-            len(glob.glob(subdir + "/*")) == image_count_first
-            for subdir in folder_subdirs
-        )
+        self._load_data(folder_name)
+
+    @traced
+    def _load_data(
+        self, folder_name: str, subdir_names: Optional[list[str]] = None
+    ) -> bool:
+        """Load the images in the three view subfolders of `folder_name`.
+
+        The subfolders are found by globbing unless `subdir_names` is given (e.g.
+        when resuming a session, so that the views are stacked in the same order).
+        Returns whether the data was loaded.
+        """
+        with span("scan folders", folder=folder_name):
+            if subdir_names is None:
+                folder_subdirs = glob.glob(folder_name + "/*/")
+            else:
+                folder_subdirs = [
+                    os.path.join(folder_name, name) + os.sep for name in subdir_names
+                ]
+            # Checks whether the image folder contains a subdirectory for each view.
+            three_subdirectories = len(folder_subdirs) == 3
+            # Checks that these subdirectories correspond to event views.
+            subdir_names_contain_views = all(
+                any(view in name.lower() for name in folder_subdirs)
+                for view in VIEW_NAMES
+            )
+            # Checks that each subdirectory contains the same number of images.
+            image_count_first = len(glob.glob(folder_subdirs[0] + "/*"))
+            more_than_one_image = image_count_first > 1
+            same_image_count = all(
+                len(glob.glob(subdir + "/*")) == image_count_first
+                for subdir in folder_subdirs
+            )
         # If all checks are passed, load the images where the event number is a
         # new spatial dimension (stack) and the views are layers.
         if not (
@@ -533,7 +720,7 @@ class ParticleTracksWidget(QWidget):
                 "The data folder must contain three subfolders, one for each view, and each subfolder must contain the same number (>1) of images."
             )
             self.msg.show()
-            return
+            return False
 
         def crop(array):
             # Crops view 1 and 2 to same size as view 3 by removing whitespace
@@ -547,21 +734,60 @@ class ParticleTracksWidget(QWidget):
             image_count_first
         )
 
+        self.shuffling_indices = shuffling_indices
+
+        # dask-image is only imported when data is loaded (it is slow to import)
+        import dask.array
+        from dask_image.imread import imread
+
+        # Frames decoded by the other sessions on this computer, if shared
+        frame_cache = shared_frame_cache()
         stacks = []
-        for subdir in folder_subdirs:
-            stack: dask.array.Array = imread(subdir + "/*")
-            stack = crop(stack)
-            # Shuffle each view stack in the same way
-            stack = stack[shuffling_indices]
-            stacks.append(stack)
+        with span("open image stacks"):
+            for subdir in folder_subdirs:
+                if frame_cache is not None:
+                    stack: dask.array.Array = imread_shared(subdir + "/*", frame_cache)
+                else:
+                    stack = imread(subdir + "/*")
+                stack = crop(stack)
+                # Shuffle each view stack in the same way
+                stack = stack[shuffling_indices]
+                stacks.append(stack)
 
         # Concatenate stacks along new spatial dimension such that we have a view, and event slider
-        concatenated_stack = dask.array.stack(stacks, axis=0)
-        self.viewer.add_image(concatenated_stack, name=IMAGE_LAYER_NAME)
-        self.viewer.dims.axis_labels = ("View", "Event", "Y", "X")
+        self._raw_image_stack = dask.array.stack(stacks, axis=0)
+        # Whether the layer shows grey level bytes (the layer cannot change its
+        # type or colour channels later)
+        self._quantise_display = get_display_8bit()
+        concatenated_stack = self._displayed_stack()
+
+        # Record what was loaded so that a session can be resumed on the same dataset
+        file_names = [sorted(glob.glob(subdir + "/*")) for subdir in folder_subdirs]
+        self.manifest = {
+            "folder": folder_name,
+            "subdirs": [os.path.basename(os.path.normpath(d)) for d in folder_subdirs],
+            "files": [[os.path.basename(f) for f in files] for files in file_names],
+            # Tell apart the datasets with the same file names, for the caches
+            "fingerprints": [file_fingerprint(files) for files in file_names],
+        }
+        self.frame_statistics = FrameStatistics(
+            os.path.join(
+                get_cache_dir(), dataset_id(self.manifest) + "_frame_statistics.npz"
+            )
+        )
+
+        with span("show first event"):
+            # napari reads the first event to estimate the contrast limits,
+            # unless they are known
+            self.viewer.add_image(
+                concatenated_stack,
+                name=IMAGE_LAYER_NAME,
+                contrast_limits=self._initial_contrast_limits(concatenated_stack.dtype),
+            )
+            self.viewer.dims.axis_labels = ("View", "Event", "Y", "X")
 
-        # Move to the first event in the series
-        self.viewer.dims.set_current_step(1, 0)
+            # Move to the first event in the series
+            self.viewer.dims.set_current_step(1, 0)
 
         # Create measurements layer if not already there
         self.layer_measurements = self._setup_measurement_layer()
@@ -569,20 +795,235 @@ class ParticleTracksWidget(QWidget):
         # Disable the load button after loading the data (interim solution until we can move to bottom-docked UI)
         self.load_button.setEnabled(False)
 
+        self.view_transforms = ViewTransforms(
+            os.path.join(
+                get_cache_dir(), dataset_id(self.manifest) + "_view_transforms.npz"
+            )
+        )
+        self.magnifications = MagnificationCache(
+            os.path.join(
+                get_cache_dir(), dataset_id(self.manifest) + "_magnification.npz"
+            )
+        )
+        latest = self.magnifications.latest()
+        if latest is not None:
+            # Magnifications measured in earlier sessions are used for new particles
+            self.mag_a, self.mag_b = latest
+            self.apply_magnification_button.setEnabled(True)
+        if get_align_views():
+            self._start_view_alignment()
+        self._update_contrast_limits()
+        if get_frame_statistics():
+            self._start_frame_statistics()
+        self._open_results_store()
+        self._update_results_store_session()
+        return True
+
+    def _open_results_store(self) -> None:
+        """Open the results database (if it is set) for the dataset loaded."""
+        if self.results_store is not None or not self._image_loaded:
+            return
+        self.results_store = open_store(
+            get_results_database(),
+            seed=self.shuffling_seed,
+            dataset=dataset_id(self.manifest),
+            timeout=WRITE_TIMEOUT,
+        )
+
+    def _close_results_store(self) -> None:
+        """Write the pending changes to the results database, and close it."""
+        if self.results_store is None:
+            return
+        if self._results_store_timer.isActive():
+            self._results_store_timer.stop()
+            self._write_results_store()
+        self.results_store.close()
+        self.results_store = None
+
+    def _update_results_store_session(self) -> None:
+        """Record the seed and dataset of the session in the results database."""
+        if self.results_store is None:
+            return
+        self.results_store.seed = self.shuffling_seed
+        if self.manifest:
+            self.results_store.dataset = dataset_id(self.manifest)
+        self._schedule_results_store_write()
+
+    def _schedule_results_store_write(self, *args) -> None:
+        """Write the table to the results database soon, if there is one."""
+        if self.results_store is not None and not self._results_store_timer.isActive():
+            self._results_store_timer.start()
+
+    def _write_results_store(self) -> None:
+        """Write the table to the results database."""
+        if self.results_store is None:
+            return
+        try:
+            written = self.results_store.write(self.data)
+        except sqlite3.Error as error:
+            napari.utils.notifications.show_warning(
+                f"Could not write to the results database: {error}"
+            )
+        else:
+            if not written:
+                # Another session is writing: try again at the next flush
+                self._results_store_timer.start()
+
+    def _start_view_alignment(self) -> None:
+        """Estimate the transforms between the views of the events not in the
+        cache yet, in a background thread."""
+        from napari.qt.threading import create_worker
+
+        if self._view_alignment_worker is not None:
+            self._view_alignment_worker.quit()
+        worker = create_worker(
+            align_views,
+            self.image_stack,
+            [int(image) for image in self.shuffling_indices],
+            self.view_transforms,
+        )
+        transforms = self.view_transforms
+
+        def on_yielded(result):
+            image, view, matrix = result
+            transforms.set(image, view, matrix)
+
+        worker.yielded.connect(on_yielded)
+        worker.finished.connect(transforms.save)
+        self._view_alignment_worker = worker
+        worker.start()
+
+    def _start_frame_statistics(self) -> None:
+        """Compute the intensity statistics of the events not in the cache yet,
+        in a background thread."""
+        from napari.qt.threading import create_worker
+
+        if self._frame_statistics_worker is not None:
+            self._frame_statistics_worker.quit()
+        worker = create_worker(
+            compute_statistics,
+            self.image_stack,
+            [int(image) for image in self.shuffling_indices],
+            self.frame_statistics,
+        )
+        statistics = self.frame_statistics
+
+        def on_yielded(result):
+            image, view, frame_statistics = result
+            statistics.set(image, view, frame_statistics)
+            if (view, image) == self._shown_image():
+                self._update_contrast_limits()
+
+        worker.yielded.connect(on_yielded)
+        worker.finished.connect(statistics.save)
+        self._frame_statistics_worker = worker
+        worker.start()
+
+    def _shown_image(self) -> tuple[int, Optional[int]]:
+        """The view shown, and the index in the dataset of the image of the event
+        shown."""
+        view, event = self.viewer.dims.current_step[:2]
+        return view, self._image_index(event)
+
+    def _initial_contrast_limits(self, dtype) -> Optional[tuple[float, float]]:
+        """Contrast limits of the images when they are loaded, if they are known:
+        the full range of the enhanced and quantised images, or spanning those of
+        the views of the first event if their statistics are cached."""
+        if self.enhance_button.isChecked() or self._quantise_display:
+            return default_contrast_limits(dtype)
+        image = int(self.shuffling_indices[0])
+        limits = [self.frame_statistics.contrast_limits(image, view) for view in range(3)]
+        if any(view_limits is None for view_limits in limits):
+            return None
+        lows, highs = zip(*limits)
+        return min(lows), max(highs)
+
+    def _update_contrast_limits(self, *args) -> bool:
+        """Set the contrast limits of the images to those of the view of the event
+        shown, if its statistics are known (no pixels are read). Returns whether
+        they were set."""
+        if not self._image_loaded or self.viewer.dims.ndim < 4:
+            return False
+        if self.enhance_button.isChecked() or self._quantise_display:
+            # The enhanced images span the range of their type, and the
+            # quantised images are scaled to their own contrast limits
+            return False
+        view, image = self._shown_image()
+        if image is None:
+            return False
+        limits = self.frame_statistics.contrast_limits(image, view)
+        if limits is None:
+            return False
+        self.viewer.layers[IMAGE_LAYER_NAME].contrast_limits = limits
+        return True
+
+    def _image_index(self, event: int) -> Optional[int]:
+        """Index in the dataset of the image of an event."""
+        if not 0 <= event < len(self.shuffling_indices):
+            return None
+        return int(self.shuffling_indices[event])
+
+    def view_transform(
+        self, event: int, from_view: int, to_view: int
+    ) -> Optional[np.ndarray]:
+        """Affine transform between the (y, x) pixels of two views of an event,
+        if it has been estimated."""
+        image = self._image_index(event)
+        if image is None:
+            return None
+        return self.view_transforms.get(image, from_view, to_view)
+
+    def _magnification_for(self, event: int) -> tuple[float, float]:
+        """Magnification parameters measured on the image of an event, or else
+        the last ones measured on the dataset, or else the current ones."""
+        image = self._image_index(event)
+        parameters = None if image is None else self.magnifications.get(image)
+        if parameters is None:
+            parameters = self.magnifications.latest()
+        return (self.mag_a, self.mag_b) if parameters is None else parameters
+
     def _setup_measurement_layer(self):
         """Create a Points layer for the measurement of the radii and lengths."""
 
         if MEASUREMENTS_LAYER_NAME in self.viewer.layers:
-            return self.viewer.layers[MEASUREMENTS_LAYER_NAME]
+            layer = self.viewer.layers[MEASUREMENTS_LAYER_NAME]
         else:
-            return self.viewer.add_points(
+            layer = self.viewer.add_points(
                 name=MEASUREMENTS_LAYER_NAME,
                 ndim=4,
                 size=20,
                 border_width=7,
                 border_width_is_relative=False,
             )
-
+        # Index of the points by (view, event), for queries on the current slice
+        if self.measurement_index is None or self.measurement_index.layer is not layer:
+            self.measurement_index = PointsSliceIndex(layer)
+            layer.mouse_double_click_callbacks.append(self._on_double_click_measurements)
+        return layer
+
+    def _on_double_click_measurements(self, layer, event) -> None:
+        """In select mode, select the measurement point of the current slice
+        nearest to a double click (the points can be tiny when zoomed out)."""
+        if layer.mode != "select":
+            return
+        position = np.asarray(event.position)[-2:]
+        point = self._nearest_measurement_point(
+            position, max_distance=PICK_DISTANCE / max(self.viewer.camera.zoom, 1e-6)
+        )
+        if point is not None:
+            layer.selected_data = {point}
+
+    def _nearest_measurement_point(
+        self, position, max_distance: float = np.inf
+    ) -> Optional[int]:
+        """Id of the measurement point of the current slice nearest to the (y, x)
+        `position`, or None."""
+        if self.measurement_index is None:
+            return None
+        view, event = self.viewer.dims.current_step[:2]
+        return self.measurement_index.nearest(view, event, position, max_distance)
+
+    @traced
     def _on_click_new_particle(self) -> None:
         """When the 'New particle' button is clicked, append a new blank row to
         the table and select the first cell ready to recieve the first point.
@@ -594,8 +1035,6 @@ class ParticleTracksWidget(QWidget):
         new_particle = ParticleDecay()
         new_particle.name = self.particle_decays_menu.currentText()
         new_particle.index = self.particle_decays_menu.currentIndex()
-        new_particle.magnification_a = self.mag_a
-        new_particle.magnification_b = self.mag_b
 
         # Record the event and view number if the data has been loaded
         # Potentially this could be used to check the measurements are done in the right event
@@ -603,36 +1042,19 @@ class ParticleTracksWidget(QWidget):
         if data_has_been_loaded:
             new_particle.event_number = self.viewer.dims.current_step[1]
             new_particle.view_number = self.viewer.dims.current_step[0]
-
-        self.data += [new_particle]
+        (
+            new_particle.magnification_a,
+            new_particle.magnification_b,
+        ) = self._magnification_for(new_particle.event_number)
 
         # add particle (== new row) to the table and select it
-        self.table.insertRow(self.table.rowCount())
-        self.table.selectRow(self.table.rowCount() - 1)
-        self.table.setItem(
-            self.table.rowCount() - 1,
-            self._get_table_column_index("index"),
-            QTableWidgetItem(str(new_particle.index)),
-        )
-        self.table.setItem(
-            self.table.rowCount() - 1,
-            self._get_table_column_index("name"),
-            QTableWidgetItem(new_particle.name),
-        )
-        self.table.setItem(
-            self.table.rowCount() - 1,
-            self._get_table_column_index("event_number"),
-            QTableWidgetItem(str(new_particle.event_number)),
-        )
-        self.table.setItem(
-            self.table.rowCount() - 1,
-            self._get_table_column_index("magnification"),
-            QTableWidgetItem(str(new_particle.magnification)),
-        )
+        self.table_model.append_particles([new_particle])
+        self._select_particle(len(self.data) - 1)
 
         print(self.data[-1])
         self.particle_decays_menu.setCurrentIndex(0)
 
+    @traced
     def _on_click_delete_particle(self) -> None:
         """Delete particle from table and data"""
         try:
@@ -648,9 +1070,9 @@ class ParticleTracksWidget(QWidget):
             return_code = confirmation_dialog.exec()
 
             if return_code == QMessageBox.Yes:
-                del self.data[selected_row]
-                self.table.removeRow(selected_row)
+                self.table_model.remove_particle(selected_row)
 
+    @traced
     def _on_click_magnification(self) -> MagnificationDialog:
         """When the 'Calculate magnification' button is clicked, open the magnification dialog"""
         if self.mag_dlg is not None:
@@ -662,47 +1084,77 @@ class ParticleTracksWidget(QWidget):
         self.mag_dlg.show()
         return self.mag_dlg
 
+    def _save_magnifications(self) -> None:
+        """Write the magnification parameters to the cache of the dataset."""
+        self._magnifications_timer.stop()
+        try:
+            self.magnifications.save()
+        except OSError as error:
+            napari.utils.notifications.show_warning(
+                f"Could not cache the magnification parameters: {error}"
+            )
+
     def _propagate_magnification(self, a: float, b: float) -> None:
-        """Assigns a and b to the class magnification parameters and to each of the particles in data"""
+        """Assigns a and b to the class magnification parameters and to each of the particles in data
+
+        If the data is loaded, the parameters are recorded (and cached) for the
+        current event, and the particles of the events with a magnification of
+        their own keep it.
+        """
         self.mag_a = a
         self.mag_b = b
-        for particle in self.data:
-            particle.magnification_a = a
-            particle.magnification_b = b
-
+        image = self._image_index(self.viewer.dims.current_step[1])
+        if self._image_loaded and image is not None:
+            self.magnifications.set(image, a, b)
+            if not self._magnifications_timer.isActive():
+                self._magnifications_timer.start()
+        changed = []
+        for row, particle in enumerate(self.data):
+            parameters = self._magnification_for(particle.event_number)
+            if (particle.magnification_a, particle.magnification_b) != parameters:
+                particle.magnification_a, particle.magnification_b = parameters
+                changed.append(row)
+        # Only the particles with a different magnification are recalibrated
+        self.table_model.invalidate(changed, ["magnification_a", "magnification_b"])
+
+    @traced
     def _on_click_apply_magnification(self) -> None:
         """Changes the visualisation of the table to show calibrated values for radius and decay_length"""
         if self.apply_magnification_button.isChecked():
             self._apply_magnification()
         self._set_table_visible_vars(self.apply_magnification_button.isChecked())
 
+    @traced
+    def _on_click_show_kinematics(self) -> None:
+        """Show or hide the momentum and proper decay time columns"""
+        # The kinematics are only computed while they are shown
+        if self.show_kinematics_button.isChecked():
+            self.table_model.compute_derived = _particle_kinematics
+            self.table_model.refresh()
+        else:
+            self.table_model.compute_derived = None
+        self._set_table_visible_vars(self.apply_magnification_button.isChecked())
+
+    @traced
+    def _on_click_enhance(self) -> None:
+        """Show the enhanced or the original images, without reloading them"""
+        if not self._image_loaded or self._raw_image_stack is None:
+            return
+        layer = self.viewer.layers[IMAGE_LAYER_NAME]
+        layer.data = self._displayed_stack()
+        if self.enhance_button.isChecked():
+            layer.contrast_limits = default_contrast_limits(layer.dtype)
+        elif not self._update_contrast_limits():
+            # Estimated by napari from the event shown
+            layer.reset_contrast_limits()
+
     def _apply_magnification(self) -> None:
-        """Calculates magnification and calibrated radius and length for each particle in data"""
-
-        for i in range(len(self.data)):
-            self.data[i].calibrate()
-            self.table.setItem(
-                i,
-                self._get_table_column_index("magnification"),
-                QTableWidgetItem(str(self.data[i].magnification)),
-            )
-            # if the radius has been computed before, show the calibrated value
-            if self.table.item(i, self._get_table_column_index("radius_px")) is not None:
-                self.table.setItem(
-                    i,
-                    self._get_table_column_index("radius_cm"),
-                    QTableWidgetItem(str(self.data[i].radius_cm)),
-                )
-            if (
-                self.table.item(i, self._get_table_column_index("decay_length_px"))
-                is not None
-            ):
-                self.table.setItem(
-                    i,
-                    self._get_table_column_index("decay_length_cm"),
-                    QTableWidgetItem(str(self.data[i].decay_length_cm)),
-                )
+        """Calculates the calibrated quantities that are out of date. The
+        particles are recalibrated as soon as their magnification changes, so
+        this is usually a no-op."""
+        self.table_model.refresh()
 
+    @traced
     def _on_click_save(self) -> None:
         """Save list of particles to csv file.
         When the 'Save' button is clicked, the data is saved to a csv file with the current date and time as the filename.
@@ -718,14 +1170,16 @@ class ParticleTracksWidget(QWidget):
         # setup UI
         file_dialog = QFileDialog(self)
         file_dialog.setAcceptMode(QFileDialog.AcceptSave)
-        file_dialog.setNameFilter("CSV files (*.csv); Pickle files (*.pkl)")
+        file_dialog.setNameFilter(
+            "CSV files (*.csv); NumPy files (*.npz); Session files (*.cpt)"
+        )
         file_dialog.setDefaultSuffix("csv")
         # retrieve image folder
         file_name, _ = file_dialog.getSaveFileName(
             self,
             "Save file",
             "./",
-            "CSV files (*.csv);;Pickle files (*.pkl)",
+            "CSV files (*.csv);;NumPy files (*.npz);;Session files (*.cpt)",
             "CSV files (*.csv)",
             QFileDialog.DontUseNativeDialog,
         )
@@ -733,10 +1187,9 @@ class ParticleTracksWidget(QWidget):
         if file_name in {"", None}:
             return
 
-        # Save as pickle if file_name ends with .pkl
-        if file_name.endswith(".pkl"):
-            with open(file_name, "wb") as handle:
-                pickle.dump(self.data, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        # Save as flat NumPy arrays if file_name ends with .npz
+        if file_name.endswith(RESULTS_SUFFIX):
+            save_results(file_name, self.data, seed=self.shuffling_seed)
 
         # Save as .csv if file_name ends with .csv
         elif file_name.endswith(".csv"):
@@ -747,19 +1200,205 @@ class ParticleTracksWidget(QWidget):
                 # write the data
                 f.writelines([particle.to_csv() for particle in self.data])
 
+        # Save the whole session (particles, calibration layers, dataset) if file_name ends with .cpt
+        elif file_name.endswith(SESSION_SUFFIX):
+            save_session(file_name, self._current_session())
+
         else:
             self.msg = QMessageBox()
             self.msg.setIcon(QMessageBox.Warning)
             self.msg.setWindowTitle("Invalid file type")
             self.msg.setStandardButtons(QMessageBox.Ok)
             self.msg.setText(
-                "The file must be a CSV (*.csv) or Pickle (*.pkl) file. Please try again."
+                "The file must be a CSV (*.csv), NumPy (*.npz) or Session (*.cpt) file. Please try again."
             )
             self.msg.show()
             return
 
         napari.utils.notifications.show_info("Data saved to " + file_name)
 
+    @traced
+    def _on_click_import_results(self) -> None:
+        """When the 'Import results' button is clicked, a dialog opens to select a
+        previously saved results file whose particles are added to the table."""
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Import results",
+            "./",
+            "Results files (*.npz *.csv *.pkl)",
+            "Results files (*.npz *.csv *.pkl)",
+            QFileDialog.DontUseNativeDialog,
+        )
+
+        if file_name in {"", None}:
+            return
+
+        self._import_results(file_name)
+
+    @traced
+    def _import_results(self, file_name: str) -> None:
+        """Append the particles in a results file to the table, and re-create
+        their measurement points at the (view, event) where they were recorded."""
+        try:
+            particles = load_results(file_name)
+        except (
+            ValueError,
+            OSError,
+            KeyError,
+            pickle.UnpicklingError,
+            zipfile.BadZipFile,
+        ) as error:
+            napari.utils.notifications.show_error(
+                f"Could not import {file_name}: {error}"
+            )
+            return
+
+        self.table_model.append_particles(particles)
+
+        # Measurement points as (view, event, y, x), only for what was measured
+        points = []
+        for particle in particles:
+            if particle.event_number < 0 or particle.view_number < 0:
+                continue
+            slice_index = [particle.view_number, particle.event_number]
+            if particle.radius_px != -1:
+                points += [slice_index + list(point) for point in particle.rpoints]
+            if particle.decay_length_px != -1:
+                points += [slice_index + list(point) for point in particle.dpoints]
+        if points:
+            self.layer_measurements = self._setup_measurement_layer()
+            self.layer_measurements.add(np.array(points))
+
+        napari.utils.notifications.show_info(
+            f"Imported {len(particles)} particles from {file_name}"
+        )
+
+    def _current_session(self) -> Session:
+        """Snapshot of the dataset, particle table and calibration layers."""
+        layers = {}
+        for name in [
+            MEASUREMENTS_LAYER_NAME,
+            MAGNIFICATION_LAYER_NAME,
+            STEREOSHIFT_LAYER_NAME,
+            ANGLES_LAYER_NAME,
+        ]:
+            if name in self.viewer.layers and len(self.viewer.layers[name].data):
+                # Shapes layers hold a list of arrays, points layers a single array
+                layers[name] = np.stack(self.viewer.layers[name].data)
+        fiducials = []
+        if self.mag_dlg is not None:
+            fiducials = [
+                {"name": f.name, "x": float(f.x), "y": float(f.y)}
+                for f in (
+                    self.mag_dlg.f1,
+                    self.mag_dlg.f2,
+                    self.mag_dlg.b1,
+                    self.mag_dlg.b2,
+                )
+            ]
+        return Session(
+            manifest=self.manifest,
+            seed=self.shuffling_seed,
+            mag_a=self.mag_a,
+            mag_b=self.mag_b,
+            magnification_fiducials=fiducials,
+            particles=self.data,
+            layers=layers,
+        )
+
+    @traced
+    def _on_click_open_session(self) -> None:
+        """When the 'Open session' button is clicked, a dialog opens to select a
+        session file (*.cpt) and the widget is restored from it."""
+        file_name, _ = QFileDialog.getOpenFileName(
+            self,
+            "Open session",
+            "./",
+            "Session files (*.cpt)",
+            "Session files (*.cpt)",
+            QFileDialog.DontUseNativeDialog,
+        )
+
+        if file_name in {"", None}:
+            return
+
+        self._open_session(file_name)
+
+    @traced
+    def _open_session(self, file_name: str) -> None:
+        """Restore the dataset, particle table, calibration layers and magnification
+        parameters from a session file."""
+        try:
+            session = load_session(file_name)
+        except (ValueError, OSError, KeyError, zipfile.BadZipFile) as error:
+            napari.utils.notifications.show_error(
+                f"Could not open the session {file_name}: {error}"
+            )
+            return
+
+        # Reload the images with the same shuffling as when the session was saved
+        self.shuffling_seed = session.seed
+        manifest = session.manifest
+        if manifest and IMAGE_LAYER_NAME not in self.viewer.layers:
+            if os.path.isdir(manifest["folder"]):
+                self._load_data(manifest["folder"], manifest["subdirs"])
+                if self.manifest.get("files") != manifest["files"]:
+                    napari.utils.notifications.show_warning(
+                        "The data folder has changed since the session was saved."
+                    )
+            else:
+                napari.utils.notifications.show_warning(
+                    f"Data folder {manifest['folder']} not found. Only the measurements are restored."
+                )
+                self.manifest = manifest
+
+        # Magnification parameters and particle table
+        self.mag_a = session.mag_a
+        self.mag_b = session.mag_b
+        self.data = session.particles
+        self._update_results_store_session()
+
+        # Measurement and calibration layers
+        layers = session.layers
+        self.layer_measurements = self._setup_measurement_layer()
+        if MEASUREMENTS_LAYER_NAME in layers:
+            self.layer_measurements.data = layers[MEASUREMENTS_LAYER_NAME]
+
+        if MAGNIFICATION_LAYER_NAME in layers or session.magnification_fiducials:
+            if self.mag_dlg is None:
+                self.mag_dlg = MagnificationDialog(self)
+            if MAGNIFICATION_LAYER_NAME in layers:
+                self.mag_dlg.magnification_layer.data = layers[MAGNIFICATION_LAYER_NAME]
+            for fiducial, saved in zip(
+                (self.mag_dlg.f1, self.mag_dlg.f2, self.mag_dlg.b1, self.mag_dlg.b2),
+                session.magnification_fiducials,
+            ):
+                fiducial.name, fiducial.x, fiducial.y = (
+                    saved["name"],
+                    saved["x"],
+                    saved["y"],
+                )
+            self.mag_dlg.a, self.mag_dlg.b = self.mag_a, self.mag_b
+            self._deactivate_calibration_layer(self.mag_dlg.magnification_layer)
+
+        if STEREOSHIFT_LAYER_NAME in layers:
+            if self.stereoshift_dlg is None:
+                self.stereoshift_dlg = StereoshiftDialog(self)
+            self.stereoshift_dlg.cal_layer.data = layers[STEREOSHIFT_LAYER_NAME]
+            self._deactivate_calibration_layer(self.stereoshift_dlg.cal_layer)
+
+        if ANGLES_LAYER_NAME in layers:
+            if self.decay_angles_dlg is None:
+                self.decay_angles_dlg = DecayAnglesDialog(self)
+            self.decay_angles_dlg.cal_layer.data = list(layers[ANGLES_LAYER_NAME])
+            self._deactivate_calibration_layer(self.decay_angles_dlg.cal_layer)
+
+        if self.mag_a != -1.0:
+            self.apply_magnification_button.setEnabled(True)
+            self.magnification_button.setText("Update magnification")
+
+        napari.utils.notifications.show_info("Session restored from " + file_name)
+
     def _activate_calibration_layer(self, layer):
         """Show the calibration layer and move it to the top"""
         layer.visible = True
@@ -0,0 +1,223 @@
+"""
+Memory used by a session, and the panel of the widget showing it.
+
+Three views of a few hundred large frames do not fit in the memory of a lab
+computer, so the frames are decoded lazily (by dask) and the most recent ones
+kept in napari's cache. The panel shows what the frame cache, the image chunks,
+the points and shapes layers and the particle table use, and warns when the
+process gets close to the memory limit (see `get_memory_limit`).
+"""
+
+from __future__ import annotations
+
+import sys
+from dataclasses import fields, is_dataclass
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import psutil
+from napari.layers import Image, Points, Shapes
+from napari.utils.notifications import show_warning
+from qtpy.QtCore import QTimer
+from qtpy.QtWidgets import QFormLayout, QGroupBox, QLabel, QVBoxLayout, QWidget
+
+from ._frame_cache import shared_frame_cache
+from ._settings import get_memory_limit
+
+if TYPE_CHECKING:
+    import napari
+
+    from ._particle_table import ParticleTableModel
+
+# Refresh period of the panel (ms)
+REFRESH_INTERVAL = 2000
+# Share of the computer's memory used as the limit if none is set
+DEFAULT_LIMIT_FRACTION = 0.8
+# Share of the limit above which the students are warned
+WARNING_FRACTION = 0.9
+
+
+def format_bytes(size: float) -> str:
+    """Human readable size, e.g. 1.5 GB."""
+    for unit in ("B", "kB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+def process_memory() -> int:
+    """Resident memory of the process (bytes)."""
+    return psutil.Process().memory_info().rss
+
+
+def memory_limit() -> int:
+    """Memory (bytes) the process is warned before reaching."""
+    limit_mb = get_memory_limit()
+    if limit_mb > 0:
+        return limit_mb * 2**20
+    return int(psutil.virtual_memory().total * DEFAULT_LIMIT_FRACTION)
+
+
+def frame_cache_bytes() -> tuple[int, int]:
+    """Bytes of decoded frames in napari's dask cache, and its capacity (zero if
+    they cannot be read)."""
+    import napari
+
+    # napari has no public API to read its cache without creating it (as
+    # `resize_dask_cache` does), so this reads the private cache object, only in
+    # the versions it is known to be in (those of the napari requirement)
+    if not napari.__version__.startswith("0.5."):
+        return 0, 0
+    try:
+        from napari.utils._dask_utils import _DASK_CACHE
+
+        return int(_DASK_CACHE.cache.total_bytes), int(_DASK_CACHE.cache.available_bytes)
+    except (ImportError, AttributeError):
+        return 0, 0
+
+
+def _deep_size(value, seen: Optional[set] = None) -> int:
+    """Bytes used by `value` and the lists, arrays and dataclasses it holds."""
+    seen = set() if seen is None else seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    size = sys.getsizeof(value)
+    if isinstance(value, (list, tuple)):
+        size += sum(_deep_size(item, seen) for item in value)
+    elif isinstance(value, dict):
+        size += sum(
+            _deep_size(key, seen) + _deep_size(item, seen) for key, item in value.items()
+        )
+    elif is_dataclass(value):
+        size += sys.getsizeof(value.__dict__)
+        size += sum(_deep_size(getattr(value, f.name), seen) for f in fields(value))
+    return size
+
+
+def table_bytes(model: ParticleTableModel) -> int:
+    """Approximate bytes used by the particles of the table and its cached
+    columns (all the particles are assumed to be the size of the first)."""
+    size = sum(array.nbytes for array in model.derived.values())
+    size += sum(array.nbytes for array in model._dirty.values())
+    if model.particles:
+        size += len(model.particles) * _deep_size(model.particles[0])
+    return size
+
+
+def layer_bytes(layer) -> int:
+    """Bytes of the coordinates and features of a points or shapes layer."""
+    if isinstance(layer, Shapes):
+        size = sum(np.asarray(shape).nbytes for shape in layer.data)
+    else:
+        size = np.asarray(layer.data).nbytes
+    return size + int(layer.features.memory_usage(deep=True).sum())
+
+
+def memory_report(viewer: napari.Viewer, model: ParticleTableModel) -> dict[str, str]:
+    """What each part of a session uses, by label."""
+    used, capacity = frame_cache_bytes()
+    report = {
+        "Process": f"{format_bytes(process_memory())} of {format_bytes(memory_limit())}",
+        "Frame cache": f"{format_bytes(used)} of {format_bytes(capacity)}",
+    }
+    shared = shared_frame_cache()
+    if shared is not None:
+        report["Shared frames"] = (
+            f"{len(shared)} frames, {format_bytes(shared.nbytes)} of "
+            f"{format_bytes(shared.capacity)}"
+        )
+    for layer in viewer.layers:
+        if isinstance(layer, Image) and hasattr(layer.data, "numblocks"):
+            chunks = int(np.prod(layer.data.numblocks))
+            report[layer.name] = (
+                f"{chunks} chunks of {format_bytes(layer.data.nbytes / chunks)}"
+            )
+        elif isinstance(layer, (Points, Shapes)):
+            kind = "points" if isinstance(layer, Points) else "shapes"
+            report[layer.name] = (
+                f"{len(layer.data)} {kind}, {format_bytes(layer_bytes(layer))}"
+            )
+    report["Particle table"] = (
+        f"{len(model.particles)} particles, {format_bytes(table_bytes(model))}"
+    )
+    return report
+
+
+class MemoryPanel(QGroupBox):
+    """Panel showing the memory used by the session, refreshed on a timer while
+    it is shown.
+
+    The details are only computed while the panel is expanded (checked), but the
+    memory of the process is checked against the limit either way.
+    """
+
+    def __init__(
+        self,
+        viewer: napari.Viewer,
+        model: ParticleTableModel,
+        parent: Optional[QWidget] = None,
+    ):
+        super().__init__("Memory", parent)
+        self.viewer = viewer
+        self.model = model
+        self.setCheckable(True)
+        self.setChecked(False)
+        self.toggled.connect(self._on_toggled)
+
+        self.details = QWidget()
+        self.rows = QFormLayout(self.details)
+        self.labels: dict[str, QLabel] = {}
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.details)
+        self.details.setVisible(False)
+
+        # Whether the students were warned, until the memory goes down again
+        self._warned = False
+        self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event) -> None:
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event) -> None:
+        """Stop refreshing when the panel is hidden (e.g. the widget is closed)."""
+        self.timer.stop()
+        super().hideEvent(event)
+
+    def _on_toggled(self, checked: bool) -> None:
+        self.details.setVisible(checked)
+        if checked:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Update the panel (if expanded), and warn if the memory is running out."""
+        if self.isChecked():
+            report = memory_report(self.viewer, self.model)
+            for name in list(self.labels):
+                if name not in report:
+                    self.rows.removeRow(self.labels.pop(name))
+            for name, text in report.items():
+                if name not in self.labels:
+                    self.labels[name] = QLabel()
+                    self.rows.addRow(name, self.labels[name])
+                self.labels[name].setText(text)
+        self.check_limit(process_memory(), memory_limit())
+
+    def check_limit(self, used: int, limit: int) -> bool:
+        """Warn (once) when the memory used gets close to the limit. Returns
+        whether it is close."""
+        close = used > WARNING_FRACTION * limit
+        if close and not self._warned:
+            show_warning(
+                f"The session uses {format_bytes(used)} of memory, close to the "
+                f"limit of {format_bytes(limit)}. Save your measurements, and close "
+                "other programs or restart napari."
+            )
+        self._warned = close
+        return close
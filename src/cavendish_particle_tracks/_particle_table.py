@@ -0,0 +1,458 @@
+"""
+The model behind the table of particle decays in the main widget.
+
+The model reads the values straight from the list of `ParticleDecay` objects,
+so cells are only formatted when the view paints them, and changes to the
+particles are announced with (ranged) `dataChanged` signals.
+
+Calibrated and derived quantities keep track of the quantities they are
+computed from (`DEPENDENCIES`): when a measurement or the calibration of some
+particles changes, only the dependent quantities of those particles are
+flagged as dirty, recomputed and repainted.
+
+`ParticleFilterModel` sits between the model and the view, to sort the table
+and filter it with queries such as ``Λ⁰ event:40-90 missing:stereoshift``.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any, Callable, Optional
+
+import numpy as np
+from qtpy.QtCore import (
+    QAbstractTableModel,
+    QModelIndex,
+    QObject,
+    QSortFilterProxyModel,
+    Qt,
+)
+
+from ._tracing import traced
+from .analysis import ParticleDecay, StereoshiftInfo
+
+# Role with the raw value of a cell (numbers as numbers) used for sorting
+SORT_ROLE = Qt.UserRole
+
+# Calibrated quantity -> the quantities it is computed from
+DEPENDENCIES: dict[str, tuple[str, ...]] = {
+    "magnification": (
+        "magnification_a",
+        "magnification_b",
+        "origin_vertex_stereoshift_info",
+        "origin_vertex_depth_cm",
+    ),
+    "radius_cm": ("radius_px", "magnification"),
+    "decay_length_cm": ("decay_length_px", "magnification"),
+}
+
+# Calibrated attribute -> the measurement in pixels it is computed from
+_CALIBRATED = {"radius_cm": "radius_px", "decay_length_cm": "decay_length_px"}
+
+
+def _has_radius(particle: ParticleDecay) -> bool:
+    return particle.radius_px != -1
+
+
+def _has_length(particle: ParticleDecay) -> bool:
+    return particle.decay_length_px != -1
+
+
+def _has_origin_depth(particle: ParticleDecay) -> bool:
+    return bool(particle.origin_vertex_stereoshift_info.name)
+
+
+def _has_decay_depth(particle: ParticleDecay) -> bool:
+    return bool(particle.decay_vertex_stereoshift_info.name)
+
+
+def _has_angles(particle: ParticleDecay) -> bool:
+    return particle.phi_proton != -100
+
+
+# Cells of quantities that have not been measured yet are left empty
+_MEASURED: dict[str, Callable[[ParticleDecay], bool]] = {
+    "rpoints": _has_radius,
+    "radius_px": _has_radius,
+    "radius_cm": _has_radius,
+    "dpoints": _has_length,
+    "decay_length_px": _has_length,
+    "decay_length_cm": _has_length,
+    "origin_vertex_stereoshift_info": _has_origin_depth,
+    "origin_vertex_depth_cm": _has_origin_depth,
+    "decay_vertex_stereoshift_info": _has_decay_depth,
+    "decay_vertex_depth_cm": _has_decay_depth,
+    "phi_proton": _has_angles,
+    "phi_pion": _has_angles,
+}
+
+
+class ParticleTableModel(QAbstractTableModel):
+    """Table model with one row per particle and one column per attribute.
+
+    `derived_columns` are not attributes of the particles: they depend on
+    `derived_inputs` and their values are stored in the model as arrays (NaN
+    for empty cells). They are computed by `compute_derived`, a function of a
+    list of particles returning one array per derived column; while it is None
+    (e.g. when the columns are hidden) the dirty values are left for later.
+    """
+
+    def __init__(
+        self,
+        columns: list[str],
+        derived_columns: Optional[list[str]] = None,
+        derived_inputs: Iterable[str] = (),
+        parent: Optional[QObject] = None,
+    ):
+        super().__init__(parent)
+        self.columns = list(columns) + list(derived_columns or [])
+        self.particles: list[ParticleDecay] = []
+        self.derived = {column: np.empty(0) for column in derived_columns or []}
+        self.compute_derived: Optional[
+            Callable[[list[ParticleDecay]], dict[str, np.ndarray]]
+        ] = None
+        self._column_index = {column: i for i, column in enumerate(self.columns)}
+
+        self.dependencies = dict(DEPENDENCIES)
+        for column in self.derived:
+            self.dependencies[column] = tuple(derived_inputs)
+        # Dirty flags, one per particle, of the calibrated and derived quantities
+        self._dirty = {column: np.empty(0, dtype=bool) for column in self.dependencies}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(self.particles)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: B008
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section: int, orientation, role=Qt.DisplayRole) -> Any:
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.columns[section]
+        return str(section + 1)
+
+    def column_index(self, column: str) -> int:
+        """Index of the column with the given title, or -1."""
+        return self._column_index.get(column, -1)
+
+    def value(self, row: int, column: str) -> Any:
+        """Raw value of a cell, or None if the cell is empty."""
+        if column in self.derived:
+            value = self.derived[column][row]
+            return None if np.isnan(value) else float(value)
+        particle = self.particles[row]
+        measured = _MEASURED.get(column)
+        if measured is not None and not measured(particle):
+            return None
+        return getattr(particle, column)
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole) -> Any:
+        if not index.isValid() or role not in (Qt.DisplayRole, SORT_ROLE):
+            return None
+        value = self.value(index.row(), self.columns[index.column()])
+        if value is None:
+            return None
+        if role == Qt.DisplayRole:
+            return str(value)
+        if isinstance(value, StereoshiftInfo):
+            return value.depth_cm
+        if isinstance(value, (int, float, str)):
+            return value
+        return str(value)
+
+    @traced
+    def set_particles(self, particles: list[ParticleDecay]) -> None:
+        """Replace all the particles in the table."""
+        self.beginResetModel()
+        self.particles = particles
+        self.derived = {
+            column: np.full(len(particles), np.nan) for column in self.derived
+        }
+        # The calibrated values of the new particles are kept, the derived
+        # quantities need computing
+        for column in self._dirty:
+            self._dirty[column] = np.full(len(particles), column in self.derived)
+        self.endResetModel()
+        self.refresh()
+
+    @traced
+    def append_particles(self, particles: list[ParticleDecay]) -> None:
+        """Add particles at the bottom of the table."""
+        if not particles:
+            return
+        first = len(self.particles)
+        self.beginInsertRows(QModelIndex(), first, first + len(particles) - 1)
+        self.particles.extend(particles)
+        for column, values in self.derived.items():
+            self.derived[column] = np.append(values, np.full(len(particles), np.nan))
+        for column, dirty in self._dirty.items():
+            new = np.full(len(particles), column in self.derived)
+            self._dirty[column] = np.append(dirty, new)
+        self.endInsertRows()
+        self.refresh()
+
+    def remove_particle(self, row: int) -> None:
+        """Remove the particle in `row` from the table."""
+        self.beginRemoveRows(QModelIndex(), row, row)
+        del self.particles[row]
+        for column, values in self.derived.items():
+            self.derived[column] = np.delete(values, row)
+        for column, dirty in self._dirty.items():
+            self._dirty[column] = np.delete(dirty, row)
+        self.endRemoveRows()
+
+    @traced
+    def update_rows(
+        self,
+        first: int,
+        last: Optional[int] = None,
+        columns: Optional[list[str]] = None,
+    ) -> None:
+        """Announce that the particles in rows `first` to `last` (inclusive) have
+        changed, in the given columns (all by default)."""
+        if not self.particles:
+            return
+        last = first if last is None else last
+        if columns is None:
+            left, right = 0, len(self.columns) - 1
+        else:
+            indices = [self.column_index(column) for column in columns]
+            left, right = min(indices), max(indices)
+        self.dataChanged.emit(self.index(first, left), self.index(last, right))
+
+    def dependents(self, columns: Iterable[str]) -> list[str]:
+        """The `columns` and all the quantities that depend on them, directly or
+        through other quantities."""
+        affected = list(columns)
+        for column in affected:
+            for dependent, inputs in self.dependencies.items():
+                if column in inputs and dependent not in affected:
+                    affected.append(dependent)
+        return affected
+
+    def _update_runs(self, rows: np.ndarray, columns: list[str]) -> None:
+        """Announce that the particles in `rows` have changed in the given
+        columns, with one range per run of consecutive rows."""
+        if not rows.size or not columns:
+            return
+        rows = np.unique(rows)
+        for run in np.split(rows, np.flatnonzero(np.diff(rows) > 1) + 1):
+            self.update_rows(int(run[0]), int(run[-1]), columns)
+
+    def invalidate(self, rows: Iterable[int], columns: Iterable[str]) -> None:
+        """The `columns` of the particles in `rows` have changed: recompute the
+        quantities that depend on them, and repaint the affected cells."""
+        rows = np.fromiter(rows, dtype=int)
+        if not rows.size:
+            return
+        affected = self.dependents(columns)
+        for column in affected:
+            if column in self._dirty:
+                self._dirty[column][rows] = True
+        recomputed, derived = self._recompute()
+        shown = [column for column in affected if column in self._column_index]
+        self._update_runs(
+            np.concatenate([rows, recomputed]),
+            shown + [column for column in derived if column not in shown],
+        )
+
+    @traced
+    def refresh(self) -> None:
+        """Recompute the dirty calibrated and derived quantities."""
+        self._update_runs(*self._recompute())
+
+    def _recompute(self) -> tuple[np.ndarray, list[str]]:
+        """Recompute the dirty calibrated and derived quantities. Returns the rows
+        and columns of the derived quantities that were recomputed."""
+        for column, source in _CALIBRATED.items():
+            for row in np.flatnonzero(self._dirty[column]).tolist():
+                particle = self.particles[row]
+                setattr(
+                    particle, column, particle.magnification * getattr(particle, source)
+                )
+            self._dirty[column][:] = False
+        # magnification is a property of the particles, nothing to compute
+        self._dirty["magnification"][:] = False
+
+        nothing = np.empty(0, dtype=int), []
+        if self.compute_derived is None or not self.derived:
+            return nothing
+        dirty = np.logical_or.reduce([self._dirty[column] for column in self.derived])
+        rows = np.flatnonzero(dirty)
+        if not rows.size:
+            return nothing
+        values = self.compute_derived([self.particles[row] for row in rows.tolist()])
+        for column, column_values in values.items():
+            self.derived[column][rows] = column_values
+            self._dirty[column][rows] = False
+        return rows, list(values)
+
+
+# Measurements that can be queried with `has:` and `missing:` in a filter
+COMPLETENESS_FLAGS: dict[str, Callable[[ParticleDecay], bool]] = {
+    "radius": _has_radius,
+    "length": _has_length,
+    "angles": _has_angles,
+    "origin_depth": _has_origin_depth,
+    "decay_depth": _has_decay_depth,
+    "stereoshift": lambda p: _has_origin_depth(p) or _has_decay_depth(p),
+}
+
+
+def _parse_range(text: str) -> Optional[tuple[float, float]]:
+    """'40-90', '40-', '-90' or '40' as an inclusive (low, high) range."""
+    low, separator, high = text.partition("-")
+    try:
+        if not separator:
+            return float(low), float(low)
+        return (
+            float(low) if low else -np.inf,
+            float(high) if high else np.inf,
+        )
+    except ValueError:
+        return None
+
+
+class ParticleFilterModel(QSortFilterProxyModel):
+    """Sorts the particle table and filters it with a query.
+
+    A query is a list of space separated terms, all of which must match:
+
+    - ``event:40-90``, ``event:12``, ``view:0``: ranges of event or view numbers
+      (open ranges such as ``event:40-`` are allowed);
+    - ``missing:stereoshift``, ``has:radius``: measurements that have (not)
+      been done, see `COMPLETENESS_FLAGS`;
+    - any other text is searched for in the particle names.
+
+    The event and view numbers, names and completeness flags of the particles
+    are kept in arrays, which are updated for the rows that change, so a new
+    query is evaluated for all the rows at once, and the filtering of each row
+    is a lookup.
+    """
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self.setSortRole(SORT_ROLE)
+        self.query = ""
+        self._accepted: Optional[np.ndarray] = None
+        self._columns: Optional[dict[str, np.ndarray]] = None
+        # Distinct particle names, and their index in the list
+        self._names: list[str] = []
+        self._name_codes: dict[str, int] = {}
+
+    def setSourceModel(self, model: ParticleTableModel) -> None:
+        # Connected before the handlers of the proxy, so that the changed rows
+        # are filtered with their new values
+        model.modelReset.connect(self._on_source_reset)
+        model.rowsInserted.connect(self._on_rows_inserted)
+        model.rowsRemoved.connect(self._on_rows_removed)
+        model.dataChanged.connect(self._on_data_changed)
+        super().setSourceModel(model)
+        self._on_source_reset()
+        self.invalidateFilter()
+
+    def _on_source_reset(self) -> None:
+        self._columns = None
+        self._names, self._name_codes = [], {}
+        self._accepted = self.evaluate(self.query) if self.query else None
+
+    def _on_rows_inserted(self, parent: QModelIndex, first: int, last: int) -> None:
+        if self._columns is None:
+            return
+        new = self._row_columns(self.sourceModel().particles[first : last + 1])
+        for key, values in new.items():
+            self._columns[key] = np.insert(self._columns[key], first, values)
+        if self._accepted is not None:
+            self._accepted = np.insert(
+                self._accepted, first, self._evaluate(self.query, new)
+            )
+
+    def _on_rows_removed(self, parent: QModelIndex, first: int, last: int) -> None:
+        if self._columns is None:
+            return
+        rows = np.arange(first, last + 1)
+        for key, values in self._columns.items():
+            self._columns[key] = np.delete(values, rows)
+        if self._accepted is not None:
+            self._accepted = np.delete(self._accepted, rows)
+
+    def _on_data_changed(
+        self, top_left: QModelIndex, bottom_right: QModelIndex, *args
+    ) -> None:
+        if self._columns is None:
+            return
+        rows = slice(top_left.row(), bottom_right.row() + 1)
+        changed = self._row_columns(self.sourceModel().particles[rows])
+        for key, values in changed.items():
+            self._columns[key][rows] = values
+        if self._accepted is not None:
+            self._accepted[rows] = self._evaluate(self.query, changed)
+
+    def _row_columns(self, particles: list[ParticleDecay]) -> dict[str, np.ndarray]:
+        """Arrays of the values used by the queries, for some particles."""
+        codes = []
+        for particle in particles:
+            code = self._name_codes.get(particle.name)
+            if code is None:
+                code = self._name_codes[particle.name] = len(self._names)
+                self._names.append(particle.name)
+            codes.append(code)
+        columns = {
+            "name_codes": np.array(codes, dtype=int),
+            "event": np.fromiter(
+                (p.event_number for p in particles), float, len(particles)
+            ),
+            "view": np.fromiter(
+                (p.view_number for p in particles), float, len(particles)
+            ),
+        }
+        for flag, has in COMPLETENESS_FLAGS.items():
+            columns[flag] = np.fromiter((has(p) for p in particles), bool, len(particles))
+        return columns
+
+    def _index_columns(self) -> dict[str, np.ndarray]:
+        """Per column arrays of the particles, used to evaluate the queries."""
+        if self._columns is None:
+            self._columns = self._row_columns(self.sourceModel().particles)
+        return self._columns
+
+    def evaluate(self, query: str) -> np.ndarray:
+        """Mask of the source rows matching the query."""
+        return self._evaluate(query, self._index_columns())
+
+    def _evaluate(self, query: str, columns: dict[str, np.ndarray]) -> np.ndarray:
+        """Mask of the rows of `columns` matching the query."""
+        accepted = np.ones(len(columns["event"]), dtype=bool)
+        for term in query.split():
+            key, separator, value = term.partition(":")
+            key = key.lower()
+            if separator and key in ("event", "view"):
+                limits = _parse_range(value)
+                if limits is None:
+                    return np.zeros_like(accepted)
+                accepted &= (columns[key] >= limits[0]) & (columns[key] <= limits[1])
+            elif separator and key in ("has", "missing"):
+                if value.lower() not in COMPLETENESS_FLAGS:
+                    return np.zeros_like(accepted)
+                flag = columns[value.lower()]
+                accepted &= flag if key == "has" else ~flag
+            else:
+                # Free text is matched against the (few) distinct names
+                matching = np.char.find(
+                    np.char.lower(np.array(self._names, dtype=str)), term.lower()
+                )
+                accepted &= (matching >= 0)[columns["name_codes"]]
+        return accepted
+
+    @traced
+    def set_query(self, query: str) -> None:
+        """Show only the particles matching the query."""
+        self.query = query.strip()
+        self._accepted = self.evaluate(self.query) if self.query else None
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row: int, source_parent: QModelIndex) -> bool:
+        if self._accepted is None or source_row >= len(self._accepted):
+            return True
+        return bool(self._accepted[source_row])
@@ -0,0 +1,95 @@
+"""
+Index of the points of a 4D (view, event, y, x) points layer by slice.
+
+All the measurement points of a session live in a single points layer. The
+index keeps the slice (view, event) of every point and the ids of the points
+in each slice, and follows the changes of the layer data, so that the queries
+of the widget only look at the points in one slice.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+from napari.layers import Points
+from napari.layers.base import ActionType
+
+
+def _slice_keys(data: np.ndarray) -> np.ndarray:
+    """(view, event) of each point as integers."""
+    return np.rint(data[:, :2]).astype(np.int64).reshape(-1, 2)
+
+
+class PointsSliceIndex:
+    """Ids of the points of a (view, event, y, x) points layer in each slice."""
+
+    def __init__(self, layer: Points):
+        self.layer = layer
+        self._keys = np.empty((0, 2), dtype=np.int64)
+        self._slices: dict[tuple[int, int], np.ndarray] = {}
+        self.rebuild()
+        layer.events.data.connect(self._on_data)
+
+    def rebuild(self) -> None:
+        """Index all the points of the layer again."""
+        self._keys = _slice_keys(self.layer.data)
+        self._slices = {}
+        self._add(np.arange(len(self._keys)))
+
+    def _add(self, ids: np.ndarray) -> None:
+        """Add the points `ids` (whose keys are known) to the per slice ids."""
+        if not ids.size:
+            return
+        keys = self._keys[ids]
+        order = np.lexsort((keys[:, 1], keys[:, 0]))
+        boundaries = np.flatnonzero(np.any(np.diff(keys[order], axis=0), axis=1)) + 1
+        for group in np.split(ids[order], boundaries):
+            key = (int(self._keys[group[0], 0]), int(self._keys[group[0], 1]))
+            old = self._slices.get(key)
+            self._slices[key] = group if old is None else np.append(old, group)
+
+    def _on_data(self, event) -> None:
+        """Follow the changes of the layer data."""
+        action = getattr(event, "action", None)
+        if action in (ActionType.ADDING, ActionType.CHANGING, ActionType.REMOVING):
+            return
+        data = self.layer.data
+        if action == ActionType.ADDED and len(data) >= len(self._keys):
+            # New points are appended at the end of the layer data
+            first = len(self._keys)
+            self._keys = np.concatenate([self._keys, _slice_keys(data[first:])])
+            self._add(np.arange(first, len(data)))
+            return
+        if action == ActionType.CHANGED and len(data) == len(self._keys):
+            # Points moved within their slice leave the index unchanged
+            ids = np.asarray(event.data_indices, dtype=np.int64)
+            if np.array_equal(_slice_keys(data[ids]), self._keys[ids]):
+                return
+        self.rebuild()
+
+    def points_in_slice(self, view: int, event: int) -> np.ndarray:
+        """Ids of the points in the slice (view, event)."""
+        return self._slices.get((view, event), np.empty(0, dtype=np.int64))
+
+    def slice_of(self, ids) -> np.ndarray:
+        """(view, event) of the points `ids`, one row per point."""
+        return self._keys[np.asarray(list(ids), dtype=np.int64)]
+
+    def nearest(
+        self,
+        view: int,
+        event: int,
+        position,
+        max_distance: float = np.inf,
+    ) -> Optional[int]:
+        """Id of the point of the slice (view, event) nearest to the (y, x)
+        `position`, or None if there are no points closer than `max_distance`."""
+        ids = self.points_in_slice(view, event)
+        if not ids.size:
+            return None
+        distances = np.linalg.norm(self.layer.data[ids, 2:] - position, axis=1)
+        nearest = int(np.argmin(distances))
+        if distances[nearest] > max_distance:
+            return None
+        return int(ids[nearest])
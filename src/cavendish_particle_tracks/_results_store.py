@@ -0,0 +1,249 @@
+"""
+A results database shared by the sessions of a lab.
+
+When CPT_RESULTS_DB is set, the particle table of each session is written to
+an SQLite database, in the same columns as a results file (see
+`particles_to_arrays`), so the demonstrators can follow the results of a class
+as they are measured, e.g. with ``cpt-aggregate lab.sqlite`` or any SQLite
+client.
+
+The changes to the table are batched: a session rewrites its rows at most once
+per `FLUSH_INTERVAL`, in a single transaction with one prepared statement for
+all the rows. The database is in write-ahead-log mode, so the sessions do not
+block the readers. The widget opens and writes the database from the user
+interface, so it only waits `WRITE_TIMEOUT` for another session to commit: a
+write is retried at the next flush if it could not be made, and the database at
+the next loading of the data if it could not be opened. Write-ahead logging needs the database on a local disk of
+the computer the sessions run on: SQLite cannot share it on a network file
+system.
+
+The version of the schema is recorded in the database. A database written by
+an older version gets the columns of the particles added since, with the values
+of a new particle.
+"""
+
+from __future__ import annotations
+
+import getpass
+import socket
+import sqlite3
+import time
+import uuid
+import warnings
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from ._storage import particles_to_arrays
+from .analysis import ParticleDecay
+
+STORE_SUFFIXES = (".sqlite", ".db")
+# Seconds a session waits for another one to commit
+BUSY_TIMEOUT = 30.0
+# Seconds the widget waits for another session to commit, not to block the
+# user interface
+WRITE_TIMEOUT = 0.1
+# Milliseconds between the writes of the table of a session
+FLUSH_INTERVAL = 2000
+SCHEMA_VERSION = 1
+
+
+def _sql_type(values: np.ndarray) -> str:
+    if values.dtype.kind == "U":
+        return "TEXT"
+    if values.dtype.kind == "i":
+        return "INTEGER"
+    # The points are stored as the bytes of their float64 arrays
+    return "REAL" if values.ndim == 1 else "BLOB"
+
+
+# Columns of `particles_to_arrays`, with their SQL types and the shapes of the points
+_ARRAYS = particles_to_arrays([ParticleDecay()])
+_COLUMNS = {column: _sql_type(values) for column, values in _ARRAYS.items()}
+_SHAPES = {column: values.shape[1:] for column, values in _ARRAYS.items()}
+_QUOTED = ", ".join(f'"{column}"' for column in _COLUMNS)
+
+
+def _sql_default(column: str) -> str:
+    """SQL literal of the value of a column for a new particle."""
+    value = _ARRAYS[column][0]
+    if _COLUMNS[column] == "BLOB":
+        return f"X'{value.tobytes().hex()}'"
+    if _COLUMNS[column] == "TEXT":
+        return "'" + str(value).replace("'", "''") + "'"
+    return repr(value.item())
+
+
+def _migrate(connection: sqlite3.Connection) -> None:
+    """Bring the schema of the database up to SCHEMA_VERSION, adding the columns
+    the particles table lacks."""
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        (version,) = connection.execute("PRAGMA user_version").fetchone()
+        if version > SCHEMA_VERSION:
+            raise sqlite3.DatabaseError(
+                f"schema version {version} is newer than this version of the plugin"
+                f" ({SCHEMA_VERSION})"
+            )
+        existing = {row[1] for row in connection.execute("PRAGMA table_info(particles)")}
+        for column, kind in _COLUMNS.items():
+            if column not in existing:
+                connection.execute(
+                    f'ALTER TABLE particles ADD COLUMN "{column}" {kind} '
+                    f"DEFAULT {_sql_default(column)}"
+                )
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    except sqlite3.Error:
+        connection.rollback()
+        raise
+    connection.commit()
+
+
+def _connect(file_name: str, timeout: float) -> sqlite3.Connection:
+    connection = sqlite3.connect(file_name, timeout=timeout)
+    try:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session TEXT PRIMARY KEY,
+                user TEXT,
+                host TEXT,
+                seed INTEGER,
+                dataset TEXT,
+                started REAL,
+                updated REAL
+            );
+            CREATE TABLE IF NOT EXISTS particles (
+                session TEXT NOT NULL REFERENCES sessions(session),
+                row INTEGER NOT NULL,
+                {", ".join(f'"{column}" {kind}' for column, kind in _COLUMNS.items())},
+                PRIMARY KEY (session, row)
+            );
+            """
+        )
+        _migrate(connection)
+    except sqlite3.Error:
+        connection.close()
+        raise
+    return connection
+
+
+class ResultsStore:
+    """The rows of the particle table of one session in a results database."""
+
+    def __init__(
+        self,
+        file_name: str,
+        seed: int = -1,
+        dataset: str = "",
+        timeout: float = BUSY_TIMEOUT,
+    ):
+        self.file_name = file_name
+        self.session = uuid.uuid4().hex
+        self.seed = seed
+        self.dataset = dataset
+        # Seconds the opening and the writes wait for another session to commit
+        self._connection = _connect(file_name, timeout)
+        self._insert = (
+            f"INSERT INTO particles (session, row, {_QUOTED}) "
+            f"VALUES (?, ?{', ?' * len(_COLUMNS)})"
+        )
+        with self._connection:
+            self._connection.execute(
+                "INSERT INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.session,
+                    getpass.getuser(),
+                    socket.gethostname(),
+                    seed,
+                    dataset,
+                    time.time(),
+                    time.time(),
+                ),
+            )
+
+    def write(self, particles: list[ParticleDecay]) -> bool:
+        """Replace the rows of the session with `particles`, in one transaction.
+
+        Returns whether they were written: not if another session held the
+        database for longer than the timeout.
+        """
+        arrays = particles_to_arrays(particles)
+        columns = [
+            (
+                [value.tobytes() for value in arrays[column]]
+                if kind == "BLOB"
+                else arrays[column].tolist()
+            )
+            for column, kind in _COLUMNS.items()
+        ]
+        rows = [(self.session, row, *values) for row, values in enumerate(zip(*columns))]
+        try:
+            self._write(rows)
+        except sqlite3.OperationalError as error:
+            if "locked" not in str(error):
+                raise
+            return False
+        return True
+
+    def _write(self, rows: list[tuple]) -> None:
+        with self._connection:
+            self._connection.execute(
+                "UPDATE sessions SET seed = ?, dataset = ?, updated = ? WHERE session = ?",
+                (self.seed, self.dataset, time.time(), self.session),
+            )
+            self._connection.execute(
+                "DELETE FROM particles WHERE session = ?", (self.session,)
+            )
+            self._connection.executemany(self._insert, rows)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+def read_store(file_name: str) -> dict[str, np.ndarray]:
+    """Read the particles of all the sessions in a results database into flat
+    arrays (see `particles_to_arrays`), with `seed` and `source` (user@host and
+    session) columns."""
+    connection = sqlite3.connect(
+        Path(file_name).resolve().as_uri() + "?mode=ro", uri=True
+    )
+    try:
+        rows = connection.execute(
+            f"SELECT sessions.seed, user || '@' || host || '/' || sessions.session, "
+            f"{_QUOTED} FROM particles JOIN sessions USING (session) "
+            "ORDER BY started, session, row"
+        ).fetchall()
+    finally:
+        connection.close()
+
+    values = list(zip(*rows)) if rows else [()] * (len(_COLUMNS) + 2)
+    arrays = {
+        "seed": np.array(values[0], dtype=np.int64),
+        "source": np.array(values[1], dtype=str),
+    }
+    for (column, kind), column_values in zip(_COLUMNS.items(), values[2:]):
+        if kind == "BLOB":
+            arrays[column] = np.frombuffer(b"".join(column_values), dtype=float).reshape(
+                (len(column_values), *_SHAPES[column])
+            )
+        else:
+            dtype = {"TEXT": str, "INTEGER": np.int64, "REAL": float}[kind]
+            arrays[column] = np.array(column_values, dtype=dtype)
+    return arrays
+
+
+def open_store(file_name: Optional[str], **kwargs) -> Optional[ResultsStore]:
+    """Open the results database, or None if it is not set or cannot be opened."""
+    if not file_name:
+        return None
+    try:
+        return ResultsStore(file_name, **kwargs)
+    except sqlite3.Error as error:
+        warnings.warn(
+            f"Could not open the results database {file_name}: {error}", stacklevel=2
+        )
+        return None
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import os
+from typing import Optional
 
 
 def _bool_cast(value: str) -> bool:
@@ -38,3 +39,81 @@ def get_bypass() -> bool:
     It should not be set for users.
     """
     return _get_environment_variable("CPT_DEV_BYPASS", fallback=False)  # type: ignore
+
+
+def get_cache_dir() -> str:
+    """Get the folder where the results computed for a dataset are cached.
+
+    Set CPT_CACHE_DIR to share the cache between the accounts of a lab computer.
+    """
+    cache_dir = os.getenv("CPT_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    base = os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cavendish_particle_tracks")
+
+
+def get_align_views() -> bool:
+    """Get whether the views of each event are aligned in the background.
+
+    Aligning the views decodes all the images of the dataset once (the results
+    are cached), so it is only done on the lab computers where it is enabled.
+    """
+    return _get_environment_variable("CPT_ALIGN_VIEWS", fallback=False)  # type: ignore
+
+
+def get_trace_file() -> Optional[str]:
+    """Get the file the timings of the hot paths are written to, if any.
+
+    Set CPT_TRACE to a file name (e.g. trace.json) to record where a session
+    spends its time. The trace opens in https://ui.perfetto.dev or chrome://tracing.
+    """
+    return os.getenv("CPT_TRACE") or None
+
+
+def get_memory_limit(fallback: int = 0) -> int:
+    """Get the memory (in MB) the plugin warns before reaching.
+
+    Set CPT_MEMORY_LIMIT_MB on lab computers shared by several sessions. By
+    default (0) the limit is a fraction of the computer's memory.
+    """
+    return _get_environment_variable("CPT_MEMORY_LIMIT_MB", fallback)  # type: ignore
+
+
+def get_results_database() -> Optional[str]:
+    """Get the SQLite database the particle tables are written to, if any.
+
+    Set CPT_RESULTS_DB on the lab computers to collect the results of all the
+    sessions in one place, where the demonstrators can follow them.
+    """
+    return os.getenv("CPT_RESULTS_DB") or None
+
+
+def get_shared_frame_cache_mb(fallback: int = 0) -> int:
+    """Get the memory (in MB) each session keeps in the shared frame cache.
+
+    Set CPT_SHARED_FRAME_CACHE_MB on lab computers running several sessions on
+    the same dataset, so that the images decoded by one session are not decoded
+    again by the others. By default (0) the frames are not shared.
+    """
+    return _get_environment_variable("CPT_SHARED_FRAME_CACHE_MB", fallback)  # type: ignore
+
+
+def get_frame_statistics() -> bool:
+    """Get whether the intensity statistics of the images are computed in the
+    background, for the contrast limits of each event.
+
+    Computing them decodes all the images of the dataset once (the results are
+    cached), so it is only done on the lab computers where it is enabled.
+    """
+    return _get_environment_variable("CPT_FRAME_STATISTICS", fallback=False)  # type: ignore
+
+
+def get_display_8bit() -> bool:
+    """Get whether the images are shown as grey level bytes.
+
+    Each frame is scaled between its own contrast limits to one byte per pixel,
+    which takes a fraction of the memory of the decoded frames, for lab
+    computers short of memory. The measurements still read the decoded frames.
+    """
+    return _get_environment_variable("CPT_DISPLAY_8BIT", fallback=False)  # type: ignore
@@ -3,7 +3,7 @@ from typing import TYPE_CHECKING
 
 import napari
 import numpy as np
-from napari.utils.notifications import show_error
+from napari.utils.notifications import show_error, show_warning
 from qtpy.QtWidgets import (
     QComboBox,
     QDialog,
@@ -11,16 +11,23 @@ from qtpy.QtWidgets import (
     QGridLayout,
     QLabel,
     QPushButton,
-    QTableWidgetItem,
 )
 
 from ._calculate import depth, length, stereoshift
+from ._correspondence import match_point
+from ._tracing import traced
+from ._view_alignment import apply_affine
 from .analysis import Fiducial, StereoshiftInfo
 
 if TYPE_CHECKING:
     from ._main_widget import ParticleTracksWidget
 
 
+STEREOSHIFT_LAYER_NAME = "Points_Stereoshift"
+# Below this phase correlation peak, a match is likely to be wrong
+MATCH_MIN_CONFIDENCE = 0.1
+
+
 class StereoshiftDialog(QDialog):
     def __init__(self, parent: "ParticleTracksWidget"):
         super().__init__(parent)
@@ -67,6 +74,9 @@ class StereoshiftDialog(QDialog):
         for textbox in self.textboxes + self.results:
             textbox.setMinimumWidth(200)
 
+        bmatch = QPushButton("Match view2 points")
+        bmatch.clicked.connect(self._on_click_match)
+
         bss = QPushButton("Calculate")
         bss.clicked.connect(self._on_click_calculate)
 
@@ -103,6 +113,7 @@ class StereoshiftDialog(QDialog):
             self.layout().addWidget(widget, i // 2 + 6, i % 2 + 1)
 
         self.layout().addWidget(bss, 7, 0, 1, 3)
+        self.layout().addWidget(bmatch, 8, 0, 1, 3)
 
         self.layout().addWidget(
             self.label_stereoshift,
@@ -178,7 +189,7 @@ class StereoshiftDialog(QDialog):
         # feature.
         points_layer = self.parent.viewer.add_points(
             points,
-            name="Points_Stereoshift",
+            name=STEREOSHIFT_LAYER_NAME,
             text=text,
             size=20,
             border_width=7,
@@ -203,6 +214,7 @@ class StereoshiftDialog(QDialog):
             raise IndexError()
         return self._fiducial_views[i + 1]
 
+    @traced
     def _on_click_fiducial(self) -> None:
         """When fiducial is selected, update the name of the fiducial and the points text"""
 
@@ -230,6 +242,7 @@ class StereoshiftDialog(QDialog):
 
         self.cal_layer.refresh()
 
+    @traced
     def _on_click_vertex(self) -> None:
         """When vertex is selected, update the name of the vertex"""
         if self.vertex_combobox.currentIndex() == 0:
@@ -237,6 +250,36 @@ class StereoshiftDialog(QDialog):
         if self.vertex_combobox.currentIndex() == 1:
             self.stereoshift_info.name = "decay_vertex"
 
+    @traced
+    def _on_click_match(self) -> None:
+        """When 'Match view2 points' is clicked, find the fiducial and the point
+        placed in view1 in view2 of the current event, and calculate."""
+        stack = self.parent.image_stack
+        if stack is None:
+            show_error("Load the data before matching points.")
+            return
+        event = self.parent.viewer.dims.current_step[1]
+        data = self.cal_layer.data.copy()
+        # Start from the transform between the views if it has been estimated,
+        # otherwise from the offset between the reference points
+        transform = self.parent.view_transform(event, 0, 1)
+        if transform is None:
+            guesses = data[[2, 4]] + (data[1] - data[0])
+        else:
+            guesses = apply_affine(transform, data[[2, 4]])
+        confidences = []
+        for (view1, view2), guess in zip(((2, 3), (4, 5)), guesses):
+            match = match_point(stack, event, data[view1], 0, 1, guess=guess)
+            data[view2] = match.position
+            confidences.append(match.confidence)
+        self.cal_layer.data = data
+        if min(confidences) < MATCH_MIN_CONFIDENCE:
+            show_warning(
+                "The points could not be matched reliably, please check them in view2."
+            )
+        self._on_click_calculate()
+
+    @traced
     def _on_click_calculate(self) -> None:
         """When 'Calculate' button is clicked, calculate stereoshift and populate table"""
 
@@ -271,6 +314,7 @@ class StereoshiftDialog(QDialog):
         self.tstereoshift.setText(str(self.stereoshift_info.stereoshift))
         self.tdepth.setText(str(self.stereoshift_info.depth_cm))
 
+    @traced
     def _on_click_save_to_table(self) -> None:
         """When 'Save to table' button is clicked, propagate stereoshift and depth to main table"""
         # Propagate to particle
@@ -291,19 +335,10 @@ class StereoshiftDialog(QDialog):
                     copy.deepcopy(self.stereoshift_info)
                 )
             # Update the table
-            self.parent.table.setItem(
-                selected_row,
-                self.parent._get_table_column_index(
-                    self.stereoshift_info.name + "_stereoshift_info"
-                ),
-                QTableWidgetItem(str(self.stereoshift_info)),
-            )
-            self.parent.table.setItem(
-                selected_row,
-                self.parent._get_table_column_index(
-                    self.stereoshift_info.name + "_depth_cm"
-                ),
-                QTableWidgetItem(str(self.stereoshift_info.depth_cm)),
+            vertex = self.stereoshift_info.name
+            # (the depth of the origin vertex changes the magnification)
+            self.parent.table_model.invalidate(
+                [selected_row], [vertex + "_stereoshift_info", vertex + "_depth_cm"]
             )
 
             napari.utils.notifications.show_info(
@@ -0,0 +1,389 @@
+"""
+Reading and writing of the particle table and analysis sessions.
+
+The particle table is stored as flat (columnar) NumPy arrays, one per
+variable, in a NumPy archive with a small JSON header. These files can be read
+back without executing any code and without building one Python object per
+nested list.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import pickle
+import re
+import warnings
+from collections.abc import Callable
+from dataclasses import dataclass, field, fields
+from itertools import chain
+from operator import attrgetter
+from typing import Optional, get_type_hints
+
+import numpy as np
+
+from .analysis import ParticleDecay, StereoshiftInfo
+
+RESULTS_SUFFIX = ".npz"
+SESSION_SUFFIX = ".cpt"
+# Bytes read from the middle of image files for the identity of a dataset
+FINGERPRINT_BYTES = 2**16
+
+# Version of the layout of the arrays in results and session files. When the
+# layout changes, bump it and add a function to _MIGRATIONS that upgrades the
+# header and arrays of a file written with the previous version.
+FORMAT_VERSION = 1
+_MIGRATIONS: dict[int, Callable[[dict, dict[str, np.ndarray]], None]] = {}
+
+
+def _fields_of_type(cls, kind) -> tuple[str, ...]:
+    # The types of the fields are resolved, in case they are annotated as strings
+    types = get_type_hints(cls)
+    return tuple(f.name for f in fields(cls) if types[f.name] == kind)
+
+
+# ParticleDecay attributes stored as one flat array each
+_INT_FIELDS = _fields_of_type(ParticleDecay, int)
+_FLOAT_FIELDS = _fields_of_type(ParticleDecay, float)
+_VERTICES = ("origin_vertex", "decay_vertex")
+_STEREOSHIFT_FLOAT_FIELDS = _fields_of_type(StereoshiftInfo, float)
+# The points (e.g. _r1, _r2, _r3) are stored together (e.g. in rpoints)
+_POINTS: dict[str, tuple[str, ...]] = {}
+for _point in _fields_of_type(ParticleDecay, list[float]):
+    _column_name = _point.strip("_0123456789") + "points"
+    _POINTS[_column_name] = (*_POINTS.get(_column_name, ()), _point)
+_SPOINTS = _fields_of_type(StereoshiftInfo, list[float])
+
+# Array name -> attribute path(s) in ParticleDecay
+_SCALAR_COLUMNS = {var: var for var in _INT_FIELDS + _FLOAT_FIELDS}
+_POINT_COLUMNS = dict(_POINTS)
+_NAME_COLUMNS = {"name": "name"}
+for _vertex in _VERTICES:
+    for _var in _STEREOSHIFT_FLOAT_FIELDS:
+        _SCALAR_COLUMNS[f"{_vertex}_{_var}"] = f"{_vertex}_stereoshift_info.{_var}"
+    _POINT_COLUMNS[f"{_vertex}_spoints"] = tuple(
+        f"{_vertex}_stereoshift_info.{point}" for point in _SPOINTS
+    )
+    _NAME_COLUMNS[f"{_vertex}_name"] = f"{_vertex}_stereoshift_info.name"
+
+_get_scalars = attrgetter(*_SCALAR_COLUMNS.values())
+_get_points = attrgetter(*chain.from_iterable(_POINT_COLUMNS.values()))
+_get_names = attrgetter(*_NAME_COLUMNS.values())
+_POINT_COUNT = sum(len(points) for points in _POINT_COLUMNS.values())
+
+
+def particles_to_arrays(particles: list[ParticleDecay]) -> dict[str, np.ndarray]:
+    """Convert a list of particles into a dictionary of flat arrays (one entry per row)."""
+    n = len(particles)
+    scalars = np.fromiter(
+        chain.from_iterable(map(_get_scalars, particles)),
+        dtype=float,
+        count=n * len(_SCALAR_COLUMNS),
+    ).reshape(n, len(_SCALAR_COLUMNS))
+    points = np.fromiter(
+        chain.from_iterable(chain.from_iterable(map(_get_points, particles))),
+        dtype=float,
+        count=n * _POINT_COUNT * 2,
+    ).reshape(n, _POINT_COUNT, 2)
+    names = np.array(list(map(_get_names, particles)), dtype=str).reshape(
+        n, len(_NAME_COLUMNS)
+    )
+
+    arrays: dict[str, np.ndarray] = {}
+    for i, column in enumerate(_NAME_COLUMNS):
+        arrays[column] = np.ascontiguousarray(names[:, i])
+    for i, column in enumerate(_SCALAR_COLUMNS):
+        dtype = np.int64 if column in _INT_FIELDS else float
+        arrays[column] = scalars[:, i].astype(dtype)
+    first = 0
+    for column, paths in _POINT_COLUMNS.items():
+        arrays[column] = np.ascontiguousarray(points[:, first : first + len(paths)])
+        first += len(paths)
+    return arrays
+
+
+def _column(
+    arrays: dict[str, np.ndarray], attribute: str, vertex: str = ""
+) -> list | None:
+    """Values of a ParticleDecay (or a vertex StereoshiftInfo) attribute for every
+    row, or None if there is no array for it."""
+    if vertex:
+        if attribute in _SPOINTS:
+            column, index = vertex + "_spoints", _SPOINTS.index(attribute)
+        else:
+            column, index = vertex + "_" + attribute, None
+    else:
+        column, index = attribute, None
+        for points_column, points in _POINTS.items():
+            if attribute in points:
+                column, index = points_column, points.index(attribute)
+    if column not in arrays:
+        return None
+    values = arrays[column] if index is None else arrays[column][:, index]
+    return values.tolist()
+
+
+def _attributes(n: int, columns: dict[str, list]) -> list[dict]:
+    """Keyword arguments of a dataclass for each of `n` rows, from the columns of
+    its attributes that are not None (the others take the default of their
+    field)."""
+    columns = {key: values for key, values in columns.items() if values is not None}
+    if not columns:
+        return [{}] * n
+    return [dict(zip(columns, row)) for row in zip(*columns.values())]
+
+
+def particles_from_arrays(arrays: dict[str, np.ndarray]) -> list[ParticleDecay]:
+    """Inverse of `particles_to_arrays`. Missing arrays take the default values."""
+    n = len(arrays["name"])
+    infos = {}
+    for vertex in _VERTICES:
+        columns = {
+            f.name: _column(arrays, f.name, vertex) for f in fields(StereoshiftInfo)
+        }
+        infos[vertex + "_stereoshift_info"] = [
+            StereoshiftInfo(**attributes) for attributes in _attributes(n, columns)
+        ]
+
+    columns = {
+        f.name: infos[f.name] if f.name in infos else _column(arrays, f.name)
+        for f in fields(ParticleDecay)
+    }
+    return [ParticleDecay(**attributes) for attributes in _attributes(n, columns)]
+
+
+def write_archive(
+    file_name: str,
+    kind: str,
+    header: dict,
+    arrays: dict[str, np.ndarray],
+    compress: bool = False,
+) -> None:
+    """Write flat arrays and a JSON header to a NumPy archive of the given kind."""
+    header = {"kind": kind, "version": FORMAT_VERSION, **header}
+    arrays = {
+        **arrays,
+        "header": np.frombuffer(json.dumps(header).encode("utf8"), dtype=np.uint8),
+    }
+    # Pass a file handle so numpy does not append '.npz' to the file name
+    with open(file_name, "wb") as handle:
+        if compress:
+            np.savez_compressed(handle, **arrays)
+        else:
+            np.savez(handle, **arrays)
+
+
+def read_archive(file_name: str, kind: str) -> tuple[dict, dict[str, np.ndarray]]:
+    """Read the header and arrays written by `write_archive`, upgrading files
+    written with an older format version. No code is executed on load."""
+    with np.load(file_name, allow_pickle=False) as archive:
+        header = json.loads(archive["header"].tobytes().decode("utf8"))
+        arrays = {key: archive[key] for key in archive.files if key != "header"}
+
+    if header.get("kind", kind) != kind:
+        raise ValueError(f"{file_name} is not a {kind} file.")
+    version = header.get("version", 1)
+    if version > FORMAT_VERSION:
+        warnings.warn(
+            f"{file_name} was written by a newer version of cavendish-particle-tracks, "
+            "data it does not know about is ignored.",
+            stacklevel=2,
+        )
+    for old_version in range(version, FORMAT_VERSION):
+        _MIGRATIONS[old_version](header, arrays)
+    return header, arrays
+
+
+def read_cache(
+    file_name: Optional[str], kind: str, names: tuple[str, ...]
+) -> tuple[np.ndarray, ...]:
+    """The named arrays of a per-dataset cache written by `write_cache` (empty
+    if there is no cache yet). The cache is ignored, with a warning, if it
+    cannot be read: it is computed again."""
+    if file_name and os.path.exists(file_name):
+        try:
+            _, arrays = read_archive(file_name, kind)
+            return tuple(arrays[name] for name in names)
+        except (OSError, ValueError, KeyError) as error:
+            warnings.warn(
+                f"Ignoring the cached {kind.replace('_', ' ')}: {error}", stacklevel=3
+            )
+    return tuple(np.empty(0) for _ in names)
+
+
+def write_cache(
+    file_name: Optional[str], kind: str, arrays: dict[str, np.ndarray]
+) -> None:
+    """Write a per-dataset cache (nothing if there is no cache file)."""
+    if not file_name:
+        return
+    os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+    write_archive(file_name, kind, {}, arrays)
+
+
+def save_results(file_name: str, particles: list[ParticleDecay], seed: int = -1) -> None:
+    """Write the particle table to a NumPy archive (*.npz) of flat arrays."""
+    write_archive(file_name, "results", {"seed": seed}, particles_to_arrays(particles))
+
+
+@dataclass
+class Session:
+    """Everything needed to resume an analysis: the dataset, the particle table,
+    the calibration layers and the magnification parameters."""
+
+    manifest: dict = field(default_factory=dict)
+    seed: int = 1
+    mag_a: float = -1.0
+    mag_b: float = 0.0
+    magnification_fiducials: list[dict] = field(default_factory=list)
+    particles: list[ParticleDecay] = field(default_factory=list)
+    layers: dict[str, np.ndarray] = field(default_factory=dict)
+
+
+def file_fingerprint(file_names: list[str]) -> str:
+    """Hash of the sizes of files and of the bytes in the middle of the first and
+    last of them, which tells apart datasets whose files are named alike (e.g.
+    the film rolls of a lab) without reading all the files."""
+    digest = hashlib.sha1()
+    for file_name in file_names:
+        digest.update(str(os.path.getsize(file_name)).encode("utf8"))
+    for file_name in file_names[:1] + file_names[-1:]:
+        with open(file_name, "rb") as f:
+            f.seek(max(os.path.getsize(file_name) - FINGERPRINT_BYTES, 0) // 2)
+            digest.update(f.read(FINGERPRINT_BYTES))
+    return digest.hexdigest()
+
+
+def dataset_id(manifest: dict) -> str:
+    """Identifier of the dataset described by a manifest, to cache the results
+    computed for it. It only depends on the views and the names and contents
+    (fingerprints) of the image files, not on where the dataset is, so it is
+    the same on all the lab computers."""
+    identity = {
+        "subdirs": manifest["subdirs"],
+        "files": manifest["files"],
+        "fingerprints": manifest.get("fingerprints", []),
+    }
+    digest = hashlib.sha1(json.dumps(identity, sort_keys=True).encode("utf8"))
+    return digest.hexdigest()[:16]
+
+
+def save_session(file_name: str, session: Session) -> None:
+    """Write the session to a single compressed NumPy archive."""
+    header = {
+        "manifest": session.manifest,
+        "seed": session.seed,
+        "mag_a": session.mag_a,
+        "mag_b": session.mag_b,
+        "magnification_fiducials": session.magnification_fiducials,
+        "layers": list(session.layers),
+    }
+    arrays = {
+        "particles/" + key: value
+        for key, value in particles_to_arrays(session.particles).items()
+    }
+    for name, data in session.layers.items():
+        arrays["layers/" + name] = np.asarray(data, dtype=float)
+    write_archive(file_name, "session", header, arrays, compress=True)
+
+
+def load_session(file_name: str) -> Session:
+    """Read a session written by `save_session`."""
+    header, arrays = read_archive(file_name, "session")
+    particles = particles_from_arrays(
+        {
+            key.split("/", 1)[1]: value
+            for key, value in arrays.items()
+            if key.startswith("particles/")
+        }
+    )
+    return Session(
+        manifest=header["manifest"],
+        seed=header["seed"],
+        mag_a=header["mag_a"],
+        mag_b=header["mag_b"],
+        magnification_fiducials=header["magnification_fiducials"],
+        particles=particles,
+        layers={name: arrays["layers/" + name] for name in header["layers"]},
+    )
+
+
+# Matches the numbers written by `ParticleDecay.to_csv`, but not the digits in
+# labels such as 'sf1='
+_NUMBER = re.compile(r"(?<![\w.])[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|inf|nan)")
+
+
+def _numbers(column: list[str], per_row: int) -> np.ndarray:
+    """Parse the same number of numeric values from every entry of a text column."""
+    values = np.array(_NUMBER.findall(" ".join(column)), dtype=float)
+    return values.reshape(len(column), per_row)
+
+
+def read_csv(file_name: str) -> dict[str, np.ndarray]:
+    """Parse a CSV file written by the widget into flat arrays (see
+    `particles_to_arrays`). Each column is converted in one go."""
+    with open(file_name, encoding="utf8") as f:
+        header = f.readline().rstrip("\r\n").split(",")
+        rows = [line.rstrip("\r\n").split(",") for line in f if line.strip()]
+    columns = dict(zip(header, map(list, zip(*rows)))) if rows else {}
+    if not columns:
+        return particles_to_arrays([])
+
+    arrays: dict[str, np.ndarray] = {"name": np.array(columns["name"], dtype=str)}
+    for var in _INT_FIELDS:
+        arrays[var] = np.array(columns[var], dtype=float).astype(np.int64)
+    for var in _FLOAT_FIELDS:
+        arrays[var] = np.array(columns[var], dtype=float)
+    arrays["rpoints"] = _numbers(columns["rpoints"], 6).reshape(-1, 3, 2)
+    arrays["dpoints"] = _numbers(columns["dpoints"], 4).reshape(-1, 2, 2)
+    for vertex in _VERTICES:
+        # StereoshiftInfo(name=...; sf1=[x y]; ...; depth_cm=...)
+        names, values = zip(
+            *(
+                info[len("StereoshiftInfo(name=") :].split(";", 1)
+                for info in columns[vertex + "_stereoshift_info"]
+            )
+        )
+        numbers = _numbers(list(values), 12)
+        arrays[vertex + "_name"] = np.array(names, dtype=str)
+        arrays[vertex + "_spoints"] = numbers[:, :8].reshape(-1, 4, 2)
+        for i, var in enumerate(_STEREOSHIFT_FLOAT_FIELDS):
+            arrays[vertex + "_" + var] = numbers[:, 8 + i]
+    return arrays
+
+
+class _ParticleUnpickler(pickle.Unpickler):
+    """Unpickler that only constructs the analysis dataclasses and NumPy scalars,
+    so that loading a pickle file cannot execute arbitrary code."""
+
+    _allowed = {
+        ("cavendish_particle_tracks.analysis", "ParticleDecay"),
+        ("cavendish_particle_tracks.analysis", "StereoshiftInfo"),
+        ("numpy", "dtype"),
+        ("numpy.core.multiarray", "scalar"),
+        ("numpy._core.multiarray", "scalar"),
+    }
+
+    def find_class(self, module, name):
+        if (module, name) not in self._allowed:
+            raise pickle.UnpicklingError(f"Unexpected object {module}.{name} in file.")
+        return super().find_class(module, name)
+
+
+def read_pickle(file_name: str) -> list[ParticleDecay]:
+    """Read a pickle file written by the widget (a list of `ParticleDecay`)."""
+    with open(file_name, "rb") as handle:
+        return _ParticleUnpickler(handle).load()
+
+
+def load_results(file_name: str) -> list[ParticleDecay]:
+    """Read the particles saved in a NumPy (*.npz), CSV (*.csv) or legacy Pickle
+    (*.pkl) results file."""
+    if file_name.endswith(RESULTS_SUFFIX):
+        return particles_from_arrays(read_archive(file_name, "results")[1])
+    if file_name.endswith(".csv"):
+        return particles_from_arrays(read_csv(file_name))
+    if file_name.endswith(".pkl"):
+        return read_pickle(file_name)
+    raise ValueError(f"Unsupported results file: {file_name}")
@@ -0,0 +1,210 @@
+"""
+Timing of the hot paths of the plugin.
+
+When tracing is on (set CPT_TRACE to the name of the trace file), the spans
+wrapped with `span` or `traced` (loading the data, the button handlers, the
+dialog calculations, the table updates), and the dask tasks decoding the image
+slices, are recorded and written to the trace file when Python exits, in the
+Chrome trace event format. It opens in https://ui.perfetto.dev or
+chrome://tracing.
+
+When tracing is off, `span` and `traced` cost a function call.
+"""
+
+from __future__ import annotations
+
+import atexit
+import contextlib
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from typing import Any, Callable, Optional
+
+from ._settings import get_trace_file
+
+# The recorded events, None when tracing is off
+_events: Optional[list[dict]] = None
+_file_name: Optional[str] = None
+_origin = time.perf_counter()
+_exit_handler_registered = False
+_dask_callback = None
+
+
+def _now() -> float:
+    """Microseconds since the module was imported."""
+    return (time.perf_counter() - _origin) * 1e6
+
+
+def enabled() -> bool:
+    return _events is not None
+
+
+def start(file_name: str) -> None:
+    """Start recording, to write the trace to `file_name` on exit."""
+    global _events, _file_name, _exit_handler_registered
+    _events = []
+    _file_name = file_name
+    if not _exit_handler_registered:
+        atexit.register(_write_on_exit)
+        _exit_handler_registered = True
+    _watch_dask()
+
+
+def stop() -> list[dict]:
+    """Stop recording, and return the recorded events."""
+    global _events, _file_name, _dask_callback
+    events, _events, _file_name = _events or [], None, None
+    if _dask_callback is not None:
+        _dask_callback.unregister()
+        _dask_callback = None
+    return events
+
+
+def write(file_name: Optional[str] = None) -> None:
+    """Write the events recorded so far to `file_name` (by default the trace file)."""
+    file_name = file_name or _file_name
+    if _events is None or not file_name:
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    with open(file_name, "w") as file:
+        json.dump({"traceEvents": list(_events), "displayTimeUnit": "ms"}, file)
+
+
+def _write_on_exit() -> None:
+    try:
+        write()
+    except OSError as error:
+        print(f"Could not write the trace: {error}")
+
+
+def _record(
+    name: str, begin: float, end: float, thread: int, category: str, args: dict
+) -> None:
+    event = {
+        "name": name,
+        "cat": category,
+        "ph": "X",
+        "ts": begin,
+        "dur": end - begin,
+        "pid": os.getpid(),
+        "tid": thread,
+    }
+    if args:
+        event["args"] = {key: str(value) for key, value in args.items()}
+    if _events is not None:
+        _events.append(event)
+
+
+@contextlib.contextmanager
+def _span(name: str, category: str, args: dict) -> Iterator[None]:
+    begin = _now()
+    try:
+        yield
+    finally:
+        _record(name, begin, _now(), threading.get_ident(), category, args)
+
+
+def span(name: str, category: str = "cpt", **args: Any):
+    """Context manager timing the code it wraps, with optional `args` shown in
+    the trace viewer."""
+    if _events is None:
+        return contextlib.nullcontext()
+    return _span(name, category, args)
+
+
+def _with_signature(func: Callable, call: Callable) -> Callable:
+    """A function with the parameters (and metadata) of `func`, which passes its
+    arguments on to `call`.
+
+    Qt calls a slot with fewer arguments than its signal has (e.g. without the
+    checked state of a button) when the call fails on the parameters of the
+    slot, so a wrapper taking ``*args`` would get, and fail on, all of them.
+    """
+    code = func.__code__
+    names = code.co_varnames
+    parameters = list(names[: code.co_argcount])
+    arguments = list(parameters)
+    if code.co_posonlyargcount:
+        parameters.insert(code.co_posonlyargcount, "/")
+    keyword_only = names[code.co_argcount : code.co_argcount + code.co_kwonlyargcount]
+    index = code.co_argcount + code.co_kwonlyargcount
+    if code.co_flags & inspect.CO_VARARGS:
+        parameters.append("*" + names[index])
+        arguments.append("*" + names[index])
+        index += 1
+    elif keyword_only:
+        parameters.append("*")
+    parameters.extend(keyword_only)
+    arguments.extend(f"{name}={name}" for name in keyword_only)
+    if code.co_flags & inspect.CO_VARKEYWORDS:
+        parameters.append("**" + names[index])
+        arguments.append("**" + names[index])
+
+    namespace = {"_traced_call": call}
+    exec(  # noqa: S102
+        f"def wrapper({', '.join(parameters)}):\n"
+        f"    return _traced_call({', '.join(arguments)})\n",
+        namespace,
+    )
+    wrapper = namespace["wrapper"]
+    wrapper.__defaults__ = func.__defaults__
+    wrapper.__kwdefaults__ = func.__kwdefaults__
+    return functools.wraps(func)(wrapper)
+
+
+def traced(func: Callable) -> Callable:
+    """Decorator timing each call of `func`. The decorated function takes the
+    same arguments as `func`."""
+    name = func.__qualname__
+
+    def call(*args, **kwargs):
+        if _events is None:
+            return func(*args, **kwargs)
+        with _span(name, "cpt", {}):
+            return func(*args, **kwargs)
+
+    return _with_signature(func, call)
+
+
+def _watch_dask() -> None:
+    """Record the dask tasks (e.g. decoding the frames of a slice), if dask is
+    used."""
+    global _dask_callback
+    if _dask_callback is not None:
+        return
+    try:
+        from dask.callbacks import Callback
+        from dask.utils import key_split
+    except ImportError:
+        return
+
+    begins: dict = {}
+
+    def start(dsk):
+        begins[threading.get_ident()] = _now()
+
+    def finish(dsk, state, errored):
+        begin = begins.pop(threading.get_ident(), None)
+        if begin is not None:
+            _record("dask compute", begin, _now(), threading.get_ident(), "dask", {})
+
+    def pretask(key, dsk, state):
+        begins[key] = _now()
+
+    def posttask(key, result, dsk, state, worker_id):
+        begin = begins.pop(key, None)
+        if begin is not None:
+            _record(key_split(key), begin, _now(), worker_id, "dask", {"key": key})
+
+    _dask_callback = Callback(
+        start=start, pretask=pretask, posttask=posttask, finish=finish
+    )
+    _dask_callback.register()
+
+
+if get_trace_file():
+    start(get_trace_file())  # type: ignore[arg-type]
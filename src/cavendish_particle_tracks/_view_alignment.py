@@ -0,0 +1,179 @@
+"""
+Alignment of the three views of each event.
+
+The views of an event are offset and scaled differently. The affine transform
+from the first view to each of the others is estimated from a grid of image
+patches matched by phase correlation at a coarse pyramid level, and cached per
+dataset and image, so the stereoshift matching (and any other cross-view tool)
+can start from it instead of from hand-placed reference points.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator
+from typing import Optional
+
+import numpy as np
+
+from ._correspondence import match_point, phase_correlation
+from ._storage import read_cache, write_cache
+from ._tracing import traced
+
+# Images are downsampled by 2**ALIGNMENT_LEVEL to be aligned
+ALIGNMENT_LEVEL = 3
+# Side of the grid of patches matched between the (downsampled) views
+GRID_SIZE = 4
+PATCH_SIZE = 64
+MIN_CONFIDENCE = 0.2
+
+
+def estimate_affine(source, target) -> Optional[np.ndarray]:
+    """Least squares 2x3 affine transform mapping the (y, x) `source` points to
+    the `target` points, ignoring the worst matches. None if there are fewer than
+    three (good) points."""
+    source = np.asarray(source, dtype=float).reshape(-1, 2)
+    target = np.asarray(target, dtype=float).reshape(-1, 2)
+    keep = np.ones(len(source), dtype=bool)
+    matrix = None
+    for _ in range(2):
+        if keep.sum() < 3:
+            return None
+        homogeneous = np.column_stack([source[keep], np.ones(keep.sum())])
+        solution, *_ = np.linalg.lstsq(homogeneous, target[keep], rcond=None)
+        matrix = solution.T
+        residuals = np.linalg.norm(apply_affine(matrix, source) - target, axis=1)
+        keep = residuals <= 3 * np.median(residuals[keep]) + 1
+    return matrix
+
+
+def apply_affine(matrix: np.ndarray, points) -> np.ndarray:
+    """Apply a 2x3 affine transform to (y, x) points."""
+    points = np.asarray(points, dtype=float)
+    return points @ matrix[:, :2].T + matrix[:, 2]
+
+
+def _homogeneous(matrix: np.ndarray) -> np.ndarray:
+    return np.vstack([matrix, [0.0, 0.0, 1.0]])
+
+
+def _downsampled(stack, view: int, event: int, level: int) -> np.ndarray:
+    """Grayscale image (view, event) of `stack` keeping one pixel in 2**level."""
+    step = 2**level
+    image = np.asarray(stack[view, event, ::step, ::step], dtype=float)
+    if image.ndim == 3:
+        image = image[..., :3].mean(axis=-1)
+    return image
+
+
+@traced
+def estimate_view_transform(
+    stack,
+    event: int,
+    from_view: int,
+    to_view: int,
+    level: int = ALIGNMENT_LEVEL,
+) -> Optional[np.ndarray]:
+    """Affine transform from the (y, x) pixels of `from_view` to those of
+    `to_view` of an event of the (view, event, y, x) `stack`, or None if the
+    views could not be matched."""
+    images = np.stack(
+        [
+            _downsampled(stack, from_view, event, level),
+            _downsampled(stack, to_view, event, level),
+        ]
+    )[:, np.newaxis]
+    # The overall offset of the views is the starting point of the local matches
+    offset, _ = phase_correlation(images[0, 0], images[1, 0])
+    height, width = images.shape[2:]
+    centers = np.stack(
+        np.meshgrid(
+            (np.arange(GRID_SIZE) + 0.5) * height / GRID_SIZE,
+            (np.arange(GRID_SIZE) + 0.5) * width / GRID_SIZE,
+            indexing="ij",
+        ),
+        axis=-1,
+    ).reshape(-1, 2)
+    source, target = [], []
+    for center in centers:
+        match = match_point(
+            images, 0, center, 0, 1, guess=center + offset, size=PATCH_SIZE
+        )
+        if match.confidence >= MIN_CONFIDENCE:
+            source.append(center)
+            target.append(match.position)
+    matrix = estimate_affine(source, target)
+    if matrix is None:
+        return None
+    # Back to full resolution pixels
+    scale = np.diag([2.0**level, 2.0**level, 1.0])
+    return (scale @ _homogeneous(matrix) @ np.linalg.inv(scale))[:2]
+
+
+class ViewTransforms:
+    """Affine transforms from the first view to the other views of each image,
+    cached in a NumPy archive.
+
+    The images are identified by their index in the (unshuffled) dataset, so the
+    cache can be shared by sessions with different shuffling seeds.
+    """
+
+    def __init__(self, file_name: Optional[str] = None):
+        self.file_name = file_name
+        self._transforms: dict[tuple[int, int], np.ndarray] = {}
+        arrays = read_cache(file_name, "view_transforms", ("keys", "matrices"))
+        for key, matrix in zip(*arrays):
+            self._transforms[(int(key[0]), int(key[1]))] = matrix
+
+    def __contains__(self, image: int) -> bool:
+        return all((image, view) in self._transforms for view in (1, 2))
+
+    def set(self, image: int, to_view: int, matrix: Optional[np.ndarray]) -> None:
+        """Record the transform from the first view to `to_view` of an image
+        (None if the views could not be matched, so they are not tried again)."""
+        if matrix is None:
+            matrix = np.full((2, 3), np.nan)
+        self._transforms[(image, to_view)] = np.asarray(matrix, dtype=float)
+
+    def _from_first_view(self, image: int, view: int) -> Optional[np.ndarray]:
+        """3x3 transform from the first view to `view` of an image."""
+        if view == 0:
+            return np.eye(3)
+        matrix = self._transforms.get((image, view))
+        if matrix is None or np.isnan(matrix).any():
+            return None
+        return _homogeneous(matrix)
+
+    def get(self, image: int, from_view: int, to_view: int) -> Optional[np.ndarray]:
+        """Transform from `from_view` to `to_view` of an image, if known."""
+        source = self._from_first_view(image, from_view)
+        target = self._from_first_view(image, to_view)
+        if source is None or target is None:
+            return None
+        return (target @ np.linalg.inv(source))[:2]
+
+    def save(self) -> None:
+        """Write the transforms to the cache file."""
+        keys = sorted(self._transforms)
+        write_cache(
+            self.file_name,
+            "view_transforms",
+            {
+                "keys": np.array(keys, dtype=np.int64).reshape(-1, 2),
+                "matrices": np.array(
+                    [self._transforms[key] for key in keys], dtype=float
+                ).reshape(-1, 2, 3),
+            },
+        )
+
+
+def align_views(
+    stack, images: list[int], transforms: ViewTransforms
+) -> Iterator[tuple[int, int, Optional[np.ndarray]]]:
+    """Estimate the transforms from the first view to the others for each event
+    of `stack` whose image (index in the dataset) is not in `transforms` yet,
+    yielding (image, view, transform) as they are computed."""
+    for event, image in enumerate(images):
+        if image in transforms:
+            continue
+        for view in (1, 2):
+            yield image, view, estimate_view_transform(stack, event, 0, view)
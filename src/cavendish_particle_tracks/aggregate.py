@@ -0,0 +1,182 @@
+"""
+Merge the results files of many students into a single columnar dataset.
+
+Results files (NumPy, CSV, legacy Pickle or session files, or results
+databases) are parsed in parallel, their nested point and stereoshift fields
+are converted into arrays, and particles recorded more than once (same shuffling seed, event number and
+particle name) are kept only once. From the command line::
+
+    cpt-aggregate student_results/*.csv --seed 1 --output lab_results.npz
+"""
+
+from __future__ import annotations
+
+import argparse
+import pickle
+import sqlite3
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+
+from ._results_store import STORE_SUFFIXES, read_store
+from ._storage import (
+    RESULTS_SUFFIX,
+    SESSION_SUFFIX,
+    load_session,
+    particles_to_arrays,
+    read_archive,
+    read_csv,
+    read_pickle,
+    write_archive,
+)
+from .analysis import ParticleDecay
+
+
+def read_results_file(file_name: str, seed: int = -1) -> dict[str, np.ndarray]:
+    """Read a results or session file into flat arrays, with a `seed` column.
+
+    NumPy and session files record the shuffling seed they were saved with; for
+    CSV and Pickle files `seed` is used instead. Results databases (see
+    `read_store`) record the seed and the source of each session.
+    """
+    if file_name.endswith(STORE_SUFFIXES):
+        return read_store(file_name)
+    if file_name.endswith(RESULTS_SUFFIX):
+        header, arrays = read_archive(file_name, "results")
+        seed = header.get("seed", seed)
+    elif file_name.endswith(SESSION_SUFFIX):
+        session = load_session(file_name)
+        arrays, seed = particles_to_arrays(session.particles), session.seed
+    elif file_name.endswith(".csv"):
+        arrays = read_csv(file_name)
+    elif file_name.endswith(".pkl"):
+        arrays = particles_to_arrays(read_pickle(file_name))
+    else:
+        raise ValueError(f"Unsupported results file: {file_name}")
+    if "seed" not in arrays:
+        # Files written by cpt-aggregate have the seed of each particle
+        arrays["seed"] = np.full(len(arrays["name"]), seed, dtype=np.int64)
+    return arrays
+
+
+def _read_results_file(args: tuple[str, int]) -> tuple[str, dict | str]:
+    """Process pool worker: return the arrays of a file, or the error message."""
+    file_name, seed = args
+    try:
+        return file_name, read_results_file(file_name, seed)
+    except (
+        OSError,
+        ValueError,
+        KeyError,
+        EOFError,
+        pickle.UnpicklingError,
+        zipfile.BadZipFile,
+        sqlite3.Error,
+    ) as error:
+        return file_name, f"{type(error).__name__}: {error}"
+
+
+def deduplicate(arrays: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """Keep the first particle of each (seed, event_number, name).
+
+    Particles recorded without an event (event_number of -1) are always kept.
+    """
+    keys = np.rec.fromarrays([arrays["seed"], arrays["event_number"], arrays["name"]])
+    _, first = np.unique(keys, return_index=True)
+    keep = np.zeros(len(keys), dtype=bool)
+    keep[first] = True
+    keep |= arrays["event_number"] < 0
+    return {column: values[keep] for column, values in arrays.items()}
+
+
+def aggregate(
+    file_names: list[str],
+    seed: int = -1,
+    workers: Optional[int] = None,
+) -> dict[str, np.ndarray]:
+    """Read many results files in parallel and merge them into one set of arrays.
+
+    A `source` column records where each particle came from. Files that cannot be
+    read are reported and skipped.
+    """
+    tables: list[dict[str, np.ndarray]] = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(_read_results_file, [(f, seed) for f in file_names])
+        for file_name, arrays in results:
+            if isinstance(arrays, str):
+                print(f"Skipping {file_name}: {arrays}", file=sys.stderr)
+                continue
+            if "source" not in arrays:
+                arrays["source"] = np.full(len(arrays["name"]), file_name)
+            tables.append(arrays)
+
+    if not tables:
+        return {}
+    return deduplicate(merge(tables))
+
+
+def merge(tables: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """Concatenate the arrays of several files, on the union of their columns.
+
+    The particle variables a file lacks (e.g. written by an older version) take
+    their default values. Other columns that only some files have are dropped.
+    """
+    defaults = particles_to_arrays([ParticleDecay()])
+    merged = {}
+    for column in dict.fromkeys(chain.from_iterable(tables)):
+        if all(column in arrays for arrays in tables):
+            merged[column] = np.concatenate([arrays[column] for arrays in tables])
+        elif column in defaults:
+            merged[column] = np.concatenate(
+                [
+                    (
+                        arrays[column]
+                        if column in arrays
+                        else np.repeat(defaults[column], len(arrays["name"]), axis=0)
+                    )
+                    for arrays in tables
+                ]
+            )
+        else:
+            print(f"Ignoring {column}, which only some files have", file=sys.stderr)
+    return merged
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="cpt-aggregate",
+        description="Merge Cavendish Particle Tracks results files into one NumPy file.",
+    )
+    parser.add_argument(
+        "files",
+        nargs="+",
+        help="results (*.npz, *.csv, *.pkl), session (*.cpt) or database (*.sqlite) files",
+    )
+    parser.add_argument(
+        "-o", "--output", default="aggregated_results.npz", help="output NumPy file"
+    )
+    parser.add_argument(
+        "--seed", type=int, default=-1, help="shuffling seed of the CSV and Pickle files"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of worker processes"
+    )
+    args = parser.parse_args(argv)
+
+    arrays = aggregate(args.files, seed=args.seed, workers=args.workers)
+    if not arrays:
+        print("No results could be read.", file=sys.stderr)
+        return 1
+    write_archive(args.output, "results", {"seed": -1, "files": args.files}, arrays)
+    print(
+        f"Wrote {len(arrays['name'])} particles from {len(args.files)} files to {args.output}"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,171 @@
+"""
+Kinematic quantities derived from the measurements of all the particles at once.
+
+The functions work on the flat arrays of a results file (as loaded with
+`numpy.load`, or produced by the widget) and use the decay hypotheses of
+`EXPECTED_PARTICLES`:
+
+- the momentum of charged particles from the calibrated radius of curvature,
+  p = 0.3·B·r;
+- the momentum of the parent and decay products from the decay angles,
+  assuming the masses of the hypothesis;
+- the proper decay time from the calibrated decay length, τ = L·m/(p·c).
+
+Quantities that cannot be computed for a particle are NaN.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+from .analysis import EXPECTED_PARTICLES
+
+MAGNETIC_FIELD = 1.7  # T
+SPEED_OF_LIGHT = 29.9792458  # cm/ns
+
+MASSES = {
+    "Σ⁺": 1189.37,
+    "Σ⁻": 1197.449,
+    "Λ⁰": 1115.683,
+    "p": 938.272,
+    "n": 939.565,
+    "π⁺": 139.570,
+    "π⁻": 139.570,
+    "π⁰": 134.977,
+}  # MeV/c²
+
+# Decay name -> (parent, (first decay product, second decay product))
+DECAY_HYPOTHESES = {
+    name: (name.split(" ⇨ ")[0], tuple(name.split(" ⇨ ")[1].split(" + ")))
+    for name in EXPECTED_PARTICLES[1:]
+}
+
+KINEMATICS_COLUMNS = [
+    "momentum_MeV",
+    "momentum_product1_MeV",
+    "momentum_product2_MeV",
+    "proper_time_ns",
+]
+
+# The measurements the kinematics are computed from
+KINEMATICS_INPUTS = (
+    "name",
+    "magnification_a",
+    "radius_px",
+    "radius_cm",
+    "decay_length_px",
+    "decay_length_cm",
+    "phi_proton",
+    "phi_pion",
+)
+
+
+def momentum_from_radius(
+    radius_cm: np.ndarray, field: float = MAGNETIC_FIELD
+) -> np.ndarray:
+    """Momentum (MeV/c) of a singly charged particle from its radius of curvature."""
+    # p [GeV/c] = 0.3 B [T] r [m]
+    return SPEED_OF_LIGHT / 10 * field * np.asarray(radius_cm, dtype=float)
+
+
+def two_body_momenta(
+    mass: float,
+    mass1: float,
+    mass2: float,
+    theta1: np.ndarray,
+    theta2: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Momenta (MeV/c) of the parent and the decay products of a two-body decay.
+
+    `theta1` and `theta2` are the angles between the parent and each of the
+    products. Momentum balance fixes the momenta of the products in terms of the
+    parent momentum (sine rule), and energy conservation then gives a quadratic
+    equation for the square of the parent momentum.
+    """
+    theta1 = np.abs(np.asarray(theta1, dtype=float))
+    theta2 = np.abs(np.asarray(theta2, dtype=float))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # p1 = a p, p2 = b p
+        a = np.sin(theta2) / np.sin(theta1 + theta2)
+        b = np.sin(theta1) / np.sin(theta1 + theta2)
+        # sqrt(p² + M²) = sqrt(a² p² + m1²) + sqrt(b² p² + m2²), squared twice
+        c = 1 - a**2 - b**2
+        d = mass**2 - mass1**2 - mass2**2
+        qa = c**2 - 4 * a**2 * b**2
+        qb = 2 * c * d - 4 * (a**2 * mass2**2 + b**2 * mass1**2)
+        qc = d**2 - 4 * mass1**2 * mass2**2
+        discriminant = np.sqrt(qb**2 - 4 * qa * qc)
+        roots = np.stack(
+            [(-qb + discriminant) / (2 * qa), (-qb - discriminant) / (2 * qa)]
+        )
+
+        # Squaring introduces spurious solutions: keep the one that conserves energy
+        p = np.sqrt(np.where(roots >= 0, roots, np.nan))
+        residual = np.abs(
+            np.sqrt(p**2 + mass**2)
+            - np.sqrt((a * p) ** 2 + mass1**2)
+            - np.sqrt((b * p) ** 2 + mass2**2)
+        )
+        best = np.argmin(np.where(np.isnan(residual), np.inf, residual), axis=0)
+        p = np.take_along_axis(p, best[np.newaxis], axis=0)[0]
+        p = np.where(
+            np.take_along_axis(residual, best[np.newaxis], axis=0)[0] < 1e-3 * mass,
+            p,
+            np.nan,
+        )
+    return p, a * p, b * p
+
+
+def proper_decay_time(
+    length_cm: np.ndarray, momentum: np.ndarray, mass: float
+) -> np.ndarray:
+    """Proper decay time (ns) of a particle of the given momentum (MeV/c) and mass."""
+    return np.asarray(length_cm) * mass / (np.asarray(momentum) * SPEED_OF_LIGHT)
+
+
+def kinematics(
+    arrays: dict[str, np.ndarray], field: float = MAGNETIC_FIELD
+) -> dict[str, np.ndarray]:
+    """Compute the `KINEMATICS_COLUMNS` for all the particles in `arrays`.
+
+    The momentum of charged parents comes from the radius of curvature, and that
+    of particles with measured decay angles from the decay hypothesis. Lengths
+    and radii are only used once the magnification has been computed.
+    """
+    n = len(arrays["name"])
+    out = {column: np.full(n, np.nan) for column in KINEMATICS_COLUMNS}
+    calibrated = arrays["magnification_a"] != -1
+    has_radius = calibrated & (arrays["radius_px"] != -1)
+    has_length = calibrated & (arrays["decay_length_px"] != -1)
+    has_angles = arrays["phi_proton"] != -100
+
+    for name, (parent, (product1, product2)) in DECAY_HYPOTHESES.items():
+        rows = arrays["name"] == name
+        if not rows.any():
+            continue
+        mass = MASSES[parent]
+
+        if parent[-1] in "⁺⁻":
+            selected = rows & has_radius
+            out["momentum_MeV"][selected] = momentum_from_radius(
+                arrays["radius_cm"][selected], field
+            )
+
+        selected = rows & has_angles
+        if selected.any():
+            p, p1, p2 = two_body_momenta(
+                mass,
+                MASSES[product1],
+                MASSES[product2],
+                arrays["phi_proton"][selected],
+                arrays["phi_pion"][selected],
+            )
+            out["momentum_MeV"][selected] = p
+            out["momentum_product1_MeV"][selected] = p1
+            out["momentum_product2_MeV"][selected] = p2
+
+        selected = rows & has_length
+        out["proper_time_ns"][selected] = proper_decay_time(
+            arrays["decay_length_cm"][selected], out["momentum_MeV"][selected], mass
+        )
+    return out
@@ -0,0 +1,271 @@
+"""
+Recompute the measurements of saved results and sessions from their points.
+
+When a formula of the analysis or the fiducial geometry changes, the values
+stored in results and session files are stale. The points the students placed
+are stored with them, so the radii, decay lengths, magnification parameters,
+stereoshifts and depths (and the calibrated values) are recomputed from them,
+in batch for all the particles of a file and in parallel for many files,
+without napari. From the command line::
+
+    cpt-recompute student_results/*.npz student_sessions/*.cpt --output-dir recomputed
+
+Only the shifts of the stereoshift points are stored (not the points of the
+reference view), so the stereoshifts and depths are recomputed from the
+shifts. The lines drawn to measure the decay angles are not stored, so the
+angles are kept as they are.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import pickle
+import sys
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+
+from ._calculate import depths, lengths, magnification, radii
+from ._storage import (
+    RESULTS_SUFFIX,
+    SESSION_SUFFIX,
+    load_session,
+    particles_from_arrays,
+    particles_to_arrays,
+    read_archive,
+    read_csv,
+    read_pickle,
+    save_session,
+    write_archive,
+)
+from .analysis import (
+    CHAMBER_DEPTH,
+    FIDUCIAL_BACK,
+    FIDUCIAL_FRONT,
+    Fiducial,
+    ParticleDecay,
+)
+
+# Value of the measurements that were not made
+UNMEASURED = -1.0
+
+
+def recompute_arrays(
+    arrays: dict[str, np.ndarray],
+    magnification_parameters: Optional[tuple[tuple, tuple]] = None,
+) -> dict[str, np.ndarray]:
+    """Recompute the measurements of the particles of flat arrays (see
+    `particles_to_arrays`), returning new arrays.
+
+    Only the measurements that were made are recomputed. If
+    `magnification_parameters` is given as ((old_a, old_b), (new_a, new_b)),
+    the particles calibrated with the old parameters are calibrated with the new
+    ones.
+    """
+    arrays = {column: values.copy() for column, values in arrays.items()}
+
+    measured = arrays["radius_px"] != UNMEASURED
+    arrays["radius_px"][measured] = radii(arrays["rpoints"][measured])
+    measured = arrays["decay_length_px"] != UNMEASURED
+    arrays["decay_length_px"][measured] = lengths(arrays["dpoints"][measured])
+
+    for vertex in ("origin_vertex", "decay_vertex"):
+        shift_fiducial = arrays[vertex + "_shift_fiducial"]
+        stereoshift = arrays[vertex + "_stereoshift"]
+        depth = arrays[vertex + "_depth_cm"]
+        measured = shift_fiducial > 0
+        new = arrays[vertex + "_shift_point"][measured] / shift_fiducial[measured]
+        # Whether the depth was measured from the back of the chamber
+        reverse = np.abs(
+            depth[measured] - (1 - stereoshift[measured]) * CHAMBER_DEPTH
+        ) < (np.abs(depth[measured] - stereoshift[measured] * CHAMBER_DEPTH))
+        stereoshift[measured] = new
+        depth[measured] = depths(new, reverse)
+
+    if magnification_parameters is not None:
+        (old_a, old_b), (new_a, new_b) = magnification_parameters
+        same = (arrays["magnification_a"] == old_a) & (arrays["magnification_b"] == old_b)
+        arrays["magnification_a"][same] = new_a
+        arrays["magnification_b"][same] = new_b
+
+    # As `ParticleDecay.calibrate`, for the particles that were calibrated
+    scale = (
+        arrays["magnification_a"]
+        + arrays["magnification_b"] * arrays["origin_vertex_depth_cm"]
+    )
+    for px, cm in (("radius_px", "radius_cm"), ("decay_length_px", "decay_length_cm")):
+        calibrated = arrays[cm] != UNMEASURED
+        arrays[cm][calibrated] = scale[calibrated] * arrays[px][calibrated]
+    return arrays
+
+
+def _changed_rows(old: dict[str, np.ndarray], new: dict[str, np.ndarray]) -> int:
+    """Number of particles with a value changed by `recompute_arrays`."""
+    changed = np.zeros(len(old["name"]), dtype=bool)
+    for column, values in new.items():
+        if values.dtype.kind == "f":
+            different = ~np.isclose(old[column], values, rtol=1e-12, equal_nan=True)
+            changed |= different.reshape(len(changed), -1).any(axis=1)
+    return int(changed.sum())
+
+
+def session_magnification(fiducials: list[dict]) -> Optional[tuple[float, float]]:
+    """Magnification parameters from the fiducials saved in a session, if the
+    four of them were placed."""
+    if len(fiducials) != 4:
+        return None
+    f1, f2, b1, b2 = (Fiducial(**fiducial) for fiducial in fiducials)
+    if not (
+        {f1.name, f2.name} <= FIDUCIAL_FRONT.keys()
+        and {b1.name, b2.name} <= FIDUCIAL_BACK.keys()
+        and all(f.x != Fiducial.x for f in (f1, f2, b1, b2))
+    ):
+        return None
+    a, b = magnification(f1, f2, b1, b2)
+    return float(a), float(b)
+
+
+def output_file_name(file_name: str, output_dir: Optional[str] = None) -> str:
+    """Where the recomputed file is written: next to `file_name` (or in
+    `output_dir`) with a '_recomputed' suffix. Pickle files are written as NumPy
+    results files."""
+    stem, extension = os.path.splitext(os.path.basename(file_name))
+    if extension == ".pkl":
+        extension = RESULTS_SUFFIX
+    folder = output_dir if output_dir is not None else os.path.dirname(file_name)
+    return os.path.join(folder, f"{stem}_recomputed{extension}")
+
+
+def recompute_file(file_name: str, output: str, seed: int = -1) -> tuple[int, int]:
+    """Recompute a results or session file and write it to `output`. Returns the
+    number of particles and of changed particles.
+
+    Files are written in the same format, except Pickle files which are written
+    as NumPy results files with the shuffling seed `seed`.
+    """
+    if file_name.endswith(SESSION_SUFFIX):
+        session = load_session(file_name)
+        arrays = particles_to_arrays(session.particles)
+        parameters = session_magnification(session.magnification_fiducials)
+        change = None
+        if parameters is not None:
+            change = ((session.mag_a, session.mag_b), parameters)
+            session.mag_a, session.mag_b = parameters
+        new = recompute_arrays(arrays, change)
+        session.particles = particles_from_arrays(new)
+        save_session(output, session)
+        return len(arrays["name"]), _changed_rows(arrays, new)
+
+    if file_name.endswith(".csv"):
+        arrays = read_csv(file_name)
+        new = recompute_arrays(arrays)
+        particles = particles_from_arrays(new)
+        with open(output, "w", encoding="UTF8", newline="") as f:
+            f.write(",".join(ParticleDecay().vars_to_save()) + "\n")
+            f.writelines([particle.to_csv() for particle in particles])
+        return len(arrays["name"]), _changed_rows(arrays, new)
+
+    if file_name.endswith(RESULTS_SUFFIX):
+        header, arrays = read_archive(file_name, "results")
+        header = {k: v for k, v in header.items() if k not in ("kind", "version")}
+    elif file_name.endswith(".pkl"):
+        header, arrays = {"seed": seed}, particles_to_arrays(read_pickle(file_name))
+    else:
+        raise ValueError(f"Unsupported results file: {file_name}")
+    new = recompute_arrays(arrays)
+    write_archive(output, "results", header, new)
+    return len(arrays["name"]), _changed_rows(arrays, new)
+
+
+def _recompute_file(args: tuple[str, str, int]) -> tuple[str, tuple | str]:
+    """Process pool worker: return the counts of a file, or the error message."""
+    file_name, output, seed = args
+    try:
+        return file_name, recompute_file(file_name, output, seed)
+    except (
+        OSError,
+        ValueError,
+        KeyError,
+        EOFError,
+        pickle.UnpicklingError,
+        zipfile.BadZipFile,
+    ) as error:
+        return file_name, f"{type(error).__name__}: {error}"
+
+
+def recompute(
+    file_names: list[str],
+    output_dir: Optional[str] = None,
+    in_place: bool = False,
+    seed: int = -1,
+    workers: Optional[int] = None,
+) -> dict[str, tuple[int, int] | str]:
+    """Recompute many results and session files in parallel.
+
+    Returns, for each file, the number of particles and of changed particles,
+    or the error message if it could not be recomputed.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+    jobs = []
+    for file_name in file_names:
+        output = output_file_name(file_name, output_dir)
+        if in_place and not file_name.endswith(".pkl"):
+            output = file_name
+        jobs.append((file_name, output, seed))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return dict(pool.map(_recompute_file, jobs))
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="cpt-recompute",
+        description="Recompute the measurements of Cavendish Particle Tracks "
+        "results and session files from their points.",
+    )
+    parser.add_argument(
+        "files", nargs="+", help="results (*.npz, *.csv, *.pkl) or session (*.cpt) files"
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument(
+        "-o",
+        "--output-dir",
+        default=None,
+        help="folder of the recomputed files (by default next to each file, "
+        "with a '_recomputed' suffix)",
+    )
+    output.add_argument(
+        "--in-place",
+        action="store_true",
+        help="overwrite the files (Pickle files are still written as NumPy files)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=-1, help="shuffling seed of the Pickle files"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of worker processes"
+    )
+    args = parser.parse_args(argv)
+
+    results = recompute(
+        args.files,
+        output_dir=args.output_dir,
+        in_place=args.in_place,
+        seed=args.seed,
+        workers=args.workers,
+    )
+    failed = 0
+    for file_name, result in results.items():
+        if isinstance(result, str):
+            print(f"Skipping {file_name}: {result}", file=sys.stderr)
+            failed += 1
+        else:
+            print(f"{file_name}: {result[1]} of {result[0]} particles changed")
+    return 1 if failed == len(results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,311 @@
+"""
+Synthetic bubble chamber datasets with known ground truth.
+
+`write_dataset` writes a folder with the three view subfolders of TIFF frames
+the widget loads. Each event shows a beam track ending at the production
+vertex, a Σ⁺ ⇨ p + π⁰ kink or a Λ⁰ ⇨ p + π⁻ "V0" decay, and the fiducial
+crosses of the front and back windows. The tracks are at known depths, and
+appear shifted between the views by the stereoshift those depths imply.
+
+The true radius, decay length, decay angles, vertex depths and magnification
+of each particle are written to a results file (``truth.npz``), in the
+coordinates of the first view and with the event numbers of the unshuffled
+frames, so they can be read with `load_results` and compared to measurements.
+From the command line::
+
+    cpt-synthetic-dataset synthetic_data --events 1000 --size 2048 --compression zlib
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from ._storage import particles_to_arrays, write_archive
+from .analysis import (
+    CHAMBER_DEPTH,
+    EXPECTED_PARTICLES,
+    FIDUCIAL_BACK,
+    FIDUCIAL_FRONT,
+    VIEW_NAMES,
+    ParticleDecay,
+    StereoshiftInfo,
+)
+
+TRUTH_FILE_NAME = "truth.npz"
+BACKGROUND, TRACK = 40, 210
+
+
+@dataclass
+class Camera:
+    """Projection of the chamber onto the (row, column) pixels of the views."""
+
+    size: int
+    """Height and width of the frames (pixels)."""
+    magnification_a: float
+    """cm per pixel at the front window."""
+    magnification_b: float
+    """Increase of the cm per pixel with the depth (per cm)."""
+    view_offsets: np.ndarray
+    """(row, column) offset of each view, e.g. from a misaligned film."""
+    stereo_shift: float
+    """Shift (pixels) between consecutive views of a point on the back window."""
+
+    @classmethod
+    def for_size(cls, size: int) -> Camera:
+        magnification_a = 60.0 / size
+        scale = size / 2048
+        return cls(
+            size=size,
+            magnification_a=magnification_a,
+            magnification_b=0.15 * magnification_a / CHAMBER_DEPTH,
+            view_offsets=np.array([[0.0, 0.0], [12.0, -35.0], [-20.0, 28.0]]) * scale,
+            stereo_shift=40.0 * scale,
+        )
+
+    def magnification(self, depth_cm):
+        return self.magnification_a + self.magnification_b * depth_cm
+
+    def project(self, xy_cm, depth_cm: float) -> np.ndarray:
+        """(row, column) in the first view of a point of the chamber, with the
+        optical axis at (7.5, 0) cm."""
+        x, y = np.asarray(xy_cm, dtype=float)
+        scale = self.magnification(depth_cm)
+        return np.array([self.size / 2 + y / scale, self.size / 2 + (x - 7.5) / scale])
+
+    def in_view(self, points: np.ndarray, depths, view: int) -> np.ndarray:
+        """(row, column) in `view` of points given in the first view."""
+        shift = view * self.stereo_shift * np.asarray(depths, dtype=float) / CHAMBER_DEPTH
+        shifted = points + self.view_offsets[view]
+        shifted[..., 1] += shift
+        return shifted
+
+
+@dataclass
+class Track:
+    """A track, as points in the first view and their depths."""
+
+    points: np.ndarray
+    depths: np.ndarray
+
+
+def _rotate(vector: np.ndarray, angle: float) -> np.ndarray:
+    """Rotate a (row, column) vector so that `_calculate.angle` measures `angle`
+    from the original to the rotated vector."""
+    cos, sin = np.cos(angle), np.sin(angle)
+    return np.array(
+        [cos * vector[0] - sin * vector[1], sin * vector[0] + cos * vector[1]]
+    )
+
+
+def _line(start, end, depth_start: float, depth_end: float) -> Track:
+    start, end = np.asarray(start, dtype=float), np.asarray(end, dtype=float)
+    t = np.linspace(0, 1, max(int(np.linalg.norm(end - start) * 2), 2))[:, np.newaxis]
+    return Track(start + t * (end - start), np.linspace(depth_start, depth_end, len(t)))
+
+
+def make_event(
+    event: int, camera: Camera, rng: np.random.Generator
+) -> tuple[list[Track], ParticleDecay]:
+    """Tracks of an event and the true measurements of its decay."""
+    size = camera.size
+    charged = bool(rng.integers(2))
+    name = "Σ⁺ ⇨ p + π⁰" if charged else "Λ⁰ ⇨ p + π⁻"
+    particle = ParticleDecay(
+        name=name,
+        index=EXPECTED_PARTICLES.index(name),
+        event_number=event,
+        view_number=0,
+        magnification_a=camera.magnification_a,
+        magnification_b=camera.magnification_b,
+    )
+    origin_depth, decay_depth = rng.uniform(0.1, 0.9, 2) * CHAMBER_DEPTH
+    origin = rng.uniform(0.3, 0.5, 2) * size
+    heading = rng.uniform(-0.5, 0.5)
+    direction = np.array([np.sin(heading), np.cos(heading)])
+    length = rng.uniform(0.08, 0.2) * size
+
+    tracks = [_line(origin - direction * size, origin, origin_depth, origin_depth)]
+    if charged:
+        # The parent is a circular arc turning left or right
+        radius = rng.uniform(0.3, 1.2) * size
+        sign = rng.choice([-1.0, 1.0])
+        normal = sign * _rotate(direction, np.pi / 2)
+        center = origin + radius * normal
+        start = np.arctan2(*(origin - center))
+        arc = -sign * length / radius
+        angles = start + np.linspace(0, arc, max(int(length * 2), 3))
+        points = center + radius * np.column_stack([np.sin(angles), np.cos(angles)])
+        tracks.append(Track(points, np.linspace(origin_depth, decay_depth, len(points))))
+        decay = points[-1]
+        parent_direction = points[-1] - points[-2]
+        particle.rpoints = [points[0], points[len(points) // 2], points[-1]]
+        particle.radius_px = radius
+        products = [rng.uniform(-1.2, 1.2)]
+    else:
+        # The neutral parent leaves no track
+        decay = origin + length * direction
+        parent_direction = direction
+        products = [rng.uniform(0.1, 0.6), -rng.uniform(0.2, 0.8)]
+        particle.phi_proton, particle.phi_pion = products
+
+    parent_direction = parent_direction / np.linalg.norm(parent_direction)
+    for phi in products:
+        end = decay + _rotate(parent_direction, phi) * rng.uniform(0.1, 0.25) * size
+        tracks.append(_line(decay, end, decay_depth, decay_depth))
+
+    particle.dpoints = [origin, decay]
+    particle.decay_length_px = float(np.linalg.norm(decay - origin))
+    for vertex, depth in (("origin_vertex", origin_depth), ("decay_vertex", decay_depth)):
+        setattr(
+            particle,
+            vertex + "_stereoshift_info",
+            StereoshiftInfo(
+                name=vertex, stereoshift=depth / CHAMBER_DEPTH, depth_cm=float(depth)
+            ),
+        )
+    particle.calibrate()
+    return tracks, particle
+
+
+def fiducial_tracks(camera: Camera, arm: float = 15.0) -> list[Track]:
+    """Crosses on the fiducials of the front and back windows."""
+    tracks = []
+    for fiducials, depth in ((FIDUCIAL_FRONT, 0.0), (FIDUCIAL_BACK, CHAMBER_DEPTH)):
+        for xy in fiducials.values():
+            center = camera.project(xy, depth)
+            for offset in (np.array([arm, 0.0]), np.array([0.0, arm])):
+                tracks.append(_line(center - offset, center + offset, depth, depth))
+    return tracks
+
+
+def render(
+    tracks: list[Track],
+    camera: Camera,
+    view: int,
+    rng: np.random.Generator,
+    width: int = 3,
+) -> np.ndarray:
+    """RGB frame of `view` with the tracks drawn on a noisy background."""
+    size = camera.size
+    image = rng.normal(BACKGROUND, 6, (size, size)).clip(0, 255).astype(np.uint8)
+    points = np.concatenate(
+        [camera.in_view(track.points, track.depths, view) for track in tracks]
+    )
+    pixels = np.rint(points).astype(np.int64)
+    half = width // 2
+    for drow in range(-half, half + 1):
+        for dcolumn in range(-half, half + 1):
+            rows, columns = pixels[:, 0] + drow, pixels[:, 1] + dcolumn
+            inside = (rows >= 0) & (rows < size) & (columns >= 0) & (columns < size)
+            image[rows[inside], columns[inside]] = TRACK
+    return np.repeat(image[..., np.newaxis], 3, axis=-1)
+
+
+def _write_event(args: tuple) -> ParticleDecay:
+    """Process pool worker: write the three views of an event."""
+    folder, event, size, seed, compression, tile = args
+    rng = np.random.default_rng([seed, event])
+    camera = Camera.for_size(size)
+    tracks, particle = make_event(event, camera, rng)
+    tracks += fiducial_tracks(camera)
+
+    import tifffile
+
+    for view, view_name in enumerate(VIEW_NAMES):
+        tifffile.imwrite(
+            os.path.join(folder, view_name, f"frame_{event:05d}.tif"),
+            render(tracks, camera, view, rng),
+            compression=compression,
+            tile=(tile, tile) if tile else None,
+        )
+    return particle
+
+
+def write_dataset(
+    folder: str,
+    events: int = 10,
+    size: int = 2048,
+    seed: int = 0,
+    compression: Optional[str] = None,
+    tile: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> list[ParticleDecay]:
+    """Write a synthetic dataset to `folder`, and its ground truth to
+    ``truth.npz`` in it. Returns the true particles.
+
+    `compression` is a TIFF compression supported by tifffile (e.g. "zlib"),
+    and `tile` the side of the TIFF tiles (a multiple of 16), if any.
+    """
+    for view_name in VIEW_NAMES:
+        os.makedirs(os.path.join(folder, view_name), exist_ok=True)
+    jobs = [(folder, event, size, seed, compression, tile) for event in range(events)]
+    if workers == 1 or events < 2:
+        particles = [_write_event(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            particles = list(executor.map(_write_event, jobs, chunksize=8))
+
+    camera = Camera.for_size(size)
+    header = {
+        "seed": -1,
+        "synthetic": {
+            "events": events,
+            "size": size,
+            "seed": seed,
+            "view_offsets": camera.view_offsets.tolist(),
+            "stereo_shift": camera.stereo_shift,
+        },
+    }
+    write_archive(
+        os.path.join(folder, TRUTH_FILE_NAME),
+        "results",
+        header,
+        particles_to_arrays(particles),
+    )
+    return particles
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="cpt-synthetic-dataset",
+        description="Write a synthetic bubble chamber dataset with its ground truth.",
+    )
+    parser.add_argument("folder", help="output folder")
+    parser.add_argument("-n", "--events", type=int, default=10, help="number of events")
+    parser.add_argument(
+        "--size", type=int, default=2048, help="height and width of the frames (pixels)"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument(
+        "--compression", default=None, help="TIFF compression, e.g. zlib or lzw"
+    )
+    parser.add_argument(
+        "--tile", type=int, default=None, help="side of the TIFF tiles (multiple of 16)"
+    )
+    parser.add_argument(
+        "-j", "--workers", type=int, default=None, help="number of worker processes"
+    )
+    args = parser.parse_args(argv)
+
+    write_dataset(
+        args.folder,
+        events=args.events,
+        size=args.size,
+        seed=args.seed,
+        compression=args.compression,
+        tile=args.tile,
+        workers=args.workers,
+    )
+    print(f"Wrote {args.events} events to {args.folder}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,14 @@ from qtpy.QtWidgets import QApplication, QDialog
 from cavendish_particle_tracks._main_widget import ParticleTracksWidget
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory, monkeypatch):
+    """Keep the per dataset caches of the tests out of the user's cache."""
+    path = tmp_path_factory.mktemp("cache")
+    monkeypatch.setenv("CPT_CACHE_DIR", str(path))
+    return path
+
+
 @pytest.fixture
 def cpt_widget(make_napari_viewer):
     """Common test setup fixture: calls the napari helper fixture
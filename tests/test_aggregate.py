@@ -0,0 +1,119 @@
+import numpy as np
+
+from cavendish_particle_tracks._storage import (
+    load_results,
+    particles_to_arrays,
+    read_archive,
+    save_results,
+    write_archive,
+)
+from cavendish_particle_tracks.aggregate import aggregate, main
+from cavendish_particle_tracks.analysis import ParticleDecay
+
+
+def _particle(name: str, event_number: int, radius_px: float) -> ParticleDecay:
+    particle = ParticleDecay(name=name, event_number=event_number, view_number=0)
+    particle.rpoints = [[0.0, 1.0], [1.0, 0.0], [2.0, 1.0]]
+    particle.radius_px = radius_px
+    return particle
+
+
+def _write_results(tmp_path):
+    first = [_particle("Σ⁺ ⇨ p + π⁰", 3, 10.0), _particle("Λ⁰ ⇨ p + π⁻", 3, 20.0)]
+    second = [_particle("Σ⁺ ⇨ p + π⁰", 3, 11.0), _particle("Σ⁺ ⇨ p + π⁰", 4, 12.0)]
+    files = [str(tmp_path / "a.npz"), str(tmp_path / "b.npz"), str(tmp_path / "c.csv")]
+    save_results(files[0], first, seed=1)
+    save_results(files[1], second, seed=1)
+    with open(files[2], "w", encoding="UTF8", newline="") as f:
+        f.write(",".join(second[0].vars_to_save()) + "\n")
+        f.writelines([particle.to_csv() for particle in second])
+    return files
+
+
+def test_aggregate_deduplicates(tmp_path):
+    files = _write_results(tmp_path)
+    arrays = aggregate(files, seed=2, workers=2)
+
+    # The Σ⁺ of event 3 in b.npz has the same seed as the one in a.npz
+    assert arrays["seed"].tolist() == [1, 1, 1, 2, 2]
+    assert arrays["event_number"].tolist() == [3, 3, 4, 3, 4]
+    assert arrays["radius_px"].tolist() == [10.0, 20.0, 12.0, 11.0, 12.0]
+    assert arrays["source"].tolist() == files[:1] * 2 + files[1:2] + files[2:] * 2
+    assert arrays["rpoints"].shape == (5, 3, 2)
+
+
+def test_aggregate_keeps_particles_without_event(tmp_path):
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, [ParticleDecay(), ParticleDecay()], seed=1)
+    assert len(aggregate([file_name, file_name])["name"]) == 4
+
+
+def test_aggregate_cli(tmp_path, capsys):
+    files = _write_results(tmp_path)
+    output = str(tmp_path / "lab.npz")
+    assert main([*files, str(tmp_path / "missing.csv"), "-o", output, "-j", "1"]) == 0
+    assert "Skipping" in capsys.readouterr().err
+
+    header, arrays = read_archive(output, "results")
+    assert header["files"][:3] == files
+    assert len(arrays["name"]) == 5
+    assert len(load_results(output)) == 5
+
+
+def test_aggregate_cli_no_results(tmp_path):
+    assert main([str(tmp_path / "missing.npz"), "-o", str(tmp_path / "out.npz")]) == 1
+    assert not (tmp_path / "out.npz").exists()
+
+
+def test_aggregate_skips_bad_pickles(tmp_path, capsys):
+    import os
+    import pickle
+
+    good = str(tmp_path / "good.pkl")
+    with open(good, "wb") as f:
+        pickle.dump([_particle("Σ⁺ ⇨ p + π⁰", 3, 10.0)], f)
+    unsafe = tmp_path / "unsafe.pkl"
+    unsafe.write_bytes(pickle.dumps(os.getcwd))
+    truncated = tmp_path / "truncated.pkl"
+    truncated.write_bytes((tmp_path / "good.pkl").read_bytes()[:20])
+
+    arrays = aggregate([good, str(unsafe), str(truncated)], workers=1)
+    assert arrays["source"].tolist() == [good]
+    assert capsys.readouterr().err.count("Skipping") == 2
+
+
+def test_reaggregate_keeps_seeds(tmp_path):
+    first, second = str(tmp_path / "a.npz"), str(tmp_path / "b.npz")
+    save_results(first, [_particle("Σ⁺ ⇨ p + π⁰", 3, 10.0)], seed=1)
+    save_results(second, [_particle("Σ⁺ ⇨ p + π⁰", 3, 11.0)], seed=2)
+    merged = str(tmp_path / "merged.npz")
+    assert main([first, second, "-o", merged, "-j", "1"]) == 0
+
+    arrays = aggregate([merged], workers=1)
+    assert arrays["seed"].tolist() == [1, 2]
+    assert arrays["source"].tolist() == [first, second]
+
+
+def test_aggregate_skips_corrupt_archives(tmp_path, capsys):
+    files = _write_results(tmp_path)
+    truncated = tmp_path / "truncated.npz"
+    truncated.write_bytes((tmp_path / "a.npz").read_bytes()[:100])
+    arrays = aggregate([files[0], str(truncated)], workers=1)
+    assert len(arrays["name"]) == 2
+    assert "BadZipFile" in capsys.readouterr().err
+
+
+def test_aggregate_merges_different_columns(tmp_path, capsys):
+    old = particles_to_arrays([_particle("Σ⁺ ⇨ p + π⁰", 3, 10.0)])
+    del old["phi_pion"]
+    new = particles_to_arrays([_particle("Σ⁺ ⇨ p + π⁰", 4, 11.0)])
+    new["comment"] = np.array(["faint"])
+    files = [str(tmp_path / "old.npz"), str(tmp_path / "new.npz")]
+    write_archive(files[0], "results", {"seed": 1}, old)
+    write_archive(files[1], "results", {"seed": 1}, new)
+
+    arrays = aggregate(files, workers=1)
+    assert arrays["event_number"].tolist() == [3, 4]
+    assert arrays["phi_pion"].tolist() == [-100.0, -100.0]
+    assert "comment" not in arrays
+    assert "Ignoring comment" in capsys.readouterr().err
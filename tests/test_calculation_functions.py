@@ -9,8 +9,11 @@ from cavendish_particle_tracks._calculate import FIDUCIAL_FRONT as FF
 from cavendish_particle_tracks._calculate import (
     angle,
     depth,
+    depths,
     length,
+    lengths,
     magnification,
+    radii,
     radius,
     stereoshift,
 )
@@ -29,6 +32,24 @@ def test_calculate_radius(a, b, c, R):
     assert radius(a, b, c) == pytest.approx(R, rel=1e-3)
 
 
+def test_radii_match_radius():
+    points = np.array([[(0, 1), (1, 0), (0, -1)], [(-6, 3), (-3, 2), (0, 3)]])
+    collinear = np.array([[(0, 0), (1, 1), (2, 2)]])
+    np.testing.assert_allclose(
+        radii(np.concatenate([points, collinear]))[:2], [radius(*p) for p in points]
+    )
+    assert np.isnan(radii(collinear)).all()
+
+
+def test_lengths_and_depths():
+    np.testing.assert_allclose(
+        lengths([[(0, 1), (1, 0)], [(1, 1), (3, 4)]]), [sqrt(2), sqrt(13)]
+    )
+    np.testing.assert_allclose(
+        depths([0.25, 0.25], [False, True]), [0.25 * CD, 0.75 * CD]
+    )
+
+
 @pytest.mark.parametrize(
     "a, b, L",
     [
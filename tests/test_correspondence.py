@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._correspondence import (
+    match_point,
+    phase_correlation,
+    read_patch,
+)
+
+
+def _smooth_noise(shape, seed=0) -> np.ndarray:
+    """Random image with features of a few pixels."""
+    noise = np.random.default_rng(seed).random(shape)
+    ky = np.fft.fftfreq(shape[0])[:, None]
+    kx = np.fft.fftfreq(shape[1])[None, :]
+    return np.real(np.fft.ifft2(np.fft.fft2(noise) * np.exp(-200 * (ky**2 + kx**2))))
+
+
+def _shifted(image, shift) -> np.ndarray:
+    """`image` displaced by the (sub-pixel) `shift`, with periodic boundaries."""
+    ky = np.fft.fftfreq(image.shape[0])[:, None]
+    kx = np.fft.fftfreq(image.shape[1])[None, :]
+    phase = np.exp(-2j * np.pi * (ky * shift[0] + kx * shift[1]))
+    return np.real(np.fft.ifft2(np.fft.fft2(image) * phase))
+
+
+@pytest.mark.parametrize("shift", [(0.0, 0.0), (0.4, -0.3), (1.3, 0.7), (3.0, -7.0)])
+def test_phase_correlation(shift):
+    image = _smooth_noise((128, 128))
+    found, confidence = phase_correlation(image, _shifted(image, shift))
+    np.testing.assert_allclose(found, shift, atol=0.15)
+    assert confidence > 0.3
+
+
+def test_read_patch_pads_outside_the_image():
+    stack = np.arange(2 * 3 * 10 * 10 * 3).reshape(2, 3, 10, 10, 3)
+    patch = read_patch(stack, 1, 2, (0, 5), size=4)
+    assert patch.shape == (4, 4)
+    np.testing.assert_array_equal(patch[0], patch[2])
+    np.testing.assert_array_equal(patch[2], stack[1, 2, 0, 3:7].mean(axis=-1))
+
+
+def test_match_point_between_views():
+    image = _smooth_noise((512, 512))
+    stack = np.stack([image, _shifted(image, (40.3, -62.6))])[:, np.newaxis]
+    match = match_point(stack, 0, (250.5, 300.2), 0, 1, guess=(285, 240))
+    np.testing.assert_allclose(match.position, (290.8, 237.6), atol=0.15)
+    assert match.confidence > 0.3
+
+
+def test_stereoshift_match_view2_points(cpt_widget):
+    image = _smooth_noise((512, 512))
+    stack = np.stack([image, _shifted(image, (10, 20)), image])[:, np.newaxis]
+    cpt_widget.viewer.add_image(stack, name="Bubble Chamber Data")
+    cpt_widget.viewer.dims.current_step = (0, 0, 0, 0)
+    dialog = cpt_widget._on_click_stereoshift()
+
+    dialog.cal_layer.data = np.array(
+        [[100, 100], [110, 120], [200, 150], [0, 0], [300, 260], [0, 0]], float
+    )
+    dialog._on_click_match()
+    np.testing.assert_allclose(dialog.cal_layer.data[3], [210, 170], atol=0.15)
+    np.testing.assert_allclose(dialog.cal_layer.data[5], [310, 280], atol=0.15)
+    # The whole view is shifted, so there is no stereoshift relative to the reference
+    assert dialog.stereoshift_info.shift_fiducial == pytest.approx(0, abs=0.15)
+    assert dialog.stereoshift_info.shift_point == pytest.approx(0, abs=0.15)
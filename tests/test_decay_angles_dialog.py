@@ -74,6 +74,27 @@ def test_decay_vertex_update(cpt_widget):
     assert dialog.cal_layer.data[0][0][0] == old_value + 50
 
 
+def test_decay_vertex_update_is_batched(cpt_widget):
+    """The other two lines are moved with a single update of the layer data."""
+    cpt_widget.particle_decays_menu.setCurrentIndex(4)
+    dialog = cpt_widget._on_click_decay_angles()
+    events = []
+    dialog.cal_layer.events.data.connect(
+        lambda event: events.append(event.action) if event.action == "changed" else None
+    )
+
+    dialog.cal_layer.data[2][0] += 30
+    dialog.cal_layer.events.data(action="changed", data_indices=(2,))
+    # The event fired by hand, and a single one for the two other lines
+    assert len(events) == 2
+    for line in dialog.cal_layer.data[:2]:
+        np.testing.assert_array_equal(line[0], dialog.cal_layer.data[2][0])
+
+    # Nothing to move, nothing to update
+    dialog.cal_layer.events.data(action="changed", data_indices=(0,))
+    assert len(events) == 3
+
+
 @pytest.mark.parametrize(
     "Lambda_track, p_track, pi_track, phi_proton, phi_pion",
     [
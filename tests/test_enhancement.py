@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._enhancement import enhance_frame, enhanced
+from cavendish_particle_tracks._main_widget import IMAGE_LAYER_NAME
+from cavendish_particle_tracks.synthetic import write_dataset
+
+
+def _faint_track(shape=(384, 768)) -> tuple[np.ndarray, np.ndarray]:
+    """A faint track on a film with a strong gradient, and the mask of the track."""
+    rows, cols = np.indices(shape)
+    background = 40 + 150 * cols / shape[1]
+    track = np.abs(rows - 0.4 * cols - 40) < 1.5
+    noise = np.random.default_rng(0).normal(0, 2, shape)
+    frame = np.clip(background + 12 * track + noise, 0, 255).astype(np.uint8)
+    return np.repeat(frame[..., np.newaxis], 3, axis=-1), track
+
+
+def test_enhancement_removes_background():
+    frame, track = _faint_track()
+    result = enhance_frame(frame)
+    assert result.shape == frame.shape and result.dtype == frame.dtype
+    assert (result[..., 0] == result[..., 2]).all()
+    gray = result[..., 0].astype(float)
+    # The background is flat (away from the edges), and the track stands out of it
+    cols = np.indices(track.shape)[1]
+    left = ~track & (cols >= 160) & (cols < 240)
+    right = ~track & (cols >= 528) & (cols < 608)
+    assert abs(gray[left].mean() - gray[right].mean()) < 10
+    contrast = (gray[track].mean() - gray[~track].mean()) / gray[~track].std()
+    raw = frame[..., 0].astype(float)
+    raw_contrast = (raw[track].mean() - raw[~track].mean()) / raw[~track].std()
+    assert contrast > 2 > raw_contrast
+
+
+@pytest.mark.parametrize("rgb", [True, False])
+def test_enhanced_stack_is_lazy(rgb):
+    import dask.array as da
+
+    frame, _ = _faint_track()
+    frame = frame if rgb else frame[..., 0]
+    stack = da.from_array(np.stack([[frame, frame]] * 3), chunks=(1, 1, *frame.shape))
+    result = enhanced(stack, rgb=rgb)
+    assert result.chunks == stack.chunks and result.dtype == stack.dtype
+    np.testing.assert_array_equal(result[2, 1].compute(), enhance_frame(frame))
+
+
+def test_widget_toggles_enhancement(cpt_widget, tmp_path):
+    write_dataset(str(tmp_path / "data"), events=2, size=256, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    layer = cpt_widget.viewer.layers[IMAGE_LAYER_NAME]
+    raw = layer.data
+    frame = np.asarray(raw[1, 0])
+
+    cpt_widget.enhance_button.setChecked(True)
+    assert layer.data is not raw and layer.data.shape == raw.shape
+    np.testing.assert_array_equal(np.asarray(layer.data[1, 0]), enhance_frame(frame))
+    assert tuple(layer.contrast_limits) == (0.0, 255.0)
+    # The measurements read the original images
+    assert cpt_widget.image_stack is raw
+
+    cpt_widget.enhance_button.setChecked(False)
+    assert layer.data is raw
@@ -0,0 +1,131 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+import tifffile as tf
+
+from cavendish_particle_tracks import _frame_cache
+from cavendish_particle_tracks._frame_cache import (
+    SharedFrameCache,
+    block_name,
+    imread_shared,
+)
+from cavendish_particle_tracks._main_widget import IMAGE_LAYER_NAME
+from cavendish_particle_tracks.synthetic import write_dataset
+
+MB = 2**20
+
+
+def _exists(name: str) -> bool:
+    try:
+        block = shared_memory.SharedMemory(name)
+    except FileNotFoundError:
+        return False
+    from multiprocessing import resource_tracker
+
+    resource_tracker.unregister(block._name, "shared_memory")
+    block.close()
+    return True
+
+
+@pytest.fixture
+def frames(tmp_path):
+    file_names = []
+    for i in range(3):
+        file_name = str(tmp_path / f"frame_{i}.tif")
+        tf.imwrite(file_name, np.full((32, 48, 3), i, dtype=np.uint8))
+        file_names.append(file_name)
+    return file_names
+
+
+@pytest.fixture
+def lock_file(tmp_path):
+    return str(tmp_path / "frames.lock")
+
+
+def test_second_session_does_not_decode(frames, lock_file):
+    first = SharedFrameCache(MB, lock_file)
+    second = SharedFrameCache(MB, lock_file)
+    frame = first.read(frames[1])
+    assert (first.decoded, first.shared) == (1, 0)
+    np.testing.assert_array_equal(second.read(frames[1]), frame)
+    assert (second.decoded, second.shared) == (0, 1)
+
+    # The block is removed with its last reference
+    name = block_name(frames[1])
+    first.close()
+    assert _exists(name)
+    second.close()
+    assert not _exists(name)
+
+
+def test_modified_file_is_decoded_again(frames, lock_file):
+    cache = SharedFrameCache(MB, lock_file)
+    name = block_name(frames[0])
+    cache.read(frames[0])
+    tf.imwrite(frames[0], np.full((32, 48, 3), 7, dtype=np.uint8))
+    os.utime(frames[0], ns=(0, 10**9))
+    assert block_name(frames[0]) != name
+    assert cache.read(frames[0])[0, 0, 0] == 7
+    assert cache.decoded == 2
+    cache.close()
+
+
+def test_least_recently_used_blocks_are_released(frames, lock_file):
+    frame_bytes = 32 * 48 * 3
+    cache = SharedFrameCache(2 * frame_bytes + 200, lock_file)
+    for file_name in frames:
+        cache.read(file_name)
+    assert len(cache) == 2
+    assert not _exists(block_name(frames[0]))
+    assert _exists(block_name(frames[2]))
+    cache.close()
+    assert not _exists(block_name(frames[2]))
+
+
+def _read_in_session(args):
+    file_name, lock_file = args
+    cache = SharedFrameCache(MB, lock_file)
+    cache.read(file_name)
+    counts = cache.decoded, cache.shared
+    cache.close()
+    return counts
+
+
+def test_frames_are_shared_between_processes(frames, lock_file):
+    cache = SharedFrameCache(MB, lock_file)
+    cache.read(frames[2])
+    with ProcessPoolExecutor(1) as pool:
+        assert pool.submit(_read_in_session, (frames[2], lock_file)).result() == (0, 1)
+    # The other session released its reference but not the block
+    assert _exists(block_name(frames[2]))
+    cache.close()
+
+
+def test_imread_shared_matches_dask_image(tmp_path, lock_file):
+    from dask_image.imread import imread
+
+    write_dataset(str(tmp_path / "data"), events=3, size=128, workers=1)
+    pattern = str(tmp_path / "data" / "view2" / "*")
+    cache = SharedFrameCache(MB, lock_file)
+    stack = imread_shared(pattern, cache)
+    expected = imread(pattern)
+    assert stack.shape == expected.shape and stack.chunksize == expected.chunksize
+    np.testing.assert_array_equal(stack.compute(), expected.compute())
+    assert cache.decoded == 3
+    cache.close()
+
+
+def test_widget_loads_through_shared_cache(cpt_widget, tmp_path, monkeypatch):
+    monkeypatch.setenv("CPT_SHARED_FRAME_CACHE_MB", "16")
+    monkeypatch.setattr(_frame_cache, "_cache", None)
+    write_dataset(str(tmp_path / "data"), events=2, size=128, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    cache = _frame_cache._cache
+    assert cache is not None
+    cpt_widget.viewer.layers[IMAGE_LAYER_NAME].data.compute()
+    # Each of the 2 x 3 images is decoded once
+    assert cache.decoded == 6
+    cache.close()
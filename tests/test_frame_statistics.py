@@ -0,0 +1,157 @@
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._frame_statistics import (
+    CONTRAST_PERCENTILES,
+    FrameStatistics,
+    contrast_limits,
+    default_contrast_limits,
+    frame_statistics,
+    percentiles,
+    quantise_frame,
+    quantised,
+)
+from cavendish_particle_tracks._main_widget import IMAGE_LAYER_NAME, ParticleTracksWidget
+from cavendish_particle_tracks.synthetic import write_dataset
+
+
+def test_default_contrast_limits():
+    assert default_contrast_limits(np.uint8) == (0.0, 255.0)
+    assert default_contrast_limits(np.uint16) == (0.0, 65535.0)
+    assert default_contrast_limits(np.float32) == (0.0, 1.0)
+
+
+def test_frame_statistics():
+    frame = np.arange(100 * 100 * 3).reshape(100, 100, 3) % 200
+    statistics = frame_statistics(frame, level=0)
+    assert statistics[:2].tolist() == [0.0, 199.0]
+    assert statistics[2:].sum() == frame.size
+    np.testing.assert_allclose(
+        percentiles(statistics, [0, 50, 100]), np.percentile(frame, [0, 50, 100]), atol=1
+    )
+
+
+def test_uniform_frame():
+    statistics = frame_statistics(np.full((16, 16), 7, dtype=np.uint8))
+    cache = FrameStatistics()
+    cache.set(0, 0, statistics)
+    assert cache.contrast_limits(0, 0) == (7.0, 8.0)
+
+
+def test_frame_statistics_cache(tmp_path):
+    file_name = str(tmp_path / "statistics.npz")
+    cache = FrameStatistics(file_name)
+    rng = np.random.default_rng(0)
+    frames = rng.normal(100, 10, (3, 256, 256))
+    for view, frame in enumerate(frames):
+        cache.set(4, view, frame_statistics(frame))
+    cache.set(5, 0, frame_statistics(rng.normal(50, 10, (64, 64))))
+    cache.save()
+
+    cached = FrameStatistics(file_name)
+    assert 4 in cached and 5 not in cached
+    # Percentiles of the downsampled frame
+    np.testing.assert_allclose(
+        cached.contrast_limits(4, 1),
+        np.percentile(frames[1, ::4, ::4], CONTRAST_PERCENTILES),
+        atol=0.5,
+    )
+    assert cached.contrast_limits(4, 1) == cache.contrast_limits(4, 1)
+    assert cached.contrast_limits(6, 0) is None
+
+
+def test_corrupt_frame_statistics_cache_warns(tmp_path):
+    file_name = tmp_path / "statistics.npz"
+    file_name.write_bytes(b"not an archive")
+    with pytest.warns(UserWarning, match="Ignoring the cached frame statistics"):
+        assert FrameStatistics(str(file_name)).contrast_limits(0, 0) is None
+
+
+def test_widget_sets_contrast_limits_per_event(
+    make_napari_viewer, qtbot, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CPT_FRAME_STATISTICS", "1")
+    write_dataset(str(tmp_path / "data"), events=3, size=256, workers=1)
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    assert widget._load_data(str(tmp_path / "data"))
+    layer = widget.viewer.layers[IMAGE_LAYER_NAME]
+    # Without statistics, napari estimated the contrast limits
+    assert widget._initial_contrast_limits(layer.dtype) is None
+    with qtbot.waitSignal(widget._frame_statistics_worker.finished, timeout=30000):
+        pass
+
+    for view, event in [(0, 0), (2, 1), (1, 2)]:
+        widget.viewer.dims.set_current_step(0, view)
+        widget.viewer.dims.set_current_step(1, event)
+        image = widget._image_index(event)
+        assert tuple(layer.contrast_limits) == widget.frame_statistics.contrast_limits(
+            image, view
+        )
+        # The limits exclude the darkest and brightest pixels
+        frame = np.asarray(layer.data[view, event])
+        assert frame.min() <= layer.contrast_limits[0] < layer.contrast_limits[1]
+        assert layer.contrast_limits[1] <= frame.max()
+
+    # A new session on the same dataset uses the cached statistics
+    monkeypatch.setenv("CPT_FRAME_STATISTICS", "0")
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    added = []
+    restored.viewer.layers.events.inserted.connect(
+        lambda event: added.append(tuple(getattr(event.value, "contrast_limits", ())))
+    )
+    assert restored._load_data(str(tmp_path / "data"))
+    # The image layer is added with the limits of the first event
+    first = int(restored.shuffling_indices[0])
+    limits = [restored.frame_statistics.contrast_limits(first, view) for view in range(3)]
+    assert added[0] == (min(low for low, _ in limits), max(high for _, high in limits))
+    assert restored._frame_statistics_worker is None
+    assert tuple(
+        restored.viewer.layers[IMAGE_LAYER_NAME].contrast_limits
+    ) == restored.frame_statistics.contrast_limits(*restored._shown_image()[::-1])
+
+
+def test_quantise_frame():
+    rng = np.random.default_rng(1)
+    frame = rng.normal(20000, 3000, (256, 256)).astype(np.uint16)
+    frame = np.repeat(frame[..., np.newaxis], 3, axis=-1)
+    result = quantise_frame(frame)
+    assert result.shape == (256, 256) and result.dtype == np.uint8
+    # Scaled between the contrast limits of the frame
+    low, high = contrast_limits(frame_statistics(frame))
+    assert np.mean(result == 0) == pytest.approx(np.mean(frame[..., 0] <= low), abs=2e-3)
+    assert np.mean(result == 255) == pytest.approx(
+        np.mean(frame[..., 0] >= high), abs=2e-3
+    )
+    assert 100 < result.mean() < 155
+
+
+def test_quantised_stack():
+    import dask.array as da
+
+    frames = np.random.default_rng(2).integers(0, 255, (3, 2, 64, 80, 3), np.uint8)
+    stack = da.from_array(frames, chunks=(1, 1, 64, 80, 3))
+    result = quantised(stack, rgb=True)
+    assert result.shape == (3, 2, 64, 80) and result.dtype == np.uint8
+    assert result.chunksize == (1, 1, 64, 80)
+    assert result.nbytes == stack.nbytes // 3
+    np.testing.assert_array_equal(result[1, 1].compute(), quantise_frame(frames[1, 1]))
+
+
+def test_widget_shows_quantised_images(cpt_widget, tmp_path, monkeypatch):
+    monkeypatch.setenv("CPT_DISPLAY_8BIT", "1")
+    write_dataset(str(tmp_path / "data"), events=2, size=256, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    layer = cpt_widget.viewer.layers[IMAGE_LAYER_NAME]
+    assert not layer.rgb and layer.data.ndim == 4 and layer.dtype == np.uint8
+    assert tuple(layer.contrast_limits) == (0.0, 255.0)
+    # The measurements read the decoded (colour) frames
+    assert cpt_widget.image_stack.ndim == 5
+    np.testing.assert_array_equal(
+        np.asarray(layer.data[2, 1]),
+        quantise_frame(np.asarray(cpt_widget.image_stack[2, 1])),
+    )
+
+    cpt_widget.enhance_button.setChecked(True)
+    assert layer.data.ndim == 4 and layer.dtype == np.uint8
+    cpt_widget.enhance_button.setChecked(False)
+    assert tuple(layer.contrast_limits) == (0.0, 255.0)
@@ -0,0 +1,134 @@
+import os
+import pickle
+
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._main_widget import MEASUREMENTS_LAYER_NAME
+from cavendish_particle_tracks._storage import (
+    load_results,
+    read_csv,
+    save_results,
+    write_archive,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay, StereoshiftInfo
+
+
+def _make_particles() -> list[ParticleDecay]:
+    sigma = ParticleDecay(name="Σ⁻ ⇨ n + π⁻", index=3, event_number=2, view_number=1)
+    sigma.rpoints = [[-6.0, 3.0], [-3.0, 2.0], [0.0, 3.0]]
+    sigma.radius_px = 5.0
+    sigma.decay_vertex_stereoshift_info = StereoshiftInfo(
+        name="decay_vertex", shift_fiducial=2.5, stereoshift=1e-05, depth_cm=-3.25
+    )
+    sigma.decay_vertex_stereoshift_info.spoints = [[1, -2], [3, 4], [5, 6], [7, -8]]
+    lambda0 = ParticleDecay(name="Λ⁰ ⇨ p + π⁻", index=4, event_number=0, view_number=0)
+    lambda0.dpoints = [[1.5, 1.0], [2.0, 2.5]]
+    lambda0.decay_length_px = np.sqrt(0.5)
+    lambda0.phi_proton = np.arctan2(1.0, 2.0)
+    lambda0.phi_pion = -0.25
+    return [sigma, lambda0, ParticleDecay(name="Σ⁺ ⇨ p + π⁰", index=1)]
+
+
+def test_read_test_output_file():
+    arrays = read_csv("tests/data/test_output_file.csv")
+    assert arrays["name"].tolist() == ["Λ⁰ ⇨ p + π⁻"]
+    assert arrays["index"].tolist() == [4]
+    assert arrays["rpoints"].shape == (1, 3, 2)
+    assert load_results("tests/data/test_output_file.csv") == [
+        ParticleDecay(name="Λ⁰ ⇨ p + π⁻", index=4)
+    ]
+
+
+@pytest.mark.parametrize("file_name", ["results.npz", "results.csv", "results.pkl"])
+def test_load_results_round_trip(tmp_path, file_name):
+    particles = _make_particles()
+    file_path = str(tmp_path / file_name)
+    if file_name.endswith(".npz"):
+        save_results(file_path, particles)
+    elif file_name.endswith(".csv"):
+        with open(file_path, "w", encoding="UTF8", newline="") as f:
+            f.write(",".join(particles[0].vars_to_save()) + "\n")
+            f.writelines([particle.to_csv() for particle in particles])
+    else:
+        with open(file_path, "wb") as handle:
+            pickle.dump(particles, handle, protocol=pickle.HIGHEST_PROTOCOL)
+
+    assert load_results(file_path) == particles
+
+
+def test_load_results_refuses_arbitrary_pickle(tmp_path):
+    file_path = str(tmp_path / "evil.pkl")
+    with open(file_path, "wb") as handle:
+        pickle.dump(os.getcwd, handle)
+    with pytest.raises(pickle.UnpicklingError):
+        load_results(file_path)
+
+
+def test_load_results_unsupported_file():
+    with pytest.raises(ValueError, match="Unsupported results file"):
+        load_results("results.pdf")
+
+
+def test_import_results_ui(cpt_widget, tmp_path):
+    """Imported particles are appended to the table and their points re-created."""
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    particles = _make_particles()
+    file_path = str(tmp_path / "results.pkl")
+    with open(file_path, "wb") as handle:
+        pickle.dump(particles, handle)
+
+    cpt_widget._import_results(file_path)
+
+    assert len(cpt_widget.data) == 4
+    assert cpt_widget.data[1:] == particles
+    assert cpt_widget.table.model().rowCount() == 4
+    assert (
+        cpt_widget.table.model()
+        .index(1, cpt_widget._get_table_column_index("radius_px"))
+        .data()
+    )
+    assert (
+        not cpt_widget.table.model()
+        .index(2, cpt_widget._get_table_column_index("radius_px"))
+        .data()
+    )
+    assert (
+        cpt_widget.table.model()
+        .index(2, cpt_widget._get_table_column_index("phi_proton"))
+        .data()
+    )
+
+    # three radius points in (view 1, event 2), two length points in (view 0, event 0)
+    points = cpt_widget.viewer.layers[MEASUREMENTS_LAYER_NAME].data
+    np.testing.assert_array_equal(
+        points,
+        [
+            [1, 2, -6, 3],
+            [1, 2, -3, 2],
+            [1, 2, 0, 3],
+            [0, 0, 1.5, 1],
+            [0, 0, 2, 2.5],
+        ],
+    )
+
+
+def test_import_results_bad_file(cpt_widget, tmp_path, capsys):
+    cpt_widget._import_results(str(tmp_path / "missing.csv"))
+    assert "Could not import" in capsys.readouterr().out
+    assert cpt_widget.data == []
+
+
+def test_import_results_corrupt_archive(cpt_widget, tmp_path, capsys):
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, [ParticleDecay(name="Λ⁰ ⇨ p + π⁻")])
+    truncated = tmp_path / "truncated.npz"
+    truncated.write_bytes((tmp_path / "results.npz").read_bytes()[:100])
+    cpt_widget._import_results(str(truncated))
+    assert "Could not import" in capsys.readouterr().out
+
+    # An archive without the particle names
+    write_archive(str(truncated), "results", {}, {"event_number": np.arange(2)})
+    cpt_widget._import_results(str(truncated))
+    assert "Could not import" in capsys.readouterr().out
+    assert cpt_widget.data == []
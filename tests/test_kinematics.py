@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._storage import particles_to_arrays
+from cavendish_particle_tracks.analysis import ParticleDecay
+from cavendish_particle_tracks.kinematics import (
+    MASSES,
+    kinematics,
+    momentum_from_radius,
+    two_body_momenta,
+)
+
+
+def _lambda_decay_angles(momentum: float, theta_cm: float) -> tuple[float, float]:
+    """Lab angles of the proton and pion of a Λ⁰ decay at rest frame angle theta_cm."""
+    mass, mass_p, mass_pi = MASSES["Λ⁰"], MASSES["p"], MASSES["π⁻"]
+    p_cm = np.sqrt(
+        (mass**2 - (mass_p + mass_pi) ** 2) * (mass**2 - (mass_p - mass_pi) ** 2)
+    )
+    p_cm /= 2 * mass
+    gamma, gamma_beta = np.sqrt(momentum**2 + mass**2) / mass, momentum / mass
+    energy_p, energy_pi = np.hypot(p_cm, mass_p), np.hypot(p_cm, mass_pi)
+    p_transverse = p_cm * np.sin(theta_cm)
+    phi_proton = np.arctan2(
+        p_transverse, gamma * p_cm * np.cos(theta_cm) + gamma_beta * energy_p
+    )
+    phi_pion = -np.arctan2(
+        p_transverse, -gamma * p_cm * np.cos(theta_cm) + gamma_beta * energy_pi
+    )
+    return phi_proton, phi_pion
+
+
+def test_momentum_from_radius():
+    # 1 GeV/c particle in a 1 T field curves with a radius of 3.34 m
+    assert momentum_from_radius(333.564, field=1.0) == pytest.approx(1000.0, rel=1e-5)
+
+
+@pytest.mark.parametrize("momentum", [200.0, 1000.0, 5000.0])
+def test_two_body_momenta(momentum):
+    angles = np.array([_lambda_decay_angles(momentum, t) for t in [0.3, 1.2, 2.5]])
+    p, p_proton, p_pion = two_body_momenta(
+        MASSES["Λ⁰"], MASSES["p"], MASSES["π⁻"], angles[:, 0], angles[:, 1]
+    )
+    assert p == pytest.approx(momentum)
+    # The momentum of the products conserves the energy of the parent
+    energy = np.hypot(p_proton, MASSES["p"]) + np.hypot(p_pion, MASSES["π⁻"])
+    assert energy == pytest.approx(np.hypot(momentum, MASSES["Λ⁰"]))
+
+
+def test_kinematics():
+    sigma = ParticleDecay(name="Σ⁺ ⇨ p + π⁰", magnification_a=1.0)
+    sigma.radius_px = sigma.radius_cm = 100.0
+    sigma.decay_length_px = sigma.decay_length_cm = 2.0
+    lambda0 = ParticleDecay(name="Λ⁰ ⇨ p + π⁻")
+    lambda0.phi_proton, lambda0.phi_pion = _lambda_decay_angles(1000.0, 1.2)
+    uncalibrated = ParticleDecay(name="Σ⁻ ⇨ n + π⁻", radius_px=100.0)
+
+    values = kinematics(particles_to_arrays([sigma, lambda0, uncalibrated]), field=1.0)
+
+    p_sigma = momentum_from_radius(100.0, field=1.0)
+    assert values["momentum_MeV"][:2] == pytest.approx([p_sigma, 1000.0])
+    assert np.isnan(values["momentum_MeV"][2])
+    assert np.isnan(values["momentum_product1_MeV"][0])
+    assert values["momentum_product1_MeV"][1] > values["momentum_product2_MeV"][1]
+    # τ = L m / (p c)
+    tau = 2.0 * MASSES["Σ⁺"] / (p_sigma * 29.9792458)
+    assert values["proper_time_ns"][0] == pytest.approx(tau)
+    assert np.isnan(values["proper_time_ns"][1:]).all()
+
+
+def test_kinematics_columns_ui(cpt_widget):
+    """The kinematics columns are filled in once they are shown, and updated when
+    the magnification is applied."""
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    cpt_widget.data[0].radius_px = 50.0
+    cpt_widget.table_model.update_rows(0)
+    column = cpt_widget._get_table_column_index("momentum_MeV")
+    assert cpt_widget.table.isColumnHidden(column)
+
+    cpt_widget.show_kinematics_button.setChecked(True)
+    assert not cpt_widget.table.isColumnHidden(column)
+    # Not calibrated yet
+    assert cpt_widget.table.model().index(0, column).data() is None
+
+    cpt_widget._propagate_magnification(0.02, 0.0)
+    cpt_widget._apply_magnification()
+    expected = momentum_from_radius(1.0)
+    assert float(cpt_widget.table.model().index(0, column).data()) == pytest.approx(
+        expected
+    )
+
+    cpt_widget.show_kinematics_button.setChecked(False)
+    assert cpt_widget.table.isColumnHidden(column)
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+import tifffile as tf
+
+from cavendish_particle_tracks._magnification_cache import MagnificationCache
+from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+
+
+def test_magnification_cache_round_trip(tmp_path):
+    file_name = str(tmp_path / "cache" / "magnification.npz")
+    cache = MagnificationCache(file_name)
+    assert cache.get(3) is None
+    cache.set(3, 0.02, 0.001)
+    cache.save()
+
+    cached = MagnificationCache(file_name)
+    assert len(cached) == 1
+    assert cached.get(3) == (0.02, 0.001)
+
+
+def test_corrupt_magnification_cache_warns(tmp_path):
+    file_name = tmp_path / "magnification.npz"
+    file_name.write_bytes(b"not an archive")
+    with pytest.warns(UserWarning, match="Ignoring the cached magnifications"):
+        assert len(MagnificationCache(str(file_name))) == 0
+
+
+def _new_particle_at(widget: ParticleTracksWidget, event: int):
+    widget.viewer.dims.set_current_step(1, event)
+    widget.particle_decays_menu.setCurrentIndex(1)
+    return widget.data[-1]
+
+
+def test_magnification_per_event(make_napari_viewer, tmp_path, cache_dir):
+    for view in ["view1", "view2", "view3"]:
+        (tmp_path / "data" / view).mkdir(parents=True)
+        for i in range(4):
+            tf.imwrite(
+                tmp_path / "data" / view / f"{i}.tif", np.full((4, 4, 3), i, "uint8")
+            )
+
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    assert widget._load_data(str(tmp_path / "data"))
+    early = _new_particle_at(widget, 0)
+    widget.viewer.dims.set_current_step(1, 2)
+    widget._propagate_magnification(0.02, 0.001)
+    widget.viewer.dims.set_current_step(1, 3)
+    widget._propagate_magnification(0.03, 0.002)
+
+    # Particles of a calibrated event use its magnification, others the last one
+    assert (early.magnification_a, early.magnification_b) == (0.03, 0.002)
+    particle = _new_particle_at(widget, 2)
+    assert (particle.magnification_a, particle.magnification_b) == (0.02, 0.001)
+    assert _new_particle_at(widget, 1).magnification_a == 0.03
+
+    # The cache is written later, off the measurements
+    assert widget._magnifications_timer.isActive()
+    assert not list(cache_dir.glob("*_magnification.npz"))
+    widget._magnifications_timer.timeout.emit()
+    assert len(list(cache_dir.glob("*_magnification.npz"))) == 1
+
+    # A later session on the same dataset (shuffled differently) reuses them
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    restored.shuffling_seed = 7
+    assert restored._load_data(str(tmp_path / "data"))
+    assert restored.apply_magnification_button.isEnabled()
+    event = int(
+        np.flatnonzero(restored.shuffling_indices == widget.shuffling_indices[2])[0]
+    )
+    particle = _new_particle_at(restored, event)
+    assert (particle.magnification_a, particle.magnification_b) == pytest.approx(
+        (0.02, 0.001)
+    )
+    # Events not calibrated before use the last calibration of the dataset
+    assert (restored.mag_a, restored.mag_b) == pytest.approx((0.03, 0.002))
+    uncalibrated = int(
+        np.flatnonzero(restored.shuffling_indices == widget.shuffling_indices[1])[0]
+    )
+    particle = _new_particle_at(restored, uncalibrated)
+    assert (particle.magnification_a, particle.magnification_b) == pytest.approx(
+        (0.03, 0.002)
+    )
+
+
+def test_latest_magnification_survives_reload(tmp_path):
+    file_name = str(tmp_path / "magnification.npz")
+    cache = MagnificationCache(file_name)
+    assert cache.latest() is None
+    cache.set(5, 0.01, 0.0)
+    cache.set(2, 0.02, 0.0)
+    cache.set(5, 0.03, 0.0)
+    cache.save()
+    assert MagnificationCache(file_name).latest() == (0.03, 0.0)
@@ -48,9 +48,21 @@ def test_calculate_radius_ui(
     for expected in expected_lines:
         assert expected in captured.out
 
-    assert cpt_widget.table.item(0, cpt_widget._get_table_column_index("radius_px"))
-    assert cpt_widget.table.item(0, cpt_widget._get_table_column_index("radius_cm"))
-    assert cpt_widget.table.item(0, cpt_widget._get_table_column_index("rpoints"))
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("radius_px"))
+        .data()
+    )
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("radius_cm"))
+        .data()
+    )
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("rpoints"))
+        .data()
+    )
 
     assert cpt_widget.data[0].radius_px == pytest.approx(rad, rel=1e-3)
 
@@ -136,8 +148,10 @@ def test_calculate_radius_fails_data_out_of_sync(
         rad, rel=1e-3
     ), "The radius should not be calculated"
 
-    assert not cpt_widget.table.item(
-        0, cpt_widget._get_table_column_index("rpoints")
+    assert (
+        not cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("rpoints"))
+        .data()
     ), "The radius points should not be recorded"
 
     # change the data view so that it's in sync
@@ -148,11 +162,15 @@ def test_calculate_radius_fails_data_out_of_sync(
         rad, rel=1e-3
     ), "The radius should have been calculated"
 
-    assert cpt_widget.table.item(
-        0, cpt_widget._get_table_column_index("radius_px")
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("radius_px"))
+        .data()
     ), "The radius should have been recorded"
-    assert cpt_widget.table.item(
-        0, cpt_widget._get_table_column_index("rpoints")
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("rpoints"))
+        .data()
     ), "The radius points should have been recorded"
 
 
@@ -211,7 +229,11 @@ def test_calculate_length_ui(
     # click the calculate decay length button
     cpt_widget._on_click_length()
 
-    assert cpt_widget.table.item(0, cpt_widget._get_table_column_index("decay_length_px"))
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("decay_length_px"))
+        .data()
+    )
     assert cpt_widget.data[0].decay_length_px == pytest.approx(1, rel=1e-3)
 
 
@@ -279,8 +301,10 @@ def test_calculate_length_fails_data_out_of_sync(
         in captured.out
     )
 
-    assert not cpt_widget.table.item(
-        0, cpt_widget._get_table_column_index("decay_length_px")
+    assert (
+        not cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("decay_length_px"))
+        .data()
     ), "The decay length should not be recorded"
     assert cpt_widget.data[0].decay_length_px != pytest.approx(
         1, rel=1e-3
@@ -290,8 +314,10 @@ def test_calculate_length_fails_data_out_of_sync(
     cpt_widget.viewer.dims.set_current_step(0, 0)  # move to view 0
     cpt_widget._on_click_length()
 
-    assert cpt_widget.table.item(
-        0, cpt_widget._get_table_column_index("decay_length_px")
+    assert (
+        cpt_widget.table.model()
+        .index(0, cpt_widget._get_table_column_index("decay_length_px"))
+        .data()
     ), "The decay length should be recorded"
     assert cpt_widget.data[0].decay_length_px == pytest.approx(
         1, rel=1e-3
@@ -0,0 +1,84 @@
+import dask.array as da
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._memory import (
+    WARNING_FRACTION,
+    format_bytes,
+    frame_cache_bytes,
+    memory_limit,
+    memory_report,
+    table_bytes,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay
+
+
+@pytest.mark.parametrize(
+    "size, text",
+    [(12, "12 B"), (1536, "1.5 kB"), (3 * 2**20, "3.0 MB"), (5 * 2**40, "5120.0 GB")],
+)
+def test_format_bytes(size, text):
+    assert format_bytes(size) == text
+
+
+def test_memory_limit_setting(monkeypatch):
+    monkeypatch.setenv("CPT_MEMORY_LIMIT_MB", "512")
+    assert memory_limit() == 512 * 2**20
+    monkeypatch.delenv("CPT_MEMORY_LIMIT_MB")
+    assert memory_limit() > 0
+
+
+def test_frame_cache_only_read_in_known_napari_versions(monkeypatch):
+    import napari
+    from napari.utils import resize_dask_cache
+
+    capacity = frame_cache_bytes()[1]
+    resize_dask_cache(2**20)
+    try:
+        assert frame_cache_bytes()[1] == 2**20
+        monkeypatch.setattr(napari, "__version__", "0.6.0")
+        assert frame_cache_bytes() == (0, 0)
+    finally:
+        resize_dask_cache(capacity)
+
+
+def test_table_bytes_grow_with_particles(cpt_widget):
+    empty = table_bytes(cpt_widget.table_model)
+    cpt_widget.table_model.set_particles([ParticleDecay() for _ in range(100)])
+    assert table_bytes(cpt_widget.table_model) > empty + 100 * 500
+
+
+def test_memory_report(cpt_widget):
+    viewer = cpt_widget.viewer
+    viewer.add_image(da.zeros((3, 4, 64, 64), chunks=(1, 1, 64, 64)))
+    viewer.add_points(np.zeros((5, 4)), name="points")
+    cpt_widget.data = [ParticleDecay(), ParticleDecay()]
+    report = memory_report(viewer, cpt_widget.table_model)
+    assert report["Image"] == "12 chunks of 32.0 kB"
+    assert report["points"].startswith("5 points, ")
+    assert report["Particle table"].startswith("2 particles, ")
+    assert {"Process", "Frame cache"} <= set(report)
+
+
+def test_panel_shows_report_when_expanded(cpt_widget):
+    panel = cpt_widget.memory_panel
+    panel.refresh()
+    assert panel.labels == {}
+    panel.setChecked(True)
+    assert "Particle table" in panel.labels
+    assert panel.labels["Particle table"].text().startswith("0 particles")
+
+
+def test_panel_warns_once_near_the_limit(cpt_widget, monkeypatch):
+    warnings = []
+    monkeypatch.setattr("cavendish_particle_tracks._memory.show_warning", warnings.append)
+    panel = cpt_widget.memory_panel
+    limit = 1000
+    assert not panel.check_limit(int(WARNING_FRACTION * limit) - 1, limit)
+    assert panel.check_limit(990, limit)
+    assert panel.check_limit(995, limit)
+    assert len(warnings) == 1 and "close to the limit" in warnings[0]
+    # Warned again after the memory went down
+    panel.check_limit(100, limit)
+    panel.check_limit(990, limit)
+    assert len(warnings) == 2
@@ -1,4 +1,5 @@
 import importlib
+import subprocess
 import sys
 
 import pytest
@@ -15,6 +16,37 @@ def test_version_fallback(mocker):
     assert cavendish_particle_tracks.__version__ == "unknown"  # type: ignore[attr-defined]
 
 
+# Seconds to import the package and its command line tools, without the widget
+IMPORT_TIME_BUDGET = 1.5
+
+
+def test_import_is_lazy():
+    """Importing the package (e.g. for plugin discovery or `cpt-aggregate`) does
+    not import napari, Qt or dask until the widget is needed."""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import cavendish_particle_tracks.aggregate, cavendish_particle_tracks.kinematics\n"
+        "print(time.perf_counter() - start)\n"
+        "print(' '.join(m for m in ('napari', 'qtpy', 'dask', 'dask_image') if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout.splitlines()
+    assert output[1:] == [""]
+    assert float(output[0]) < IMPORT_TIME_BUDGET
+
+
+def test_widget_is_imported_on_access():
+    import cavendish_particle_tracks  # fmt: skip
+    from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+
+    assert cavendish_particle_tracks.ParticleTracksWidget is ParticleTracksWidget
+    assert "ParticleTracksWidget" in dir(cavendish_particle_tracks)
+    with pytest.raises(AttributeError):
+        cavendish_particle_tracks.NotAWidget  # noqa: B018
+
+
 @pytest.mark.parametrize(
     "image_filename",
     ["tests/data/View_1.tiff", "tests/data/View_2.tiff"],
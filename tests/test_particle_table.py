@@ -0,0 +1,232 @@
+import numpy as np
+import pytest
+from qtpy.QtCore import Qt
+
+from cavendish_particle_tracks._particle_table import (
+    SORT_ROLE,
+    ParticleFilterModel,
+    ParticleTableModel,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay
+
+
+def _make_model() -> ParticleTableModel:
+    model = ParticleTableModel(
+        ["name", "event_number", "radius_px", "radius_cm", "phi_proton"], ["momentum"]
+    )
+    measured = ParticleDecay(name="Σ⁺ ⇨ p + π⁰", event_number=12, radius_px=25.0)
+    model.set_particles([ParticleDecay(name="Λ⁰ ⇨ p + π⁻", event_number=3), measured])
+    return model
+
+
+def _changes(model: ParticleTableModel) -> list:
+    changes = []
+    model.dataChanged.connect(
+        lambda top_left, bottom_right, *_: changes.append(
+            (top_left.row(), top_left.column(), bottom_right.row(), bottom_right.column())
+        )
+    )
+    return changes
+
+
+def test_model_display_and_sort_roles():
+    model = _make_model()
+    assert model.rowCount() == 2
+    assert model.columnCount() == 6
+    assert model.headerData(2, Qt.Horizontal) == "radius_px"
+
+    # Values that have not been measured are not shown
+    assert model.index(0, 2).data() is None
+    assert model.index(0, 4).data() is None
+    assert model.index(1, 2).data() == "25.0"
+    # The sort role keeps numbers as numbers
+    assert model.index(1, 1).data(SORT_ROLE) == 12
+    assert model.index(1, 2).data(SORT_ROLE) == 25.0
+    assert model.index(0, 5).data() is None
+
+
+def test_model_ranged_data_changed():
+    model = _make_model()
+    changes = _changes(model)
+    model.update_rows(0, 1, columns=["radius_cm", "radius_px"])
+    assert changes == [(0, 2, 1, 3)]
+
+
+def _momentum(particles):
+    return {"momentum": np.array([p.radius_cm for p in particles], dtype=float)}
+
+
+def test_model_derived_columns_follow_dependencies():
+    model = ParticleTableModel(
+        ["name", "radius_px", "radius_cm", "magnification_a"],
+        ["momentum"],
+        derived_inputs=["radius_cm"],
+    )
+    particles = [
+        ParticleDecay(radius_px=10.0 * i, radius_cm=10.0 * i, magnification_a=1.0)
+        for i in range(4)
+    ]
+    model.set_particles(particles)
+    assert model.dependents(["magnification_a"]) == [
+        "magnification_a",
+        "magnification",
+        "radius_cm",
+        "decay_length_cm",
+        "momentum",
+    ]
+
+    # Derived values are only computed once there is a function to compute them
+    assert model.index(1, 4).data() is None
+    calls = []
+    model.compute_derived = lambda p: calls.append(len(p)) or _momentum(p)
+    model.refresh()
+    assert calls == [4]
+    assert model.index(3, 4).data() == "30.0"
+
+    # A new calibration of rows 1 and 2 only recomputes and repaints those rows
+    changes = _changes(model)
+    for particle in particles[1:3]:
+        particle.magnification_a = 2.0
+    model.invalidate([1, 2], ["magnification_a"])
+    assert calls == [4, 2]
+    assert [p.radius_cm for p in particles] == [0.0, 20.0, 40.0, 30.0]
+    assert model.index(2, 4).data() == "40.0"
+    assert (1, 2, 2, 4) in changes
+    assert all(change[0] >= 1 and change[2] <= 2 for change in changes)
+
+    # Nothing is dirty, so nothing is recomputed
+    model.refresh()
+    assert calls == [4, 2]
+
+
+def test_model_invalidate_announces_each_run_of_rows_once():
+    model = ParticleTableModel(
+        ["name", "radius_px", "radius_cm"],
+        ["momentum"],
+        derived_inputs=["radius_cm"],
+    )
+    model.compute_derived = _momentum
+    model.set_particles([ParticleDecay(radius_px=float(i)) for i in range(6)])
+    changes = _changes(model)
+    model.invalidate([4, 0, 1], ["radius_px"])
+    assert changes == [(0, 1, 1, 3), (4, 1, 4, 3)]
+
+
+def test_model_insert_and_remove_rows():
+    model = _make_model()
+    model.compute_derived = lambda particles: {
+        "momentum": np.array([p.radius_px for p in particles], dtype=float)
+    }
+    model.append_particles([ParticleDecay(name="Σ⁻ ⇨ n + π⁻", radius_px=-1)])
+    assert model.rowCount() == 3
+    assert model.index(2, 0).data() == "Σ⁻ ⇨ n + π⁻"
+    assert model.index(2, 5).data() == "-1.0"
+
+    model.remove_particle(0)
+    assert model.rowCount() == 2
+    assert model.index(0, 2).data() == "25.0"
+    assert model.index(1, 5).data() == "-1.0"
+
+
+def test_widget_recalibrates_only_changed_particles(cpt_widget):
+    """Propagating the same magnification again does not touch the table, and a
+    new origin depth only recalibrates that particle."""
+    cpt_widget.data = [
+        ParticleDecay(name="Σ⁺ ⇨ p + π⁰", radius_px=100.0) for _ in range(3)
+    ]
+    cpt_widget._propagate_magnification(0.02, 0.001)
+    assert [p.radius_cm for p in cpt_widget.data] == pytest.approx([1.9, 1.9, 1.9])
+
+    changes = _changes(cpt_widget.table_model)
+    cpt_widget._propagate_magnification(0.02, 0.001)
+    cpt_widget._apply_magnification()
+    assert changes == []
+
+    cpt_widget.data[1].origin_vertex_stereoshift_info.name = "origin_vertex"
+    cpt_widget.data[1].origin_vertex_stereoshift_info.depth_cm = 10.0
+    cpt_widget.table_model.invalidate([1], ["origin_vertex_depth_cm"])
+    assert [p.radius_cm for p in cpt_widget.data] == pytest.approx([1.9, 3.0, 1.9])
+    assert {(change[0], change[2]) for change in changes} == {(1, 1)}
+
+
+def _filtered_rows(proxy: ParticleFilterModel) -> list[int]:
+    return [
+        proxy.mapToSource(proxy.index(row, 0)).row() for row in range(proxy.rowCount())
+    ]
+
+
+def test_filter_queries():
+    model = _make_model()
+    model.append_particles(
+        [ParticleDecay(name="Λ⁰ ⇨ p + π⁻", event_number=50, radius_px=3.0)]
+    )
+    proxy = ParticleFilterModel()
+    proxy.setSourceModel(model)
+    assert _filtered_rows(proxy) == [0, 1, 2]
+
+    for query, rows in [
+        ("λ⁰", [0, 2]),
+        ("event:10-", [1, 2]),
+        ("event:3", [0]),
+        ("Λ⁰ event:10-60", [2]),
+        ("missing:radius", [0]),
+        ("has:radius view:-1", [1, 2]),
+        ("missing:colour", []),
+        ("event:ten", []),
+        ("", [0, 1, 2]),
+    ]:
+        proxy.set_query(query)
+        assert _filtered_rows(proxy) == rows, query
+
+    # The filter follows the changes of the particles
+    proxy.set_query("missing:radius")
+    model.particles[0].radius_px = 1.0
+    model.update_rows(0)
+    assert _filtered_rows(proxy) == []
+    model.append_particles([ParticleDecay()])
+    assert _filtered_rows(proxy) == [3]
+    model.remove_particle(1)
+    assert _filtered_rows(proxy) == [2]
+
+
+def test_filter_index_updates_changed_rows(monkeypatch):
+    model = _make_model()
+    proxy = ParticleFilterModel()
+    proxy.setSourceModel(model)
+    proxy.set_query("Σ⁺ missing:radius")
+    assert _filtered_rows(proxy) == []
+
+    indexed = []
+    row_columns = proxy._row_columns
+    monkeypatch.setattr(
+        proxy,
+        "_row_columns",
+        lambda particles: indexed.append(len(particles)) or row_columns(particles),
+    )
+    model.particles[0].name = "Σ⁺ ⇨ p + π⁰"
+    model.update_rows(0)
+    assert _filtered_rows(proxy) == [0]
+    model.append_particles([ParticleDecay(name="Σ⁺ ⇨ n + π⁺")] * 2)
+    assert _filtered_rows(proxy) == [0, 2, 3]
+    # Only the changed and new rows were indexed
+    assert indexed == [1, 2]
+
+
+def test_widget_filter_moves_to_event(cpt_widget, qtbot):
+    cpt_widget.viewer.add_image(np.zeros((3, 100, 8, 8)), name="Bubble Chamber Data")
+    qtbot.waitUntil(cpt_widget.particle_decays_menu.isEnabled)
+    cpt_widget.data = [
+        ParticleDecay(name="Σ⁺ ⇨ p + π⁰", event_number=event) for event in (5, 70, 80)
+    ]
+    cpt_widget.filter_box.setText("event:60-")
+    assert cpt_widget.table.model().rowCount() == 2
+
+    cpt_widget.table.selectRow(1)
+    assert cpt_widget._get_selected_row() == 2
+    assert cpt_widget.viewer.dims.current_step[1] == 80
+
+    # A new particle hidden by the filter clears it
+    cpt_widget.viewer.dims.set_current_step(1, 10)
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    assert cpt_widget.filter_box.text() == ""
+    assert cpt_widget._get_selected_row() == 3
@@ -0,0 +1,85 @@
+import numpy as np
+from napari.layers import Points
+
+from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+from cavendish_particle_tracks._points_index import PointsSliceIndex
+
+
+def _ids(index: PointsSliceIndex, view: int, event: int) -> list[int]:
+    return sorted(index.points_in_slice(view, event).tolist())
+
+
+def test_index_follows_layer_changes():
+    layer = Points(
+        [[0, 1, 10, 10], [1, 1, 20, 20], [0, 1, 30, 30], [0, 2, 40, 40]], ndim=4
+    )
+    index = PointsSliceIndex(layer)
+    assert _ids(index, 0, 1) == [0, 2]
+    assert _ids(index, 1, 1) == [1]
+    assert _ids(index, 2, 0) == []
+
+    # Adding points
+    layer.add([[1, 1, 50, 50], [2, 0, 60, 60]])
+    assert _ids(index, 1, 1) == [1, 4]
+    assert _ids(index, 2, 0) == [5]
+
+    # Moving a point within its slice, and to another slice
+    layer.selected_data = {0}
+    layer._move([0], [0, 1, 15, 15])
+    assert _ids(index, 0, 1) == [0, 2]
+    data = layer.data.copy()
+    data[0, :2] = [2, 0]
+    layer.data = data
+    assert _ids(index, 0, 1) == [2]
+    assert _ids(index, 2, 0) == [0, 5]
+
+    # Removing points shifts the ids
+    layer.selected_data = {1}
+    layer.remove_selected()
+    assert _ids(index, 1, 1) == [3]
+    assert index.slice_of([0, 3]).tolist() == [[2, 0], [1, 1]]
+
+
+def test_index_nearest_point():
+    layer = Points([[0, 0, 0, 0], [0, 0, 10, 0], [0, 1, 5, 0]], ndim=4)
+    index = PointsSliceIndex(layer)
+    assert index.nearest(0, 0, [4, 0]) == 0
+    assert index.nearest(0, 0, [6, 1]) == 1
+    assert index.nearest(0, 1, [100, 100]) == 2
+    assert index.nearest(0, 1, [100, 100], max_distance=10) is None
+    assert index.nearest(1, 1, [0, 0]) is None
+
+
+def test_widget_measurement_index(cpt_widget: ParticleTracksWidget):
+    layer = cpt_widget._setup_measurement_layer()
+    layer.add([[0, 0, 1, 1], [0, 0, 3, 3], [0, 1, 2, 2]])
+    layer.selected_data = {0, 1}
+    cpt_widget.viewer.dims.current_step = (0, 0, 0, 0)
+
+    assert cpt_widget._nearest_measurement_point([2.9, 2.9]) == 1
+    np.testing.assert_array_equal(
+        cpt_widget._get_selected_points(), [[0, 0, 1, 1], [0, 0, 3, 3]]
+    )
+    assert cpt_widget._selected_points_are_on_current_slice()
+    layer.selected_data = {1, 2}
+    assert not cpt_widget._selected_points_are_on_current_slice()
+
+
+def test_double_click_picks_nearest_point(cpt_widget: ParticleTracksWidget):
+    layer = cpt_widget._setup_measurement_layer()
+    layer.add([[0, 0, 10, 10], [0, 0, 40, 40], [0, 1, 11, 11]])
+    cpt_widget.viewer.dims.current_step = (0, 0, 0, 0)
+    cpt_widget.viewer.camera.zoom = 1
+    layer.mode = "select"
+    layer.selected_data = set()
+
+    class Click:
+        position = (0, 0, 12, 12)
+
+    cpt_widget._on_double_click_measurements(layer, Click)
+    assert layer.selected_data == {0}
+    # Too far from any point
+    Click.position = (0, 0, 200, 200)
+    layer.selected_data = set()
+    cpt_widget._on_double_click_measurements(layer, Click)
+    assert layer.selected_data == set()
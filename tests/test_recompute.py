@@ -0,0 +1,161 @@
+import pytest
+
+from cavendish_particle_tracks._storage import (
+    Session,
+    load_results,
+    load_session,
+    save_results,
+    save_session,
+)
+from cavendish_particle_tracks.analysis import (
+    CHAMBER_DEPTH,
+    ParticleDecay,
+    StereoshiftInfo,
+)
+from cavendish_particle_tracks.recompute import (
+    main,
+    output_file_name,
+    recompute,
+    session_magnification,
+)
+
+FIDUCIALS = [
+    {"name": "C'", "x": 100.0, "y": 100.0},
+    {"name": "F'", "x": 400.0, "y": 273.0},
+    {"name": "C", "x": 90.0, "y": 95.0},
+    {"name": "F", "x": 350.0, "y": 245.0},
+]
+
+
+def _particle(stale: bool) -> ParticleDecay:
+    """A measured and calibrated particle, with stale values if `stale`."""
+    particle = ParticleDecay(name="Σ⁺ ⇨ p + π⁰", event_number=3, view_number=0)
+    particle.rpoints = [[0.0, 10.0], [10.0, 0.0], [0.0, -10.0]]
+    particle.dpoints = [[0.0, 0.0], [30.0, 40.0]]
+    particle.radius_px, particle.decay_length_px = 10.0, 50.0
+    particle.magnification_a, particle.magnification_b = 0.02, 0.001
+    particle.origin_vertex_stereoshift_info = StereoshiftInfo(
+        name="origin_vertex",
+        shift_fiducial=40.0,
+        shift_point=10.0,
+        stereoshift=0.25,
+        # Measured from the back of the chamber
+        depth_cm=0.75 * CHAMBER_DEPTH,
+    )
+    particle.phi_proton = 0.3
+    particle.calibrate()
+    if stale:
+        particle.radius_px = particle.radius_cm = 9.0
+        particle.decay_length_px = 45.0
+        particle.origin_vertex_stereoshift_info.depth_cm = 0.7 * CHAMBER_DEPTH
+    return particle
+
+
+def _unmeasured() -> ParticleDecay:
+    return ParticleDecay(name="Λ⁰ ⇨ p + π⁻", event_number=4, view_number=0)
+
+
+def _assert_recomputed(particle: ParticleDecay):
+    expected = _particle(stale=False)
+    assert particle.radius_px == pytest.approx(expected.radius_px)
+    assert particle.radius_cm == pytest.approx(expected.radius_cm)
+    assert particle.decay_length_px == pytest.approx(expected.decay_length_px)
+    assert particle.decay_length_cm == pytest.approx(expected.decay_length_cm)
+    assert particle.origin_vertex_depth_cm == pytest.approx(0.75 * CHAMBER_DEPTH)
+    assert particle.phi_proton == 0.3
+
+
+def test_recompute_results(tmp_path):
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, [_particle(stale=True), _unmeasured()], seed=7)
+
+    assert recompute([file_name], workers=1) == {file_name: (2, 1)}
+    particles = load_results(output_file_name(file_name))
+    _assert_recomputed(particles[0])
+    # Measurements that were not made are left as they were
+    assert particles[1] == _unmeasured()
+
+
+def test_recompute_session_magnification(tmp_path):
+    file_name = str(tmp_path / "session.cpt")
+    particle = _particle(stale=False)
+    session = Session(
+        seed=3,
+        mag_a=particle.magnification_a,
+        mag_b=particle.magnification_b,
+        magnification_fiducials=FIDUCIALS,
+        particles=[particle],
+    )
+    save_session(file_name, session)
+
+    recompute([file_name], in_place=True, workers=1)
+    restored = load_session(file_name)
+    a, b = session_magnification(FIDUCIALS)
+    assert (restored.mag_a, restored.mag_b) == (a, b)
+    assert restored.particles[0].magnification_a == a
+    assert restored.particles[0].radius_cm == pytest.approx(
+        (a + b * 0.75 * CHAMBER_DEPTH) * 10.0
+    )
+    assert restored.seed == 3
+
+
+def test_session_magnification_needs_all_fiducials():
+    assert session_magnification([]) is None
+    unplaced = [dict(f) for f in FIDUCIALS]
+    unplaced[2] = {"name": "C", "x": -1.0e6, "y": -1.0e6}
+    assert session_magnification(unplaced) is None
+
+
+def test_recompute_cli(tmp_path, capsys):
+    results = str(tmp_path / "results.npz")
+    csv = str(tmp_path / "results.csv")
+    particles = [_particle(stale=True), _unmeasured()]
+    save_results(results, particles)
+    with open(csv, "w", encoding="UTF8", newline="") as f:
+        f.write(",".join(particles[0].vars_to_save()) + "\n")
+        f.writelines([particle.to_csv() for particle in particles])
+
+    output_dir = tmp_path / "out"
+    files = [results, csv, str(tmp_path / "missing.npz")]
+    assert main([*files, "-o", str(output_dir), "-j", "1"]) == 0
+    captured = capsys.readouterr()
+    assert "Skipping" in captured.err
+    assert "1 of 2 particles changed" in captured.out
+    for name in ("results_recomputed.npz", "results_recomputed.csv"):
+        _assert_recomputed(load_results(str(output_dir / name))[0])
+    assert sorted(path.name for path in output_dir.iterdir()) == [
+        "results_recomputed.csv",
+        "results_recomputed.npz",
+    ]
+
+
+def test_recompute_skips_bad_pickles(tmp_path):
+    import os
+    import pickle
+
+    good = str(tmp_path / "good.pkl")
+    with open(good, "wb") as f:
+        pickle.dump([_particle(stale=True)], f)
+    unsafe = tmp_path / "unsafe.pkl"
+    unsafe.write_bytes(pickle.dumps(os.getcwd))
+    truncated = tmp_path / "truncated.pkl"
+    truncated.write_bytes((tmp_path / "good.pkl").read_bytes()[:20])
+
+    results = recompute([good, str(unsafe), str(truncated)], workers=1)
+    assert results[good] == (1, 1)
+    assert results[str(unsafe)].startswith("UnpicklingError")
+    assert results[str(truncated)].startswith(("EOFError", "UnpicklingError"))
+
+
+def test_recompute_skips_corrupt_archives(tmp_path):
+    good = str(tmp_path / "results.npz")
+    save_results(good, [_particle(stale=True)])
+    truncated = tmp_path / "truncated.npz"
+    truncated.write_bytes((tmp_path / "results.npz").read_bytes()[:100])
+    session = tmp_path / "session.cpt"
+    session.write_bytes((tmp_path / "results.npz").read_bytes()[:100])
+
+    results = recompute([good, str(truncated), str(session)], workers=1)
+    assert results[good] == (1, 1)
+    assert results[str(truncated)].startswith("BadZipFile")
+    assert results[str(session)].startswith("BadZipFile")
@@ -0,0 +1,200 @@
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks._results_store import (
+    SCHEMA_VERSION,
+    ResultsStore,
+    open_store,
+    read_store,
+)
+from cavendish_particle_tracks._storage import (
+    dataset_id,
+    particles_from_arrays,
+    save_session,
+)
+from cavendish_particle_tracks.aggregate import aggregate
+from cavendish_particle_tracks.analysis import ParticleDecay
+from cavendish_particle_tracks.synthetic import write_dataset
+
+
+def _particles(n: int, event: int = 0) -> list[ParticleDecay]:
+    particles = []
+    for i in range(n):
+        particle = ParticleDecay(name="Λ⁰ ⇨ p + π⁻", event_number=event + i)
+        particle.rpoints = [[i, 1.0], [2.0, i], [3.0, 4.0]]
+        particle.radius_px = 10.0 + i
+        particles.append(particle)
+    return particles
+
+
+def test_sessions_are_written_and_read(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    first = ResultsStore(file_name, seed=1, dataset="abc")
+    second = ResultsStore(file_name, seed=2)
+    first.write(_particles(3))
+    second.write(_particles(2, event=10))
+    # A session rewrites its rows
+    first.write(_particles(2))
+
+    arrays = read_store(file_name)
+    assert arrays["seed"].tolist() == [1, 1, 2, 2]
+    assert arrays["event_number"].tolist() == [0, 1, 10, 11]
+    assert arrays["rpoints"].shape == (4, 3, 2)
+    assert particles_from_arrays(arrays)[:2] == _particles(2)
+    assert arrays["source"][0].endswith("/" + first.session)
+
+
+def test_read_empty_store(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    ResultsStore(file_name).close()
+    arrays = read_store(file_name)
+    assert len(arrays["name"]) == 0
+    assert arrays["dpoints"].shape == (0, 2, 2)
+
+
+def _write_session(args):
+    file_name, seed = args
+    store = ResultsStore(file_name, seed=seed)
+    for n in range(1, 21):
+        store.write(_particles(n))
+    store.close()
+
+
+def test_concurrent_sessions(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    with ProcessPoolExecutor(4) as pool:
+        list(pool.map(_write_session, [(file_name, seed) for seed in range(8)]))
+    arrays = read_store(file_name)
+    assert np.bincount(arrays["seed"]).tolist() == [20] * 8
+
+
+def test_aggregate_reads_store(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    for seed in (1, 1, 2):
+        ResultsStore(file_name, seed=seed).write(_particles(2))
+    arrays = aggregate([file_name], workers=1)
+    # The same particles measured twice with the same seed are kept once
+    assert arrays["seed"].tolist() == [1, 1, 2, 2]
+    assert len(set(arrays["source"])) == 2
+
+
+def test_widget_writes_to_store(cpt_widget, tmp_path, monkeypatch):
+    file_name = str(tmp_path / "lab.sqlite")
+    monkeypatch.setenv("CPT_RESULTS_DB", file_name)
+    write_dataset(str(tmp_path / "data"), events=2, size=256, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    cpt_widget.particle_decays_menu.setCurrentIndex(4)
+    assert cpt_widget._results_store_timer.isActive()
+
+    cpt_widget._results_store_timer.stop()
+    cpt_widget._write_results_store()
+    arrays = read_store(file_name)
+    assert arrays["name"].tolist() == ["Σ⁺ ⇨ p + π⁰", "Λ⁰ ⇨ p + π⁻"]
+    assert arrays["seed"].tolist() == [cpt_widget.shuffling_seed] * 2
+
+
+def test_old_store_is_migrated(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    ResultsStore(file_name, seed=1).write(_particles(2))
+    # A database of a version without the decay vertex depth
+    connection = sqlite3.connect(file_name)
+    with connection:
+        connection.execute('ALTER TABLE particles DROP COLUMN "decay_vertex_depth_cm"')
+        connection.execute("PRAGMA user_version = 0")
+    connection.close()
+
+    store = ResultsStore(file_name, seed=2)
+    store.write(_particles(1))
+    arrays = read_store(file_name)
+    assert arrays["seed"].tolist() == [1, 1, 2]
+    assert arrays["decay_vertex_depth_cm"].tolist() == [-1.0] * 3
+
+
+def test_newer_store_is_not_opened(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    ResultsStore(file_name).close()
+    connection = sqlite3.connect(file_name)
+    connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    connection.close()
+    with pytest.raises(sqlite3.DatabaseError, match="newer"):
+        ResultsStore(file_name)
+    with pytest.warns(UserWarning, match="Could not open the results database"):
+        assert open_store(file_name) is None
+
+
+def test_locked_store_is_written_later(tmp_path):
+    file_name = str(tmp_path / "lab.sqlite")
+    store = ResultsStore(file_name, timeout=0.01)
+    other = sqlite3.connect(file_name, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    assert not store.write(_particles(2))
+    other.execute("COMMIT")
+    assert store.write(_particles(2))
+    assert len(read_store(file_name)["name"]) == 2
+
+
+def test_widget_records_seed_and_dataset(cpt_widget, tmp_path, monkeypatch):
+    file_name = str(tmp_path / "lab.sqlite")
+    monkeypatch.setenv("CPT_RESULTS_DB", file_name)
+    write_dataset(str(tmp_path / "first"), events=2, size=128, workers=1)
+    write_dataset(str(tmp_path / "second"), events=3, size=128, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "first"))
+    first = cpt_widget.results_store.dataset
+
+    cpt_widget.viewer.layers.clear()
+    assert cpt_widget._load_data(str(tmp_path / "second"))
+    assert cpt_widget.results_store.dataset != first
+    assert cpt_widget.results_store.dataset == dataset_id(cpt_widget.manifest)
+
+    cpt_widget.shuffling_seed = 5
+    session = cpt_widget._current_session()
+    save_session(str(tmp_path / "session.cpt"), session)
+    cpt_widget.shuffling_seed = 1
+    cpt_widget._open_session(str(tmp_path / "session.cpt"))
+    assert cpt_widget.results_store.seed == 5
+    cpt_widget._results_store_timer.timeout.emit()
+    connection = sqlite3.connect(file_name)
+    assert connection.execute(
+        "SELECT seed FROM sessions WHERE session = ?",
+        (cpt_widget.results_store.session,),
+    ).fetchall() == [(5,)]
+    connection.close()
+
+
+def test_opening_a_locked_store_does_not_wait(tmp_path):
+    import time
+
+    file_name = str(tmp_path / "lab.sqlite")
+    ResultsStore(file_name).close()
+    other = sqlite3.connect(file_name, isolation_level=None)
+    other.execute("BEGIN EXCLUSIVE")
+    start = time.perf_counter()
+    with pytest.warns(UserWarning, match="locked"):
+        assert open_store(file_name, timeout=0.05) is None
+    assert time.perf_counter() - start < 5
+    other.execute("COMMIT")
+
+
+def test_widget_closes_store(cpt_widget, tmp_path, monkeypatch):
+    file_name = str(tmp_path / "lab.sqlite")
+    monkeypatch.setenv("CPT_RESULTS_DB", file_name)
+    write_dataset(str(tmp_path / "data"), events=2, size=128, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    store = cpt_widget.results_store
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    assert cpt_widget._results_store_timer.isActive()
+
+    # Removing the data writes the pending changes and closes the database
+    cpt_widget.viewer.layers.clear()
+    assert cpt_widget.results_store is None
+    assert not cpt_widget._results_store_timer.isActive()
+    with pytest.raises(sqlite3.ProgrammingError):
+        store.write([])
+    assert len(read_store(file_name)["name"]) == 1
+
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    assert cpt_widget.results_store is not None
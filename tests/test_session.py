@@ -0,0 +1,155 @@
+import numpy as np
+import pytest
+import tifffile as tf
+
+from cavendish_particle_tracks._decay_angles_dialog import ANGLES_LAYER_NAME
+from cavendish_particle_tracks._magnification_dialog import MAGNIFICATION_LAYER_NAME
+from cavendish_particle_tracks._main_widget import (
+    IMAGE_LAYER_NAME,
+    MEASUREMENTS_LAYER_NAME,
+    ParticleTracksWidget,
+)
+from cavendish_particle_tracks._storage import (
+    load_session,
+    particles_from_arrays,
+    particles_to_arrays,
+    save_session,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay, StereoshiftInfo
+
+
+def _make_particle() -> ParticleDecay:
+    particle = ParticleDecay(name="Σ⁺ ⇨ p + π⁰", index=1, event_number=3, view_number=1)
+    particle.rpoints = [[0, 1], [1, 0], [0, -1]]
+    particle.radius_px = 1.0
+    particle.dpoints = [[1, 1], [2, 2]]
+    particle.decay_length_px = np.sqrt(2)
+    particle.magnification_a = 0.5
+    particle.magnification_b = 0.1
+    particle.origin_vertex_stereoshift_info = StereoshiftInfo(
+        name="origin_vertex", stereoshift=0.25, depth_cm=7.9
+    )
+    particle.origin_vertex_stereoshift_info.spoints = [[1, 2], [3, 4], [5, 6], [7, 8]]
+    particle.phi_proton = 0.3
+    particle.phi_pion = -0.4
+    particle.calibrate()
+    return particle
+
+
+def test_particles_arrays_round_trip():
+    particles = [_make_particle(), ParticleDecay(name="Λ⁰ ⇨ p + π⁻", index=4)]
+    arrays = particles_to_arrays(particles)
+    assert arrays["rpoints"].shape == (2, 3, 2)
+    assert arrays["origin_vertex_spoints"].shape == (2, 4, 2)
+    assert particles_from_arrays(arrays) == particles
+
+
+def test_particles_arrays_empty():
+    assert particles_from_arrays(particles_to_arrays([])) == []
+
+
+def test_save_and_open_session(make_napari_viewer, tmp_path):
+    """Save a session from one widget and restore it in a fresh one."""
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    widget.data = [_make_particle()]
+    widget.layer_measurements = widget._setup_measurement_layer()
+    widget.layer_measurements.add([[1, 3, 0, 1], [1, 3, 1, 0], [1, 3, 0, -1]])
+    widget._propagate_magnification(0.5, 0.1)
+    mag_dlg = widget._on_click_magnification()
+    mag_dlg.magnification_layer.add([[10, 20], [30, 40]])
+    mag_dlg.f1.name, mag_dlg.f1.x, mag_dlg.f1.y = "C'", 10.0, 20.0
+    mag_dlg.reject()
+
+    file_name = str(tmp_path / "my_session.cpt")
+    save_session(file_name, widget._current_session())
+
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    restored._open_session(file_name)
+
+    assert restored.data == widget.data
+    assert restored.table.model().rowCount() == 1
+    for column in ["name", "radius_px", "decay_length_cm", "phi_pion"]:
+        assert (
+            restored.table.model()
+            .index(0, restored._get_table_column_index(column))
+            .data()
+        )
+    assert (
+        not restored.table.model()
+        .index(0, restored._get_table_column_index("decay_vertex_depth_cm"))
+        .data()
+    )
+    assert restored.mag_a == 0.5
+    assert restored.mag_b == 0.1
+    assert restored.apply_magnification_button.isEnabled()
+    np.testing.assert_array_equal(
+        restored.viewer.layers[MEASUREMENTS_LAYER_NAME].data,
+        widget.viewer.layers[MEASUREMENTS_LAYER_NAME].data,
+    )
+    np.testing.assert_array_equal(
+        restored.viewer.layers[MAGNIFICATION_LAYER_NAME].data,
+        widget.viewer.layers[MAGNIFICATION_LAYER_NAME].data,
+    )
+    assert restored.mag_dlg.f1.name == "C'"
+    assert not restored.viewer.layers[MAGNIFICATION_LAYER_NAME].visible
+    assert ANGLES_LAYER_NAME not in restored.viewer.layers
+
+
+def test_session_restores_decay_angles_layer(make_napari_viewer, tmp_path):
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    widget.particle_decays_menu.setCurrentIndex(4)
+    lines = [np.array([[0.0, 0.0], [1.0, 1.0]]) * (i + 1) for i in range(3)]
+    widget._on_click_decay_angles().cal_layer.data = lines
+
+    file_name = str(tmp_path / "session.cpt")
+    save_session(file_name, widget._current_session())
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    restored._open_session(file_name)
+
+    assert ANGLES_LAYER_NAME in restored.viewer.layers
+    for restored_line, line in zip(restored.decay_angles_dlg.cal_layer.data, lines):
+        np.testing.assert_array_equal(restored_line, line)
+
+
+@pytest.mark.parametrize("seed", [1, 42])
+def test_session_reloads_dataset(make_napari_viewer, tmp_path, seed):
+    """The dataset is reloaded from the manifest with the saved shuffling seed."""
+    for view in ["view1", "view2", "view3"]:
+        (tmp_path / "data" / view).mkdir(parents=True)
+        for i in range(3):
+            tf.imwrite(
+                tmp_path / "data" / view / f"{i}.tif", np.full((4, 4, 3), i, "uint8")
+            )
+
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    widget.shuffling_seed = seed
+    assert widget._load_data(str(tmp_path / "data"))
+    assert widget.manifest["files"] == [["0.tif", "1.tif", "2.tif"]] * 3
+    widget.particle_decays_menu.setCurrentIndex(2)
+
+    file_name = str(tmp_path / "session.cpt")
+    save_session(file_name, widget._current_session())
+    assert load_session(file_name).seed == seed
+
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    restored._open_session(file_name)
+    assert IMAGE_LAYER_NAME in restored.viewer.layers
+    assert restored.shuffling_seed == seed
+    assert restored.manifest == widget.manifest
+    np.testing.assert_array_equal(
+        restored.viewer.layers[IMAGE_LAYER_NAME].data,
+        widget.viewer.layers[IMAGE_LAYER_NAME].data,
+    )
+
+
+def test_open_bad_session_file(cpt_widget, tmp_path, capsys):
+    from cavendish_particle_tracks._storage import save_results
+
+    results = str(tmp_path / "results.npz")
+    save_results(results, [_make_particle()])
+    truncated = tmp_path / "truncated.cpt"
+    truncated.write_bytes((tmp_path / "results.npz").read_bytes()[:100])
+    for file_name in (results, str(truncated), str(tmp_path / "missing.cpt")):
+        cpt_widget._open_session(file_name)
+        assert "Could not open the session" in capsys.readouterr().out
+    assert cpt_widget.data == []
@@ -0,0 +1,170 @@
+import json
+from dataclasses import dataclass, field
+
+import numpy as np
+import pytest
+
+from cavendish_particle_tracks import _storage
+from cavendish_particle_tracks._storage import (
+    FORMAT_VERSION,
+    dataset_id,
+    file_fingerprint,
+    load_results,
+    particles_from_arrays,
+    particles_to_arrays,
+    read_archive,
+    read_cache,
+    save_results,
+    write_archive,
+    write_cache,
+)
+from cavendish_particle_tracks.analysis import ParticleDecay
+
+
+def _particles(n: int) -> list[ParticleDecay]:
+    particles = []
+    for i in range(n):
+        particle = ParticleDecay(name="Σ⁻ ⇨ n + π⁻", index=3, event_number=i)
+        particle.rpoints = [[i, 1.0], [2.0, i], [3.0, 4.0]]
+        particle.radius_px = float(i)
+        particles.append(particle)
+    return particles
+
+
+def test_results_file_is_plain_numpy(tmp_path):
+    """The file can be read with numpy alone, without allowing pickles."""
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, _particles(3), seed=7)
+    with np.load(file_name, allow_pickle=False) as archive:
+        header = json.loads(archive["header"].tobytes())
+        assert archive["radius_px"].tolist() == [0.0, 1.0, 2.0]
+        assert archive["rpoints"].shape == (3, 3, 2)
+    assert header == {"kind": "results", "version": FORMAT_VERSION, "seed": 7}
+
+
+def test_results_round_trip_preserves_columns(tmp_path):
+    """Particles read back have the same variables, in the same order."""
+    particles = _particles(5)
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, particles)
+    loaded = load_results(file_name)
+    assert loaded == particles
+    assert loaded[0].vars_to_save() == particles[0].vars_to_save()
+
+
+def test_missing_arrays_take_defaults():
+    """Files written before a variable existed still load."""
+    arrays = particles_to_arrays(_particles(2))
+    del arrays["phi_pion"], arrays["decay_vertex_spoints"]
+    particles = particles_from_arrays(arrays)
+    assert [p.phi_pion for p in particles] == [-100, -100]
+    assert particles[1].decay_vertex_stereoshift_info.spoints == [[0.0, 0.0]] * 4
+    # Each particle gets its own points
+    particles[0].decay_vertex_stereoshift_info._sf1[0] = 1.0
+    assert particles[1].decay_vertex_stereoshift_info._sf1 == [0.0, 0.0]
+
+
+def test_every_field_is_stored():
+    """The columns follow the fields of the dataclasses."""
+    from dataclasses import fields
+
+    from cavendish_particle_tracks.analysis import StereoshiftInfo
+
+    stored = {*_storage._INT_FIELDS, *_storage._FLOAT_FIELDS}
+    stored |= {point for points in _storage._POINTS.values() for point in points}
+    stored |= {"name", "origin_vertex_stereoshift_info", "decay_vertex_stereoshift_info"}
+    assert {f.name for f in fields(ParticleDecay)} == stored
+    assert {f.name for f in fields(StereoshiftInfo)} == {
+        "name",
+        *_storage._SPOINTS,
+        *_storage._STEREOSHIFT_FLOAT_FIELDS,
+    }
+
+
+@dataclass
+class _Annotated:
+    count: "int" = 0
+    size: float = 0.0
+    points: "list[float]" = field(default_factory=list)
+
+
+def test_fields_of_type_resolves_string_annotations():
+    assert _storage._fields_of_type(_Annotated, int) == ("count",)
+    assert _storage._fields_of_type(_Annotated, float) == ("size",)
+    assert _storage._fields_of_type(_Annotated, list[float]) == ("points",)
+
+
+def test_old_versions_are_migrated(tmp_path, monkeypatch):
+    file_name = str(tmp_path / "results.npz")
+    save_results(file_name, _particles(2))
+
+    def rename_radius(header, arrays):
+        arrays["radius_mm"] = arrays.pop("radius_px") * 10
+        header["migrated"] = True
+
+    monkeypatch.setattr(_storage, "FORMAT_VERSION", FORMAT_VERSION + 1)
+    monkeypatch.setitem(_storage._MIGRATIONS, FORMAT_VERSION, rename_radius)
+    header, arrays = read_archive(file_name, "results")
+    assert header["migrated"]
+    assert arrays["radius_mm"].tolist() == [0.0, 10.0]
+
+
+def test_newer_versions_warn_and_ignore_unknown_data(tmp_path):
+    file_name = str(tmp_path / "results.npz")
+    arrays = particles_to_arrays(_particles(2))
+    arrays["from_the_future"] = np.ones(2)
+    write_archive(file_name, "results", {"version": FORMAT_VERSION + 1}, arrays)
+    with pytest.warns(UserWarning, match="newer version"):
+        assert load_results(file_name) == _particles(2)
+
+
+def test_wrong_kind_of_file(tmp_path):
+    file_name = str(tmp_path / "session.npz")
+    write_archive(file_name, "session", {}, {})
+    with pytest.raises(ValueError, match="is not a results file"):
+        load_results(file_name)
+
+
+def test_cache_round_trip(tmp_path):
+    file_name = str(tmp_path / "cache" / "values.npz")
+    assert [len(a) for a in read_cache(file_name, "values", ("a", "b"))] == [0, 0]
+    write_cache(file_name, "values", {"a": np.arange(3), "b": np.ones(3)})
+    a, b = read_cache(file_name, "values", ("a", "b"))
+    np.testing.assert_array_equal(a, np.arange(3))
+    np.testing.assert_array_equal(b, np.ones(3))
+
+
+def test_cache_missing_arrays_warns(tmp_path):
+    file_name = str(tmp_path / "values.npz")
+    write_cache(file_name, "some_values", {"a": np.arange(3)})
+    with pytest.warns(UserWarning, match="Ignoring the cached some values"):
+        a, b = read_cache(file_name, "some_values", ("a", "b"))
+    assert len(a) == len(b) == 0
+
+
+def test_dataset_id_depends_on_file_contents(tmp_path):
+    import shutil
+
+    from cavendish_particle_tracks.synthetic import write_dataset
+
+    ids = []
+    for name, seed in [("roll1", 1), ("roll2", 2)]:
+        write_dataset(str(tmp_path / name), events=2, size=128, seed=seed, workers=1)
+    shutil.copytree(tmp_path / "roll1", tmp_path / "copy")
+    for name in ("roll1", "roll2", "copy"):
+        subdirs = sorted(p.name for p in (tmp_path / name).iterdir() if p.is_dir())
+        files = [sorted((tmp_path / name / d).iterdir()) for d in subdirs]
+        ids.append(
+            dataset_id(
+                {
+                    "subdirs": subdirs,
+                    "files": [[f.name for f in view] for view in files],
+                    "fingerprints": [
+                        file_fingerprint([str(f) for f in view]) for view in files
+                    ],
+                }
+            )
+        )
+    # Rolls with the same file names differ, and copies of a roll do not
+    assert ids[0] != ids[1]
+    assert ids[0] == ids[2]
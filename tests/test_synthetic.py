@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+import tifffile as tf
+
+from cavendish_particle_tracks._calculate import angle, radius
+from cavendish_particle_tracks._correspondence import match_point
+from cavendish_particle_tracks._storage import load_results
+from cavendish_particle_tracks.analysis import (
+    CHAMBER_DEPTH,
+    FIDUCIAL_BACK,
+    FIDUCIAL_FRONT,
+    VIEW_NAMES,
+)
+from cavendish_particle_tracks.synthetic import (
+    TRACK,
+    TRUTH_FILE_NAME,
+    Camera,
+    _rotate,
+    main,
+    write_dataset,
+)
+
+SIZE = 1024
+
+
+@pytest.fixture(scope="module")
+def dataset(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("synthetic")
+    particles = write_dataset(str(folder), events=6, size=SIZE, workers=1)
+    return folder, particles
+
+
+def _stack(folder, event):
+    """(view, event, y, x, rgb) stack of the frames of one event."""
+    return np.stack(
+        [tf.imread(folder / view / f"frame_{event:05d}.tif") for view in VIEW_NAMES]
+    )[:, np.newaxis]
+
+
+def test_rotate_matches_angle_convention():
+    vector = np.array([3.0, 1.0])
+    rotated = _rotate(vector, 0.7)
+    assert angle([[0, 0], vector], [[0, 0], rotated]) == pytest.approx(0.7)
+
+
+def test_dataset_layout(dataset):
+    folder, particles = dataset
+    for view in VIEW_NAMES:
+        frames = sorted(path.name for path in (folder / view).iterdir())
+        assert frames == [f"frame_{event:05d}.tif" for event in range(6)]
+    frame = tf.imread(folder / "view2" / "frame_00003.tif")
+    assert frame.shape == (SIZE, SIZE, 3) and frame.dtype == np.uint8
+
+    truth = load_results(str(folder / TRUTH_FILE_NAME))
+    assert [p.event_number for p in truth] == list(range(6))
+    assert [p.decay_length_cm for p in truth] == pytest.approx(
+        [p.decay_length_cm for p in particles]
+    )
+
+
+def test_truth_is_consistent(dataset):
+    folder, particles = dataset
+    for particle in particles:
+        assert particle.decay_length_cm == pytest.approx(
+            particle.decay_length_px * particle.magnification
+        )
+        if particle.radius_px > 0:
+            assert radius(*particle.rpoints) == pytest.approx(particle.radius_px)
+    # The vertices of the first view are drawn
+    stack = _stack(folder, particles[0].event_number)
+    for point in particles[0].dpoints:
+        row, column = np.rint(point).astype(int)
+        assert stack[0, 0, row, column, 0] == TRACK
+
+
+def test_fiducials_give_the_magnification():
+    camera = Camera.for_size(SIZE)
+    front = [camera.project(FIDUCIAL_FRONT[name], 0) for name in ("C'", "F'")]
+    back = [camera.project(FIDUCIAL_BACK[name], CHAMBER_DEPTH) for name in ("C", "F")]
+    a = np.linalg.norm(
+        np.subtract(FIDUCIAL_FRONT["C'"], FIDUCIAL_FRONT["F'"])
+    ) / np.linalg.norm(front[0] - front[1])
+    b = (
+        np.linalg.norm(np.subtract(FIDUCIAL_BACK["C"], FIDUCIAL_BACK["F"]))
+        / np.linalg.norm(back[0] - back[1])
+        - a
+    ) / CHAMBER_DEPTH
+    assert (a, b) == pytest.approx((camera.magnification_a, camera.magnification_b))
+
+
+def test_matched_depths_agree_with_truth(dataset):
+    """The depth of the decay vertices measured from their shift between the
+    first two views (relative to a front and a back fiducial) is the true one."""
+    folder, particles = dataset
+    camera = Camera.for_size(SIZE)
+    front = camera.project(FIDUCIAL_FRONT["C'"], 0)
+    back = camera.project(FIDUCIAL_BACK["C"], CHAMBER_DEPTH)
+    for particle in particles:
+        stack = _stack(folder, particle.event_number)
+        front_shift, back_shift, vertex_shift = (
+            match_point(stack, 0, point, 0, 1).position - point
+            for point in (front, back, np.asarray(particle.dpoints[1]))
+        )
+        depth = (
+            np.linalg.norm(vertex_shift - front_shift)
+            / np.linalg.norm(back_shift - front_shift)
+            * CHAMBER_DEPTH
+        )
+        assert depth == pytest.approx(particle.decay_vertex_depth_cm, abs=1.0)
+
+
+def test_main(tmp_path, capsys):
+    assert main([str(tmp_path), "-n", "2", "--size", "256", "--compression", "zlib"]) == 0
+    assert "Wrote 2 events" in capsys.readouterr().out
+    assert len(load_results(str(tmp_path / TRUTH_FILE_NAME))) == 2
+    assert (tmp_path / "view3" / "frame_00001.tif").exists()
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from cavendish_particle_tracks import _tracing
+from cavendish_particle_tracks._tracing import span, traced
+from cavendish_particle_tracks.synthetic import write_dataset
+
+
+@pytest.fixture
+def tracing(tmp_path):
+    """Record a trace for the duration of a test."""
+    _tracing.start(str(tmp_path / "trace.json"))
+    yield tmp_path / "trace.json"
+    _tracing.stop()
+
+
+def test_tracing_is_off_by_default():
+    assert not _tracing.enabled()
+    with span("nothing"):
+        pass
+    assert _tracing.stop() == []
+
+
+def test_traced_is_transparent():
+    """The decorated function takes the same arguments as the function."""
+    import inspect
+
+    @traced
+    def handler(a, b=2):
+        return a + b
+
+    assert handler(1) == 3
+    assert handler(1, b=3) == 4
+    with pytest.raises(TypeError):
+        handler(1, 3, True)
+    assert handler.__name__ == "handler"
+    assert str(inspect.signature(handler)) == "(a, b=2)"
+
+
+def test_traced_buttons_ignore_checked_state(cpt_widget):
+    """The buttons connected to traced handlers drop the arguments of their
+    signals."""
+    cpt_widget.show_kinematics_button.setChecked(True)
+    cpt_widget.delete_particle.click()
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    assert len(cpt_widget.data) == 1
+
+
+def test_spans_are_written_as_chrome_trace(tracing):
+    @traced
+    def handler():
+        with span("inner", size=3):
+            pass
+
+    handler()
+    _tracing.write()
+    events = json.loads(tracing.read_text())["traceEvents"]
+    assert [event["name"] for event in events] == [
+        "inner",
+        "test_spans_are_written_as_chrome_trace.<locals>.handler",
+    ]
+    inner, outer = events
+    assert inner["ph"] == "X" and inner["args"] == {"size": "3"}
+    assert outer["ts"] <= inner["ts"]
+    assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+
+
+def test_widget_hot_paths_are_traced(cpt_widget, tracing, tmp_path):
+    write_dataset(str(tmp_path / "data"), events=3, size=256, workers=1)
+    assert cpt_widget._load_data(str(tmp_path / "data"))
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    cpt_widget.viewer.dims.set_current_step(1, 2)
+
+    events = _tracing.stop()
+    names = {event["name"] for event in events}
+    assert {
+        "ParticleTracksWidget._load_data",
+        "scan folders",
+        "show first event",
+        "ParticleTracksWidget._on_click_new_particle",
+        "ParticleTableModel.append_particles",
+    } <= names
+    # The frames decoded by dask for the slices shown
+    assert "dask compute" in names
+    assert any(
+        event["cat"] == "dask" and event["name"] != "dask compute" for event in events
+    )
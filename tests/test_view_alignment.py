@@ -0,0 +1,113 @@
+import numpy as np
+import pytest
+import tifffile as tf
+from scipy import ndimage
+
+from cavendish_particle_tracks._main_widget import ParticleTracksWidget
+from cavendish_particle_tracks._view_alignment import (
+    ViewTransforms,
+    apply_affine,
+    estimate_affine,
+    estimate_view_transform,
+)
+
+# (y, x) of view1 = SHIFT_AND_SCALE @ (y, x, 1) of view0
+SHIFT_AND_SCALE = np.array([[1.02, 0.01, -30.0], [-0.01, 0.99, 45.0]])
+
+
+def _smooth_noise(size: int, seed: int = 0) -> np.ndarray:
+    return ndimage.gaussian_filter(np.random.default_rng(seed).random((size, size)), 6)
+
+
+def _warped(image: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+    """Image whose pixel `matrix @ p` shows the pixel p of `image`."""
+    inverse = np.linalg.inv(np.vstack([matrix, [0, 0, 1]]))
+    return ndimage.affine_transform(image, inverse[:2, :2], inverse[:2, 2], order=1)
+
+
+def test_estimate_affine_ignores_outliers():
+    source = np.random.default_rng(1).random((10, 2)) * 1000
+    target = apply_affine(SHIFT_AND_SCALE, source)
+    target[3] += 200
+    np.testing.assert_allclose(estimate_affine(source, target), SHIFT_AND_SCALE)
+    assert estimate_affine(source[:2], target[:2]) is None
+
+
+def test_estimate_view_transform():
+    image = _smooth_noise(2000)
+    stack = np.stack([image, _warped(image, SHIFT_AND_SCALE)])[:, np.newaxis]
+    matrix = estimate_view_transform(stack, 0, 0, 1)
+    np.testing.assert_allclose(matrix[:, :2], SHIFT_AND_SCALE[:, :2], atol=2e-3)
+    np.testing.assert_allclose(matrix[:, 2], SHIFT_AND_SCALE[:, 2], atol=1)
+
+
+def test_view_transforms_cache(tmp_path):
+    file_name = str(tmp_path / "cache" / "transforms.npz")
+    transforms = ViewTransforms(file_name)
+    transforms.set(4, 1, SHIFT_AND_SCALE)
+    assert 4 not in transforms
+    transforms.set(4, 2, None)
+    assert 4 in transforms
+    transforms.save()
+
+    cached = ViewTransforms(file_name)
+    assert 4 in cached
+    np.testing.assert_allclose(cached.get(4, 0, 1), SHIFT_AND_SCALE)
+    np.testing.assert_allclose(
+        apply_affine(cached.get(4, 1, 0), apply_affine(SHIFT_AND_SCALE, [10, 20])),
+        [10, 20],
+    )
+    assert cached.get(4, 1, 2) is None
+    assert cached.get(5, 0, 1) is None
+
+
+def test_widget_aligns_views_in_background(
+    make_napari_viewer, qtbot, tmp_path, monkeypatch
+):
+    monkeypatch.setenv("CPT_ALIGN_VIEWS", "1")
+    monkeypatch.setenv("CPT_CACHE_DIR", str(tmp_path / "cache"))
+    image = (_smooth_noise(1024) * 255 / _smooth_noise(1024).max()).astype("uint8")
+    shift = np.array([[1, 0, 16.0], [0, 1, -24.0]])
+    for view, matrix in zip(["view1", "view2", "view3"], [None, shift, shift]):
+        (tmp_path / "data" / view).mkdir(parents=True)
+        for i in range(2):
+            tf.imwrite(
+                tmp_path / "data" / view / f"{i}.tif",
+                np.repeat(
+                    (image if matrix is None else _warped(image, matrix))[..., None],
+                    3,
+                    axis=-1,
+                ),
+            )
+
+    widget = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    assert widget._load_data(str(tmp_path / "data"))
+    with qtbot.waitSignal(widget._view_alignment_worker.finished, timeout=30000):
+        pass
+    # The views are stacked in the order in which the subfolders are found
+    offsets = [
+        np.zeros(2) if subdir == "view1" else shift[:, 2]
+        for subdir in widget.manifest["subdirs"]
+    ]
+    for event in range(2):
+        matrix = widget.view_transform(event, 0, 1)
+        np.testing.assert_allclose(matrix[:, :2], np.eye(2), atol=2e-3)
+        np.testing.assert_allclose(matrix[:, 2], offsets[1] - offsets[0], atol=0.5)
+    assert len(list((tmp_path / "cache").glob("*_view_transforms.npz"))) == 1
+
+    # A new session on the same dataset reuses the cached transforms
+    restored = ParticleTracksWidget(napari_viewer=make_napari_viewer())
+    restored.shuffling_seed = 7
+    monkeypatch.setenv("CPT_ALIGN_VIEWS", "0")
+    assert restored._load_data(str(tmp_path / "data"))
+    assert restored.view_transform(1, 0, 2) == pytest.approx(
+        widget.view_transform(1, 0, 2)
+    )
+
+
+def test_corrupt_view_transforms_cache_warns(tmp_path):
+    file_name = tmp_path / "transforms.npz"
+    file_name.write_bytes(b"not an archive")
+    with pytest.warns(UserWarning, match="Ignoring the cached view transforms"):
+        transforms = ViewTransforms(str(file_name))
+    assert 0 not in transforms
@@ -20,7 +20,7 @@ from .conftest import get_dialog
 
 @pytest.mark.parametrize("bypass", [True, False])
 @pytest.mark.parametrize("docking_area", ["left", "bottom"])
-def test_open_widget(make_napari_viewer, bypass, docking_area):
+def test_open_widget(make_napari_viewer, qtbot, bypass, docking_area):
     """Test the opening of the widget"""
     viewer = make_napari_viewer()
     widget = ParticleTracksWidget(napari_viewer=viewer, docking_area=docking_area)
@@ -43,7 +43,8 @@ def test_open_widget(make_napari_viewer, bypass, docking_area):
 
     widget.viewer.add_image(np.random.random((100, 100)), name=IMAGE_LAYER_NAME)
 
-    assert widget.particle_decays_menu.isEnabled() is True
+    # The buttons are updated once control returns to the event loop
+    qtbot.waitUntil(widget.particle_decays_menu.isEnabled)
     assert widget.radius_button.isEnabled() is False
     assert widget.delete_particle.isEnabled() is False
     assert widget.length_button.isEnabled() is False
@@ -53,11 +54,11 @@ def test_open_widget(make_napari_viewer, bypass, docking_area):
 
 
 def test_add_new_particle_ui(cpt_widget: ParticleTracksWidget):
-    assert cpt_widget.table.rowCount() == 0
+    assert cpt_widget.table.model().rowCount() == 0
 
     cpt_widget.particle_decays_menu.setCurrentIndex(1)
 
-    assert cpt_widget.table.rowCount() == 1
+    assert cpt_widget.table.model().rowCount() == 1
     assert len(cpt_widget.data) == 1
 
 
@@ -65,7 +66,7 @@ def test_delete_particle_ui(cpt_widget: ParticleTracksWidget):
     """Tests the removal of a particle from the table"""
     cpt_widget.particle_decays_menu.setCurrentIndex(1)
 
-    assert cpt_widget.table.rowCount() == 1
+    assert cpt_widget.table.model().rowCount() == 1
     assert len(cpt_widget.data) == 1
 
     def close_dialog(dialog):
@@ -80,7 +81,7 @@ def test_delete_particle_ui(cpt_widget: ParticleTracksWidget):
         time_out=5,
     )
 
-    assert cpt_widget.table.rowCount() == 0
+    assert cpt_widget.table.model().rowCount() == 0
     assert len(cpt_widget.data) == 0
 
 
@@ -145,22 +146,26 @@ def test_load_data(
         cpt_widget.viewer.dims.set_current_step(1, 1)
         # Add a new particle
         cpt_widget.particle_decays_menu.setCurrentIndex(1)
-        assert cpt_widget.table.rowCount() == 1
+        assert cpt_widget.table.model().rowCount() == 1
         assert cpt_widget.data[0].event_number == 1, "The event number should be 1"
         assert (
-            cpt_widget.table.item(
-                0, cpt_widget._get_table_column_index("event_number")
-            ).text()
+            cpt_widget.table.model()
+            .index(0, cpt_widget._get_table_column_index("event_number"))
+            .data()
             == "1"
         )
 
         # Check that apply_magnification does not show anything in the table
         cpt_widget._on_click_apply_magnification()
-        assert not cpt_widget.table.item(
-            0, cpt_widget._get_table_column_index("radius_cm")
+        assert (
+            not cpt_widget.table.model()
+            .index(0, cpt_widget._get_table_column_index("radius_cm"))
+            .data()
         ), "The calibrated radius should not be shown in the table"
-        assert not cpt_widget.table.item(
-            0, cpt_widget._get_table_column_index("decay_length_cm")
+        assert (
+            not cpt_widget.table.model()
+            .index(0, cpt_widget._get_table_column_index("decay_length_cm"))
+            .data()
         ), "The calibrated radius should not be shown in the table"
 
     else:
@@ -182,9 +187,10 @@ def test_load_data(
         )
 
 
-def test_show_hide_buttons(cpt_widget: ParticleTracksWidget):
+def test_show_hide_buttons(cpt_widget: ParticleTracksWidget, qtbot):
     """Test the show/hide buttons"""
     cpt_widget.viewer.add_image(np.random.random((100, 100)), name=IMAGE_LAYER_NAME)
+    qtbot.waitUntil(cpt_widget.particle_decays_menu.isEnabled)
     # ideally would like to test isVisible instead of isEnabled, but that requires showing the widget
     # need to think about how to do that, or if it's worth it
     assert cpt_widget.particle_decays_menu.isEnabled() is True
@@ -193,11 +199,12 @@ def test_show_hide_buttons(cpt_widget: ParticleTracksWidget):
     assert cpt_widget.length_button.isEnabled() is False
     assert cpt_widget.decay_angles_button.isEnabled() is False
     cpt_widget.particle_decays_menu.setCurrentIndex(1)
-    assert cpt_widget.delete_particle.isEnabled() is True
+    qtbot.waitUntil(cpt_widget.delete_particle.isEnabled)
     assert cpt_widget.radius_button.isEnabled() is True
     assert cpt_widget.length_button.isEnabled() is True
     assert cpt_widget.decay_angles_button.isEnabled() is False
     cpt_widget.particle_decays_menu.setCurrentIndex(4)
+    qtbot.waitUntil(cpt_widget.decay_angles_button.isEnabled)
     assert cpt_widget.delete_particle.isEnabled() is True
     assert cpt_widget.radius_button.isEnabled() is False
     assert cpt_widget.length_button.isEnabled() is True
@@ -224,3 +231,28 @@ def test_close_widget(cpt_widget: ParticleTracksWidget, qtbot: QtBot):
         dialog_action=check_dialog_and_click_no,
         time_out=5,
     )
+
+
+def test_button_updates_are_coalesced(cpt_widget: ParticleTracksWidget, qtbot):
+    """A burst of layer and selection events updates the buttons only once, and
+    layer events not involving the data do not update them at all."""
+    updates = []
+    cpt_widget._button_availability_timer.timeout.connect(lambda: updates.append(1))
+
+    cpt_widget.viewer.add_points(name="points")
+    cpt_widget.viewer.layers.move(0, 1)
+    qtbot.wait(10)
+    assert updates == []
+
+    cpt_widget.viewer.add_image(np.random.random((100, 100)), name=IMAGE_LAYER_NAME)
+    cpt_widget.viewer.add_shapes(name="shapes")
+    cpt_widget.particle_decays_menu.setCurrentIndex(1)
+    cpt_widget.particle_decays_menu.setCurrentIndex(4)
+    qtbot.waitUntil(lambda: len(updates) > 0)
+    qtbot.wait(10)
+    assert updates == [1]
+    assert cpt_widget.decay_angles_button.isEnabled() is True
+
+    del cpt_widget.viewer.layers[IMAGE_LAYER_NAME]
+    qtbot.waitUntil(cpt_widget.load_button.isEnabled)
+    assert cpt_widget.particle_decays_menu.isEnabled() is False